@@ -0,0 +1,161 @@
+"""
+Runs the benchmarks and fails when throughput or memory regressed against the committed baseline.
+
+    python -m benchmarks.check                        # compare against benchmarks/baseline.json
+    python -m benchmarks.check --threshold 0.5        # allow 50% slower before failing
+    python -m benchmarks.check --min-memory-delta 0.5 # ignore memory growth under 0.5 MB
+    python -m benchmarks.check --results results.json # compare an existing run instead
+    python -m benchmarks.check --update               # record a new baseline
+
+Timings depend on the machine, so the baseline should be recorded on the machine that runs the check.
+
+Every row with a peak memory in the baseline is checked for memory too. A row regresses when its peak
+grows by more than --memory-threshold and by more than --min-memory-delta MB. With the defaults (20%
+and 0.05 MB), rows with a baseline peak of 0.25 MB or more are gated by the ratio. Smaller rows, such
+as match_kana_with_kanji at 0.0 MB, fail once they grow by more than 0.05 MB. Peaks are stored
+rounded to 0.01 MB.
+"""
+import sys
+import json
+import argparse
+from pathlib import Path
+from typing import Dict, List, Optional, Tuple
+
+from benchmarks.run import print_results, run_benchmarks, save_results
+
+DEFAULT_BASELINE = Path(__file__).resolve().parent / "baseline.json"
+DEFAULT_THRESHOLD = 0.3
+DEFAULT_MEMORY_THRESHOLD = 0.2
+# Differences in peak memory below this are noise, whatever the ratio
+DEFAULT_MIN_MEMORY_DELTA_MB = 0.05
+
+
+def result_key(result: Dict) -> Tuple[str, str, int]:
+    return result["benchmark"], result["dict_type"], result["pages"]
+
+
+def load_results(path: Path) -> Dict:
+    with open(path, "r", encoding="utf-8") as f:
+        return json.load(f)
+
+
+def compare_results(baseline: List[Dict], current: List[Dict], threshold: float = DEFAULT_THRESHOLD,
+                    memory_threshold: float = DEFAULT_MEMORY_THRESHOLD,
+                    min_memory_delta: float = DEFAULT_MIN_MEMORY_DELTA_MB) -> List[Dict]:
+    """
+    Compare every benchmark in the current run to the baseline.
+    Returns one row per benchmark, with the regressed metrics listed under "regressions".
+    """
+    baseline_results = {result_key(result): result for result in baseline}
+    rows = []
+
+    for result in current:
+        base = baseline_results.get(result_key(result))
+        if base is None:
+            continue
+
+        row = {
+            "key": result_key(result),
+            "per_sec": (base.get("per_sec"), result.get("per_sec")),
+            "peak_mb": (base.get("peak_mb"), result.get("peak_mb")),
+            "regressions": []
+        }
+
+        base_rate, rate = row["per_sec"]
+        if base_rate and rate is not None and rate < base_rate * (1 - threshold):
+            row["regressions"].append("per_sec")
+
+        base_peak, peak = row["peak_mb"]
+        if (base_peak is not None and peak is not None
+                and peak > base_peak * (1 + memory_threshold)
+                and peak - base_peak > min_memory_delta):
+            row["regressions"].append("peak_mb")
+
+        rows.append(row)
+
+    return rows
+
+
+def format_change(before: Optional[float], after: Optional[float]) -> str:
+    if not before or after is None:
+        return "-"
+    return f"{(after - before) / before * 100:+.1f}%"
+
+
+def print_comparison(rows: List[Dict]) -> None:
+    print(f"\n{'benchmark':<24}{'dict':<10}{'pages':>8}{'per sec':>12}{'change':>9}{'peak MB':>10}{'change':>9}")
+    for row in rows:
+        benchmark, dict_type, pages = row["key"]
+        base_rate, rate = row["per_sec"]
+        base_peak, peak = row["peak_mb"]
+        status = "  REGRESSED: " + ", ".join(row["regressions"]) if row["regressions"] else ""
+        print(f"{benchmark:<24}{dict_type:<10}{pages:>8}"
+              f"{rate or 0:>12.0f}{format_change(base_rate, rate):>9}"
+              f"{peak or 0:>10.1f}{format_change(base_peak, peak):>9}{status}")
+
+
+def main() -> int:
+    arg_parser = argparse.ArgumentParser(description="Compare benchmark results against a stored baseline")
+    arg_parser.add_argument("--baseline", default=str(DEFAULT_BASELINE),
+                            help=f"Baseline JSON (default: {DEFAULT_BASELINE.name} in the benchmarks folder)")
+    arg_parser.add_argument("--results", default=None,
+                            help="Compare the results of an earlier benchmarks.run instead of running them now")
+    arg_parser.add_argument("--threshold", type=float, default=DEFAULT_THRESHOLD,
+                            help=f"Allowed drop in items/sec as a fraction (default: {DEFAULT_THRESHOLD})")
+    arg_parser.add_argument("--memory-threshold", type=float, default=DEFAULT_MEMORY_THRESHOLD,
+                            help=f"Allowed growth in peak memory as a fraction (default: {DEFAULT_MEMORY_THRESHOLD})")
+    arg_parser.add_argument("--min-memory-delta", type=float, default=DEFAULT_MIN_MEMORY_DELTA_MB,
+                            help="Peak memory growth in MB that is always ignored as noise "
+                                 f"(default: {DEFAULT_MIN_MEMORY_DELTA_MB})")
+    arg_parser.add_argument("--update", action="store_true",
+                            help="Run the benchmarks and store the results as the new baseline")
+    arg_parser.add_argument("--dict-types", "-t", nargs="+", default=None,
+                            help="Dictionary types to run (default: those in the baseline)")
+    arg_parser.add_argument("--sizes", "-n", nargs="+", type=int, default=None,
+                            help="Corpus sizes to run (default: those in the baseline)")
+    arg_parser.add_argument("--repeat", "-r", type=int, default=None)
+    args = arg_parser.parse_args()
+
+    baseline_path = Path(args.baseline)
+    baseline = load_results(baseline_path) if baseline_path.exists() else None
+    if baseline is None and not args.update:
+        print(f"エラー: ベースライン {baseline_path} が見つかりません。--update で作成してください")
+        return 2
+
+    settings = baseline or {}
+    dict_types = args.dict_types or settings.get("dict_types") or ["MK3", "YDP"]
+    sizes = args.sizes or settings.get("sizes") or [100, 1000]
+    repeat = args.repeat or settings.get("repeat") or 3
+    seed = settings.get("seed", 0)
+
+    if args.results:
+        current = load_results(Path(args.results))["results"]
+    else:
+        current = run_benchmarks(dict_types, sizes, repeat, seed)
+        print_results(current)
+
+    if args.update:
+        save_results(str(baseline_path), current, dict_types, sizes, repeat, seed)
+        print(f"\nベースラインを更新しました: {baseline_path}")
+        return 0
+
+    rows = compare_results(baseline["results"], current, args.threshold, args.memory_threshold,
+                           args.min_memory_delta)
+    if not rows:
+        print("エラー: ベースラインと共通のベンチマークがありません")
+        return 2
+
+    print_comparison(rows)
+
+    regressed = [row for row in rows if row["regressions"]]
+    if regressed:
+        print(f"\n{len(regressed)}/{len(rows)} 件のベンチマークで性能が低下しました "
+              f"(しきい値: 速度 {args.threshold:.0%}, メモリ {args.memory_threshold:.0%})")
+        return 1
+
+    print(f"\n{len(rows)} 件のベンチマークすべてがしきい値内です")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
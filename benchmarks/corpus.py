@@ -0,0 +1,296 @@
+"""
+Synthetic Monokakido-style corpus generator.
+
+Real dictionary pages can't be shipped with the repo, so this writes pages, an
+index_d.tsv and assets that use the element vocabulary each parser expects, in the
+same layout as the repo (data/<dict>/pages, data/<dict>/index, assets/<dict>).
+A generated tree can be passed to main.py with --base-dir.
+"""
+import os
+import json
+import random
+import shutil
+import argparse
+from pathlib import Path
+from dataclasses import dataclass
+from collections import defaultdict
+from typing import Callable, Dict, List, Tuple
+
+import jaconv
+
+REPO_ROOT = Path(__file__).resolve().parent.parent
+
+# Kanji with an on and kun reading, combined into headwords
+KANJI_READINGS = [
+    ("山", "さん", "やま"), ("川", "せん", "かわ"), ("日", "にち", "ひ"), ("本", "ほん", "もと"),
+    ("人", "じん", "ひと"), ("学", "がく", "まな"), ("生", "せい", "いき"), ("大", "だい", "おお"),
+    ("水", "すい", "みず"), ("火", "か", "ひ"), ("木", "もく", "き"), ("金", "きん", "かね"),
+    ("土", "ど", "つち"), ("月", "げつ", "つき"), ("年", "ねん", "とし"), ("上", "じょう", "うえ"),
+    ("下", "か", "した"), ("中", "ちゅう", "なか"), ("国", "こく", "くに"), ("語", "ご", "かた"),
+    ("文", "ぶん", "ふみ"), ("書", "しょ", "か"), ("言", "げん", "こと"), ("心", "しん", "こころ"),
+    ("手", "しゅ", "て"), ("目", "もく", "め"), ("花", "か", "はな"), ("風", "ふう", "かぜ"),
+    ("雨", "う", "あめ"), ("空", "くう", "そら"), ("海", "かい", "うみ"), ("道", "どう", "みち"),
+]
+
+FILLER = "これは合成されたテスト用の説明文であり実際の辞書の内容とは関係がない"
+
+SPAN_CLASSES = ["em", "ex", "note", "kigo", "gaiji", "level", "label"]
+
+
+@dataclass
+class Headword:
+    kanji: str
+    kana: str
+
+    @property
+    def katakana(self) -> str:
+        return jaconv.hira2kata(self.kana)
+
+
+@dataclass
+class CorpusProfile:
+    """How to lay out the pages of one dictionary type"""
+    dict_type: str
+    render_page: Callable[['PageBuilder', str, List[Headword]], str]
+    keys_for_page: Callable[[List[Headword]], List[str]]
+
+
+class PageBuilder:
+    """Builds the shared body markup (meanings, links, ruby and images)"""
+
+    def __init__(self, rnd: random.Random, image_folder: str = "images", image_ext: str = ".avif"):
+        self.rnd = rnd
+        self.image_folder = image_folder
+        self.image_ext = image_ext
+        self.images: List[str] = []
+
+
+    def text(self, min_length: int = 10, max_length: int = 60) -> str:
+        length = self.rnd.randint(min_length, max_length)
+        start = self.rnd.randrange(len(FILLER))
+        return (FILLER * (length // len(FILLER) + 2))[start:start + length]
+
+
+    def span(self) -> str:
+        return f'<span class="{self.rnd.choice(SPAN_CLASSES)}">{self.text(2, 8)}</span>'
+
+
+    def ruby(self, headword: Headword) -> str:
+        return f"<ruby><rb>{headword.kanji}</rb><rt>{headword.kana}</rt></ruby>"
+
+
+    def link(self, target_id: str, label: str) -> str:
+        return f'<a href="#{target_id}">{label}</a>'
+
+
+    def image(self, page_id: str) -> str:
+        path = f"{self.image_folder}/{page_id}_{len(self.images)}{self.image_ext}"
+        self.images.append(path)
+        return f'<img src="/{path}"/>'
+
+
+    def paragraph(self, page_id: str, headwords: List[Headword], link_target: str) -> str:
+        parts = [self.text()]
+        for _ in range(self.rnd.randint(0, 3)):
+            choice = self.rnd.random()
+            if choice < 0.4:
+                parts.append(self.span())
+            elif choice < 0.7:
+                parts.append(self.ruby(self.rnd.choice(headwords)))
+            else:
+                parts.append(self.link(link_target, self.rnd.choice(headwords).kanji))
+            parts.append(self.text(5, 30))
+        return "".join(parts)
+
+
+def _mk3_page(builder: PageBuilder, page_id: str, headwords: List[Headword]) -> str:
+    head = headwords[0]
+    meanings = "".join(
+        f'<meaning class="m{i}"><span class="num">{i + 1}</span>{builder.paragraph(page_id, headwords, page_id)}</meaning>'
+        f'<example>{builder.text(8, 20)}</example>'
+        for i in range(builder.rnd.randint(1, 4))
+    )
+    children = "".join(
+        f'<child-item><headword class="子見出し">{builder.ruby(h)}する</headword>'
+        f'<meaning>{builder.paragraph(page_id, headwords, page_id)}</meaning></child-item>'
+        for h in headwords[1:builder.rnd.randint(1, 3)]
+    )
+    image = f'<zoomkanji-container>{builder.image(page_id)}</zoomkanji-container>' if builder.rnd.random() < 0.1 else ""
+    return (
+        f'<dic-item id="{page_id}"><div class="head"><head2>'
+        f'<headword class="見出">{head.kana}</headword><headword class="表記">【{head.kanji}】</headword>'
+        f'<headword class="カナ">{head.katakana}</headword><hinkaku>名</hinkaku></head2></div>'
+        f'<div class="body">{meanings}{image}'
+        f'{"<child-items>" + children + "</child-items>" if children else ""}</div></dic-item>'
+    )
+
+
+def _daijisen_page(builder: PageBuilder, page_id: str, headwords: List[Headword]) -> str:
+    head = headwords[0]
+    meanings = "".join(
+        f'<MG><meaning>{builder.paragraph(page_id, headwords, page_id)}</meaning></MG>'
+        for _ in range(builder.rnd.randint(1, 4))
+    )
+    sub_items = "".join(
+        f'<SubItem><SubItemH><headword class="見出">{h.kanji}<wari>{h.kana}</wari>する</headword></SubItemH>'
+        f'<SubItemC><meaning>{builder.paragraph(page_id, headwords, page_id)}</meaning></SubItemC></SubItem>'
+        for h in headwords[1:builder.rnd.randint(1, 3)]
+    )
+    image = (
+        f'<MImageG><MImage>{builder.image(page_id)}</MImage><MCaption>{builder.text(4, 12)}</MCaption></MImageG>'
+        if builder.rnd.random() < 0.1 else ""
+    )
+    return (
+        f'<Contents id="{page_id}"><見出G><headword class="見出">{head.kana}</headword>'
+        f'<headword class="表記">【{head.kanji}】</headword></見出G>'
+        f'<解説G>{meanings}{image}{sub_items}</解説G></Contents>'
+    )
+
+
+def _kjt_page(builder: PageBuilder, page_id: str, headwords: List[Headword]) -> str:
+    oyaji = headwords[0].kanji[0]
+    on_reading, kun_reading = next(((on, kun) for k, on, kun in KANJI_READINGS if k == oyaji), ("", ""))
+    jukugo = "".join(
+        f'<SubItem id="{page_id}-{i:03d}"><headword class="熟語">{h.kanji}</headword>'
+        f'<headword class="読み">{h.kana}</headword><meaning>{builder.paragraph(page_id, headwords, page_id)}</meaning></SubItem>'
+        for i, h in enumerate(headwords[1:])
+    )
+    image = builder.image(page_id) if builder.rnd.random() < 0.2 else ""
+    return (
+        f'<MainG id="{page_id}"><OyajiHeadG><headword class="親字">{oyaji}</headword>'
+        f'<OyajiYomiSubG><headword class="音">{jaconv.hira2kata(on_reading)}</headword>'
+        f'<headword class="訓">{kun_reading}</headword></OyajiYomiSubG>{image}</OyajiHeadG>'
+        f'<MG><meaning>{builder.paragraph(page_id, headwords, page_id)}</meaning></MG>'
+        f'{"<SubItemG>" + jukugo + "</SubItemG>" if jukugo else ""}</MainG>'
+    )
+
+
+def _ydp_page(builder: PageBuilder, page_id: str, headwords: List[Headword]) -> str:
+    head = headwords[0]
+    meanings = "".join(
+        f'<meaning>{builder.paragraph(page_id, headwords, page_id)}'
+        f'<ref-group><ref>{builder.rnd.choice(headwords).kanji}</ref></ref-group></meaning>'
+        for _ in range(builder.rnd.randint(1, 4))
+    )
+    image = (
+        f'<image><image-img>{builder.image(page_id)}</image-img>'
+        f'<image-caption>{builder.text(4, 12)}</image-caption></image>'
+        if builder.rnd.random() < 0.1 else ""
+    )
+    return (
+        f'<dic-item id="{page_id}"><head2><headword class="見出">{head.kanji}</headword></head2>'
+        f'{meanings}{image}<data class="筆者名">{builder.text(3, 6)}</data></dic-item>'
+    )
+
+
+def _kana_and_kanji_keys(headwords: List[Headword]) -> List[str]:
+    return [headwords[0].kana, headwords[0].kanji]
+
+
+def _kjt_keys(headwords: List[Headword]) -> List[str]:
+    oyaji = headwords[0].kanji[0]
+    readings = [reading for kanji, on, kun in KANJI_READINGS if kanji == oyaji for reading in (jaconv.hira2kata(on), kun)]
+    return [oyaji] + readings
+
+
+PROFILES: Dict[str, CorpusProfile] = {
+    "MK3": CorpusProfile("MK3", _mk3_page, _kana_and_kanji_keys),
+    "Daijisen": CorpusProfile("Daijisen", _daijisen_page, _kana_and_kanji_keys),
+    "KJT": CorpusProfile("KJT", _kjt_page, _kjt_keys),
+    "YDP": CorpusProfile("YDP", _ydp_page, _kana_and_kanji_keys),
+}
+
+
+def make_headword(rnd: random.Random) -> Headword:
+    kanji_count = rnd.choice([1, 2, 2, 2, 3])
+    chosen = [rnd.choice(KANJI_READINGS) for _ in range(kanji_count)]
+
+    # Single kanji words mostly use the kun reading, compounds the on reading
+    use_kun = kanji_count == 1
+    kanji = "".join(k for k, _, _ in chosen)
+    kana = "".join(kun if use_kun else on for _, on, kun in chosen)
+    return Headword(kanji, kana)
+
+
+def generate_corpus(base_dir: str, dict_type: str, page_count: int, seed: int = 0) -> Tuple[Path, int]:
+    """
+    Write a synthetic corpus for a dictionary type under base_dir.
+    Returns the base directory and the number of images written.
+    """
+    if dict_type not in PROFILES:
+        raise ValueError(f"Unknown dictionary type '{dict_type}', expected one of {', '.join(PROFILES)}")
+
+    profile = PROFILES[dict_type]
+    rnd = random.Random(seed)
+    base = Path(base_dir)
+
+    pages_dir = base / "data" / dict_type / "pages"
+    index_dir = base / "data" / dict_type / "index"
+    assets_dir = base / "assets" / dict_type
+    for folder in (pages_dir, index_dir, assets_dir):
+        if folder.exists():
+            shutil.rmtree(folder)
+        folder.mkdir(parents=True)
+    (base / "data" / "JMdict_english").mkdir(parents=True, exist_ok=True)
+
+    builder = PageBuilder(rnd)
+    index = defaultdict(list)
+    # KJT also reads its jukugo, the SubItems after the first headword, from a prefix index
+    jukugo_index = defaultdict(list)
+
+    for i in range(page_count):
+        page_id = f"{i + 1:010d}"
+        headwords = [make_headword(rnd) for _ in range(rnd.randint(1, 4))]
+
+        xml = profile.render_page(builder, page_id, headwords)
+        with open(pages_dir / f"{page_id}.xml", "w", encoding="utf-8") as f:
+            f.write(f'<?xml version="1.0" encoding="UTF-8"?>\n{xml}')
+
+        for key in profile.keys_for_page(headwords):
+            if page_id not in index[key]:
+                index[key].append(page_id)
+
+        if dict_type == "KJT":
+            for item, headword in enumerate(headwords[1:]):
+                for key in (headword.kanji, headword.kana):
+                    jukugo_index[key].append(f"{page_id}-{item:03d}")
+
+    with open(index_dir / "index_d.tsv", "w", encoding="utf-8") as f:
+        for key, page_ids in index.items():
+            f.write("\t".join([key] + page_ids) + "\n")
+
+    if dict_type == "KJT":
+        with open(index_dir / "jyukugo_prefix.tsv", "w", encoding="utf-8") as f:
+            for key, references in jukugo_index.items():
+                f.write("\t".join([key] + references) + "\n")
+
+    with open(index_dir / "index.json", "w", encoding="utf-8") as f:
+        json.dump({"title": f"Benchmark {dict_type}", "format": 3, "revision": "benchmark"}, f, ensure_ascii=False)
+
+    # Images don't need to be valid, they only have to be packaged
+    for image_path in builder.images:
+        image_file = assets_dir / image_path
+        image_file.parent.mkdir(parents=True, exist_ok=True)
+        image_file.write_bytes(rnd.randbytes(rnd.randint(2000, 8000)))
+
+    styles = REPO_ROOT / "assets" / dict_type / "styles.css"
+    if styles.exists():
+        shutil.copy(styles, assets_dir / "styles.css")
+
+    return base, len(builder.images)
+
+
+def main():
+    arg_parser = argparse.ArgumentParser(description="Generate a synthetic dictionary corpus")
+    arg_parser.add_argument("output", help="Base directory to write data/ and assets/ into")
+    arg_parser.add_argument("--dict-type", "-t", choices=list(PROFILES), default="MK3")
+    arg_parser.add_argument("--pages", "-n", type=int, default=1000)
+    arg_parser.add_argument("--seed", type=int, default=0)
+    args = arg_parser.parse_args()
+
+    base, image_count = generate_corpus(args.output, args.dict_type, args.pages, args.seed)
+    print(f"Generated {args.pages} {args.dict_type} pages and {image_count} images in {base}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,106 @@
+"""
+Checks that the lxml converter backend produces the same term banks as bs4.
+
+Runs a dictionary's parser once with each backend and compares everything it exports.
+Without --base-dir a synthetic corpus is generated, with it the real data is used:
+
+    python -m benchmarks.parity -t YDP KJT --pages 500
+    python -m benchmarks.parity -t YDP --base-dir ~/monokakido
+
+The generated-corpus check also runs as a test: python -m pytest test
+"""
+import os
+import sys
+import json
+import shutil
+import tempfile
+import argparse
+import dataclasses
+from pathlib import Path
+from typing import List, Optional
+
+REPO_ROOT = Path(__file__).resolve().parent.parent
+sys.path.insert(0, str(REPO_ROOT / "src"))
+
+os.environ.setdefault("TQDM_DISABLE", "1")
+
+from benchmarks.corpus import PROFILES, generate_corpus
+from benchmarks.run import load_config
+from config import PathManager
+
+BACKENDS = ["bs4", "lxml"]
+
+
+def export_with_backend(dict_type: str, backend: str, base_dir: str, output_dir: Path) -> Path:
+    """Parse and export a dictionary with the given converter backend"""
+    config = dataclasses.replace(load_config(dict_type), converter_backend=backend, unmatched_mode="queue")
+    paths = PathManager(base_dir).get_paths(config)
+    config.set_paths(paths)
+
+    parser = config.get_parser_class()(config)
+    parser.parse()
+    parser.export(str(output_dir / backend))
+    return output_dir / backend / config.dict_name
+
+
+def compare_exports(expected_dir: Path, actual_dir: Path) -> List[str]:
+    """Names of the exported files that differ or exist on one side only"""
+    expected_files = {path.name for path in expected_dir.glob("*.json")}
+    actual_files = {path.name for path in actual_dir.glob("*.json")}
+
+    differences = sorted(expected_files ^ actual_files)
+    for name in sorted(expected_files & actual_files):
+        with open(expected_dir / name, "r", encoding="utf-8") as f:
+            expected = json.load(f)
+        with open(actual_dir / name, "r", encoding="utf-8") as f:
+            actual = json.load(f)
+        if expected != actual:
+            differences.append(name)
+    return differences
+
+
+def check_parity(dict_type: str, base_dir: Optional[str], pages: int, seed: int) -> bool:
+    work_dir = Path(tempfile.mkdtemp(prefix="parity_"))
+    try:
+        if base_dir is None:
+            base_dir = str(work_dir / "corpus")
+            generate_corpus(base_dir, dict_type, pages, seed)
+
+        exports = [export_with_backend(dict_type, backend, base_dir, work_dir) for backend in BACKENDS]
+        differences = compare_exports(*exports)
+        term_banks = len(list(exports[0].glob("term_bank_*.json")))
+    finally:
+        shutil.rmtree(work_dir, ignore_errors=True)
+
+    if differences:
+        print(f"[{dict_type}] 出力が一致しません: {', '.join(differences)}")
+        return False
+
+    # Two empty exports match trivially, e.g. when every page failed to parse
+    if not term_banks:
+        print(f"[{dict_type}] term bank が出力されなかったため、一致を確認できません")
+        return False
+
+    print(f"[{dict_type}] bs4 と lxml の出力は一致しています ({term_banks} term banks)")
+    return True
+
+
+def main() -> int:
+    arg_parser = argparse.ArgumentParser(description="Compare the bs4 and lxml converter backends")
+    arg_parser.add_argument("--dict-types", "-t", nargs="+", choices=list(PROFILES), default=["YDP", "KJT"])
+    arg_parser.add_argument("--pages", "-n", type=int, default=300,
+                            help="Size of the generated corpus in pages (default: 300)")
+    arg_parser.add_argument("--seed", type=int, default=0)
+    arg_parser.add_argument("--base-dir", default=None,
+                            help="Use the dictionary data under this directory instead of a generated corpus")
+    args = arg_parser.parse_args()
+
+    # Tag maps and manual mappings are configured relative to the repo root
+    os.chdir(REPO_ROOT)
+
+    results = [check_parity(dict_type, args.base_dir, args.pages, args.seed) for dict_type in args.dict_types]
+    return 0 if all(results) else 1
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,294 @@
+"""
+Times the main stages of the converter on synthetic corpora of several sizes.
+
+    python -m benchmarks.run --dict-types MK3 YDP --sizes 100 1000 --output results.json
+"""
+import os
+import sys
+import json
+import time
+import shutil
+import tempfile
+import argparse
+import statistics
+import tracemalloc
+from pathlib import Path
+from typing import Callable, Dict, List, Optional, Tuple
+
+REPO_ROOT = Path(__file__).resolve().parent.parent
+sys.path.insert(0, str(REPO_ROOT / "src"))
+
+# Progress bars would only add noise to the timings
+os.environ.setdefault("TQDM_DISABLE", "1")
+
+import bs4
+import jaconv
+
+from benchmarks.corpus import PROFILES, generate_corpus
+from config import DictionaryConfig
+from core import HTMLToYomitanConverter
+from core.yomitan_dictionary import Dictionary, DicEntry
+from index import IndexReader
+from utils import FileUtils, KanjiUtils
+from strategies import DefaultLinkHandlingStrategy, DefaultImageHandlingStrategy
+
+CONFIG_PATH = REPO_ROOT / "src" / "config" / "dictionaries.yaml"
+
+
+def load_config(dict_type: str) -> Optional[DictionaryConfig]:
+    for config in DictionaryConfig.load_configs(CONFIG_PATH).values():
+        if config.dict_type == dict_type:
+            return config
+    return None
+
+
+def create_converter(dict_type: str) -> HTMLToYomitanConverter:
+    """Build the converter the way the dictionary's parser does"""
+    config = load_config(dict_type)
+    if config is None:
+        return HTMLToYomitanConverter()
+
+    tag_mapping = {}
+    if config.tag_map_path:
+        tag_map_path = REPO_ROOT / config.tag_map_path
+        if tag_map_path.exists():
+            tag_mapping = FileUtils.load_json(tag_map_path)
+        else:
+            print(f"  警告: タグマップ {tag_map_path} が見つかりません, タグマップなしで変換します")
+    try:
+        link_strategy = config.create_link_strategy()
+        image_strategy = config.create_image_strategy()
+    except ImportError as e:
+        print(f"  警告: {dict_type} のストラテジーを読み込めませんでした ({e}), デフォルトを使用します")
+        link_strategy = DefaultLinkHandlingStrategy()
+        image_strategy = DefaultImageHandlingStrategy()
+
+    return HTMLToYomitanConverter(
+        tag_mapping=tag_mapping,
+        ignored_elements=config.ignored_elements,
+        expression_element=config.expression_element,
+        link_handling_strategy=link_strategy,
+        image_handling_strategy=image_strategy,
+        parse_all_links=config.parse_all_links
+    )
+
+
+def read_pages(pages_dir: Path) -> List[Tuple[str, str]]:
+    pages = []
+    for page_file in sorted(pages_dir.glob("*.xml")):
+        pages.append((page_file.stem, page_file.read_text(encoding="utf-8")))
+    return pages
+
+
+def measure_peak_memory(run: Callable[[], int], setup: Optional[Callable[[], None]] = None) -> float:
+    """Peak Python memory allocated by one run, in MB. Allocations made by setup() are not counted"""
+    if setup:
+        setup()
+    tracemalloc.start()
+    try:
+        run()
+        _, peak = tracemalloc.get_traced_memory()
+    finally:
+        tracemalloc.stop()
+    return peak / (1024 * 1024)
+
+
+def time_repeated(run: Callable[[], int], repeat: int, setup: Optional[Callable[[], None]] = None) -> Dict:
+    """
+    Run a benchmark several times. run() returns the number of items it processed.
+    Memory is measured in an extra run, since tracing allocations slows it down.
+    """
+    timings = []
+    items = 0
+    for _ in range(repeat):
+        if setup:
+            setup()
+        start = time.perf_counter()
+        items = run()
+        timings.append(time.perf_counter() - start)
+
+    best = min(timings)
+    return {
+        "best": round(best, 6),
+        "mean": round(statistics.mean(timings), 6),
+        "items": items,
+        "per_sec": round(items / best, 1) if best else None,
+        "peak_mb": round(measure_peak_memory(run, setup), 2)
+    }
+
+
+class CorpusBenchmarks:
+    """The benchmarks for one generated corpus"""
+
+    def __init__(self, base_dir: Path, dict_type: str, repeat: int):
+        self.base_dir = base_dir
+        self.dict_type = dict_type
+        self.repeat = repeat
+        self.pages = read_pages(base_dir / "data" / dict_type / "pages")
+        self.index_path = base_dir / "data" / dict_type / "index" / "index_d.tsv"
+        self.reader = IndexReader(str(self.index_path))
+        self.html_converter = create_converter(dict_type)
+        self.work_dir = Path(tempfile.mkdtemp(prefix="bench_"))
+        self.soups = []
+        self.converted = []
+
+
+    def close(self) -> None:
+        shutil.rmtree(self.work_dir, ignore_errors=True)
+
+
+    def index_reader(self) -> Dict:
+        def run():
+            reader = IndexReader(str(self.index_path))
+            return len(reader.dict_data)
+        return time_repeated(run, self.repeat)
+
+
+    def match_kana_with_kanji(self) -> Dict:
+        key_lists = [
+            [jaconv.kata2hira(key) for key in self.reader.get_keys_for_file(page_id)]
+            for page_id, _ in self.pages
+        ]
+
+        def run():
+            for keys in key_lists:
+                KanjiUtils.match_kana_with_kanji(keys)
+            return len(key_lists)
+        return time_repeated(run, self.repeat)
+
+
+    def converter(self) -> Dict:
+        # Some strategies modify the soup, so every run converts freshly parsed pages
+        def setup():
+            self.soups = [bs4.BeautifulSoup(xml, "xml") for _, xml in self.pages]
+
+        def run():
+            self.converted = []
+            for soup in self.soups:
+                for element in soup.find_all(recursive=False):
+                    self.converted.append(self.html_converter.convert_element_to_yomitan(element))
+            return len(self.soups)
+        return time_repeated(run, self.repeat, setup)
+
+
+    def dictionary_export(self) -> Dict:
+        if not self.converted:
+            self.converter()
+
+        def setup():
+            self.dictionary = Dictionary(f"bench_{self.dict_type}")
+            for (page_id, _), element in zip(self.pages, self.converted):
+                if not element:
+                    continue
+                for key in self.reader.get_keys_for_file(page_id) or [page_id]:
+                    entry = DicEntry(key, "")
+                    entry.add_element(element)
+                    self.dictionary.add_entry(entry)
+
+        def run():
+            self.dictionary.export(str(self.work_dir))
+            return len(self.dictionary.entries)
+        return time_repeated(run, self.repeat, setup)
+
+
+    def zip_dictionary(self) -> Dict:
+        term_bank_folder = self.work_dir / f"bench_{self.dict_type}"
+        if not term_bank_folder.exists():
+            self.dictionary_export()
+
+        file_paths = FileUtils.gather_files(
+            str(term_bank_folder),
+            str(self.base_dir / "assets" / self.dict_type),
+            str(self.base_dir / "data" / self.dict_type / "index" / "index.json"),
+            str(self.work_dir)
+        )
+        zip_dir = self.work_dir / "zip"
+        zip_dir.mkdir(exist_ok=True)
+
+        def run():
+            FileUtils.zip_dictionary(file_paths, f"bench_{self.dict_type}", str(self.base_dir), str(zip_dir))
+            return len(file_paths)
+        return time_repeated(run, self.repeat)
+
+
+BENCHMARKS = ["index_reader", "match_kana_with_kanji", "converter", "dictionary_export", "zip_dictionary"]
+
+
+def run_benchmarks(dict_types: List[str], sizes: List[int], repeat: int = 3, seed: int = 0,
+                   benchmarks: Optional[List[str]] = None, corpus_dir: Optional[str] = None) -> List[Dict]:
+    benchmarks = benchmarks or BENCHMARKS
+    results = []
+    root = Path(corpus_dir) if corpus_dir else Path(tempfile.mkdtemp(prefix="bench_corpus_"))
+
+    try:
+        for dict_type in dict_types:
+            for size in sizes:
+                base_dir = root / f"{dict_type}_{size}"
+                print(f"\n[{dict_type}, {size} ページ] コーパスを生成しています...")
+                generate_corpus(str(base_dir), dict_type, size, seed)
+
+                suite = CorpusBenchmarks(base_dir, dict_type, repeat)
+                try:
+                    for name in benchmarks:
+                        result = getattr(suite, name)()
+                        result.update({"benchmark": name, "dict_type": dict_type, "pages": size})
+                        results.append(result)
+                        print(f"  {name:<24}{result['best']:>10.4f}s  ({result['per_sec']}/s)")
+                finally:
+                    suite.close()
+    finally:
+        if not corpus_dir:
+            shutil.rmtree(root, ignore_errors=True)
+
+    return results
+
+
+def print_results(results: List[Dict]) -> None:
+    print(f"\n{'benchmark':<24}{'dict':<10}{'pages':>8}{'best (s)':>12}{'mean (s)':>12}{'items':>9}{'per sec':>12}"
+          f"{'peak MB':>10}")
+    for result in results:
+        per_sec = f"{result['per_sec']:.0f}" if result["per_sec"] else "-"
+        print(f"{result['benchmark']:<24}{result['dict_type']:<10}{result['pages']:>8}"
+              f"{result['best']:>12.4f}{result['mean']:>12.4f}{result['items']:>9}{per_sec:>12}"
+              f"{result['peak_mb']:>10.1f}")
+
+
+def save_results(path: str, results: List[Dict], dict_types: List[str], sizes: List[int],
+                 repeat: int, seed: int) -> None:
+    """Save the results together with the settings needed to reproduce them"""
+    data = {
+        "dict_types": dict_types,
+        "sizes": sizes,
+        "seed": seed,
+        "repeat": repeat,
+        "results": results
+    }
+    with open(path, "w", encoding="utf-8") as f:
+        json.dump(data, f, ensure_ascii=False, indent=4)
+
+
+def main():
+    arg_parser = argparse.ArgumentParser(description="Benchmark the converter on synthetic corpora")
+    arg_parser.add_argument("--dict-types", "-t", nargs="+", choices=list(PROFILES), default=["MK3", "YDP"])
+    arg_parser.add_argument("--sizes", "-n", nargs="+", type=int, default=[100, 1000],
+                            help="Corpus sizes in pages (default: 100 1000)")
+    arg_parser.add_argument("--benchmarks", "-b", nargs="+", choices=BENCHMARKS, default=None,
+                            help="Benchmarks to run (default: all)")
+    arg_parser.add_argument("--repeat", "-r", type=int, default=3,
+                            help="Runs per benchmark, the best time is reported (default: 3)")
+    arg_parser.add_argument("--seed", type=int, default=0)
+    arg_parser.add_argument("--corpus-dir", default=None,
+                            help="Keep the generated corpora in this directory instead of a temporary one")
+    arg_parser.add_argument("--output", "-o", default=None, help="Write the results to a JSON file")
+    args = arg_parser.parse_args()
+
+    results = run_benchmarks(args.dict_types, args.sizes, args.repeat, args.seed, args.benchmarks, args.corpus_dir)
+    print_results(results)
+
+    if args.output:
+        save_results(args.output, results, args.dict_types, args.sizes, args.repeat, args.seed)
+        print(f"\n結果を保存しました: {args.output}")
+
+
+if __name__ == "__main__":
+    main()
@@ -36,6 +36,13 @@ class DictionaryConfig:
     use_jmdict: bool = True
     has_audio: bool = False
     parse_all_links: bool = False
+    memory_estimate_mb: Optional[int] = None
+    unmatched_mode: str = "interactive"
+    converter_backend: str = "bs4"
+    index_backend: str = "memory"
+    validation: str = "full"
+    minimize_content: bool = False
+    term_bank_size_mb: Optional[float] = None
     
     
     @classmethod
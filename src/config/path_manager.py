@@ -17,6 +17,7 @@ class PathManager:
             "dict_path": self.base_dir / f"data/{dict_type}/pages",
             "output_path": self.base_dir / "converted",
             "term_bank_folder": self.base_dir / "converted" / config.dict_name,
+            "cache_folder": self.base_dir / "converted" / ".cache" / dict_type,
             "assets_folder": self.base_dir / f"assets/{dict_type}",
             "index_json_path": self.base_dir / f"data/{dict_type}/index/index.json"
         }
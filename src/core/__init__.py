@@ -1,12 +1,18 @@
 from .dictionary import Dictionary
 from .parser import Parser
 from .html_converter import HTMLToYomitanConverter
+from .lxml_converter import LxmlToYomitanConverter
+from .page_cache import PageCache
+from .content_minimizer import ContentMinimizer
 from .yomitan_dictionary import Dictionary, DicEntry, create_html_element
 
 __all__ = [
 	"Dictionary",
 	"Parser",
 	"HTMLToYomitanConverter",
+	"LxmlToYomitanConverter",
+	"PageCache",
+	"ContentMinimizer",
 	"Dictionary",
 	"DicEntry",
 	"create_html_element"
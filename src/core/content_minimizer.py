@@ -0,0 +1,151 @@
+import json
+import re
+from pathlib import Path
+from typing import Dict, List, Optional, Set, Union
+
+# Image attributes Yomitan fills in with these values when they are left out
+IMAGE_DEFAULTS = {
+    "collapsed": False,
+    "appearance": "auto",
+    "imageRendering": "auto"
+}
+
+CSS_COMMENT = re.compile(r"/\*.*?\*/", re.DOTALL)
+CSS_SELECTOR = re.compile(r"([^{};]+)\{")
+CSS_DATA_ATTRIBUTE = re.compile(r"\[\s*data-sc-?([^\]\s=~|^$*]+)")
+# Selectors that depend on an element's siblings or on which element is its parent
+CSS_STRUCTURAL = re.compile(r":(?:first|last|nth|only)-|-of-type|:empty|[>+~]")
+CSS_PARENTHESES = re.compile(r"\([^()]*\)")
+CSS_COMPOUND_SEPARATOR = re.compile(r"[\s>+~]+")
+
+
+def _can_match_plain_span(compound: str) -> bool:
+    """Whether a compound selector could match a span without any data attributes"""
+    if "[" in compound or "#" in compound:
+        return False
+    type_name = re.match(r"[\w*-]*", compound).group(0)
+    if type_name not in ("", "*", "span"):
+        return False
+    classes = re.findall(r"\.([\w-]+)", compound)
+    return all(cls == "gloss-sc-span" for cls in classes)
+
+
+class ContentMinimizer:
+    """
+    Removes redundant structure from structured content before it is written to a term bank.
+
+    Every dictionary gets:
+    - adjacent strings merged, and a content list holding only a string replaced by the string
+    - the element's own tag name dropped from its data, unless the stylesheet selects on it
+    - image attributes that have Yomitan's default value dropped
+
+    Plain spans, with no data or other attributes, are only flattened into their parent when the
+    stylesheet can't tell the difference: it has no selectors that could match such a span, and
+    none that depend on siblings or on the exact parent of an element.
+    """
+
+    def __init__(self, referenced_data: Optional[Set[str]] = None, flatten_spans: bool = True):
+        self.referenced_data = referenced_data or set()
+        self.flatten_spans = flatten_spans
+        self.bytes_before = 0
+        self.bytes_after = 0
+
+
+    @classmethod
+    def for_stylesheet(cls, css_path: Union[str, Path]) -> 'ContentMinimizer':
+        """Create a minimizer whose changes don't affect how the stylesheet renders the content"""
+        css_path = Path(css_path)
+        if not css_path.is_file():
+            return cls()
+
+        css = CSS_COMMENT.sub("", css_path.read_text(encoding="utf-8"))
+        referenced_data = {name.lower() for name in CSS_DATA_ATTRIBUTE.findall(css)}
+
+        flatten_spans = True
+        for match in CSS_SELECTOR.finditer(css):
+            selector = match.group(1).strip()
+            if selector.startswith("@") or not selector:
+                continue
+            if CSS_STRUCTURAL.search(selector):
+                flatten_spans = False
+                break
+
+            # Arguments of :has() and :not() are left out, keeping the selector itself
+            while CSS_PARENTHESES.search(selector):
+                selector = CSS_PARENTHESES.sub("", selector)
+            compounds = [compound for part in selector.split(",")
+                         for compound in CSS_COMPOUND_SEPARATOR.split(part.strip()) if compound]
+            if any(_can_match_plain_span(compound) for compound in compounds):
+                flatten_spans = False
+                break
+
+        return cls(referenced_data, flatten_spans)
+
+
+    @property
+    def bytes_saved(self) -> int:
+        return self.bytes_before - self.bytes_after
+
+
+    def minimize(self, content: List) -> List:
+        """Return a minimized copy of an entry's structured content, the original is left as is"""
+        before = json.dumps(content, ensure_ascii=False)
+        minimized = self._minimize_list(content)
+        after = json.dumps(minimized, ensure_ascii=False)
+
+        # Only ASCII JSON syntax is ever removed, so the length difference is the bytes saved
+        before_bytes = len(before.encode("utf-8"))
+        self.bytes_before += before_bytes
+        self.bytes_after += before_bytes - (len(before) - len(after))
+        return minimized
+
+
+    def _is_plain_span(self, element: Dict) -> bool:
+        return element.get("tag") == "span" and all(key == "tag" or key == "content" for key in element)
+
+
+    def _minimize_list(self, content: List) -> List:
+        minimized = []
+        for child in content:
+            if isinstance(child, dict):
+                child = self._minimize_element(child)
+                if self.flatten_spans and self._is_plain_span(child):
+                    inner = child.get("content")
+                    if isinstance(inner, list) and len(inner) == 1:
+                        inner = inner[0]
+                    if isinstance(inner, (str, dict)):
+                        child = inner
+
+            if isinstance(child, str) and minimized and isinstance(minimized[-1], str):
+                minimized[-1] += child
+            else:
+                minimized.append(child)
+        return minimized
+
+
+    def _minimize_element(self, element: Dict) -> Dict:
+        minimized = dict(element)
+        tag = element.get("tag")
+
+        content = element.get("content")
+        if isinstance(content, list):
+            content = self._minimize_list(content)
+            if len(content) == 1 and isinstance(content[0], str):
+                content = content[0]
+            minimized["content"] = content
+
+        data = element.get("data")
+        if data and tag in data and tag.lower() not in self.referenced_data:
+            data = {key: value for key, value in data.items() if key != tag}
+        if data:
+            minimized["data"] = data
+        else:
+            minimized.pop("data", None)
+
+        if tag == "img":
+            for key, default in IMAGE_DEFAULTS.items():
+                # False == 0, so the type is compared too
+                if key in minimized and minimized[key] == default and type(minimized[key]) is type(default):
+                    del minimized[key]
+
+        return minimized
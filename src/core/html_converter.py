@@ -1,10 +1,20 @@
 
-from typing import List, Dict, Optional, Tuple
+from typing import Callable, List, Dict, Optional, Tuple
 import bs4
 
 from core.yomitan_dictionary import create_html_element
 from strategies import LinkHandlingStrategy, ImageHandlingStrategy, DefaultLinkHandlingStrategy, DefaultImageHandlingStrategy
 
+YOMITAN_SUPPORTED_TAGS = {
+	"br", "ruby", "rt", "rp", "table", "thead", "tbody", "tfoot",
+	"tr", "td", "th", "span", "div", "ol", "ul", "li", "details", "summary"
+}
+
+# How far above the parent "parent tag" rules are looked for
+MAX_ANCESTOR_DEPTH = 5
+# The tag cache is cleared when it grows past this many signatures
+MAX_TAG_CACHE_SIZE = 100000
+
 class HTMLToYomitanConverter:
 	def __init__(self, 
 		tag_mapping: Optional[Dict] = None, 
@@ -21,14 +31,50 @@ class HTMLToYomitanConverter:
 		self.image_handling_strategy = image_handling_strategy or DefaultImageHandlingStrategy()
 		self.parse_all_links = parse_all_links
 		
-		self.__yomitan_supported_tags = {
-			"br", "ruby", "rt", "rp", "table", "thead", "tbody", "tfoot",
-			"tr", "td", "th", "span", "div", "ol", "ul", "li", "details", "summary"
-		}
+		self.__yomitan_supported_tags = YOMITAN_SUPPORTED_TAGS
 		
+		self._compile_tag_mapping()
 		
-	def get_class_list_and_data(self, html_glossary: bs4.element.Tag) -> Tuple[List[str], Dict[str, str]]:
-		"""Extract class list and data attributes from an HTML element"""
+		# Resolved target tags by element signature
+		self._tag_cache: Dict[Tuple, str] = {}
+		self.tag_cache_hits = 0
+		self.tag_cache_misses = 0
+		
+		# Set while convert_element_with_fragments is collecting fragments
+		self._fragments: Optional[Dict[Tuple[int, bool], Tuple]] = None
+		self._expression_count = 0
+		
+		
+	@staticmethod
+	def _split_class_selector(selector: str) -> List[Tuple[str, str]]:
+		"""Every (name, class) pair that f"{name}.{class}" turns into the selector"""
+		return [(selector[:i], selector[i + 1:]) for i, char in enumerate(selector) if char == "."]
+		
+		
+	def _compile_tag_mapping(self) -> None:
+		"""
+		Index the tag mapping by tag name, so resolving a tag is a few dict lookups.
+		"parent.class tag" and "parent tag" rules go into _nested_rules[tag][parent] as
+		[{class: target}, target], and "tag.class" rules into _class_rules[tag][class].
+		"""
+		self._nested_rules: Dict[str, Dict[str, List]] = {}
+		self._class_rules: Dict[str, Dict[str, str]] = {}
+		
+		for selector, target_tag in self.tag_mapping.items():
+			parts = selector.split(" ")
+			if len(parts) == 2:
+				parent_selector, tag_name = parts
+				parent_rules = self._nested_rules.setdefault(tag_name, {})
+				parent_rules.setdefault(parent_selector, [{}, None])[1] = target_tag
+				for parent_name, parent_class in self._split_class_selector(parent_selector):
+					parent_rules.setdefault(parent_name, [{}, None])[0][parent_class] = target_tag
+			elif len(parts) == 1:
+				for tag_name, css_class in self._split_class_selector(selector):
+					self._class_rules.setdefault(tag_name, {})[css_class] = target_tag
+		
+		
+	def get_class_list(self, html_glossary: bs4.element.Tag) -> List[str]:
+		"""CSS classes of an element, or its name for custom tags without classes"""
 		class_list = html_glossary.get("class", [])
 		if isinstance(class_list, str):
 			class_list = class_list.split(" ")
@@ -36,6 +82,13 @@ class HTMLToYomitanConverter:
 		if html_glossary.name and not class_list and html_glossary.name not in self.__yomitan_supported_tags:
 			class_list.append(html_glossary.name)
 			
+		return class_list
+		
+		
+	def get_class_list_and_data(self, html_glossary: bs4.element.Tag) -> Tuple[List[str], Dict[str, str]]:
+		"""Extract class list and data attributes from an HTML element"""
+		class_list = self.get_class_list(html_glossary)
+			
 		data_dict = {}
 		data_dict[html_glossary.name] = ""
 		
@@ -49,45 +102,106 @@ class HTMLToYomitanConverter:
 		return class_list, data_dict
 		
 		
-	def get_target_tag(self, tag_name: str, class_list: Optional[List[str]] = None,
-						parent: Optional[bs4.element.Tag] = None, recursion_depth: int = 0) -> str:
+	def _get_tag_signature(self, tag_name: str, class_list: Optional[List[str]],
+							parent: Optional[bs4.element.Tag], recursion_depth: int) -> Tuple:
 		"""
-		Get the appropriate HTML tag based on tag name and CSS classes
+		Everything the tag mapping can match on: the tag, its classes if it has "tag.class" rules,
+		and the ancestors within reach that have rules for the tag. Ancestors are included with
+		their classes only if they have "parent.class tag" rules, and up to the first one with a
+		"parent tag" rule, since resolution never looks past it.
 		"""
-		if not class_list:
-			class_list = []
-			
-		# Look for nested rules
-		if parent:
-			parent_classes, _ = self.get_class_list_and_data(parent)
-			
-			# Try parent.class + tag 
-			for parent_class in parent_classes:
-				nested_selector = f"{parent.name}.{parent_class} {tag_name}"
-				if nested_selector in self.tag_mapping:
-					return self.tag_mapping[nested_selector]
+		classes = tuple(class_list) if class_list and tag_name in self._class_rules else ()
+		
+		nested_rules = self._nested_rules.get(tag_name)
+		if not nested_rules:
+			return tag_name, classes
+		
+		ancestors = []
+		ancestor = parent
+		depth = recursion_depth
+		while ancestor is not None:
+			rules = nested_rules.get(ancestor.name)
+			if rules:
+				parent_classes = tuple(self.get_class_list(ancestor)) if rules[0] else ()
+				ancestors.append((depth == recursion_depth, ancestor.name, parent_classes))
+				if rules[1] is not None:
+					break
 				
-			# Try parent + tag
-			nested_selector = f"{parent.name} {tag_name}"
-			if nested_selector in self.tag_mapping:
-				return self.tag_mapping[nested_selector]
+			if depth >= MAX_ANCESTOR_DEPTH:
+				break
+			ancestor = ancestor.parent
+			depth += 1
 			
-			# Recurse up the ancestor chain if no match
-			if recursion_depth < 5 and parent.parent:
-				target_tag = self.get_target_tag(tag_name, class_list=class_list, parent=parent.parent, recursion_depth=recursion_depth + 1)
-				if target_tag != "span":
-					return target_tag
+		return tag_name, classes, tuple(ancestors)
+	
+	
+	def get_target_tag(self, tag_name: str, class_list: Optional[List[str]] = None,
+						parent: Optional[bs4.element.Tag] = None, recursion_depth: int = 0) -> str:
+		"""
+		Get the appropriate HTML tag based on tag name and CSS classes.
+		Results are cached by element signature, as documents repeat the same structures.
+		"""
+		signature = self._get_tag_signature(tag_name, class_list, parent, recursion_depth)
+		target_tag = self._tag_cache.get(signature)
+		if target_tag is not None:
+			self.tag_cache_hits += 1
+			return target_tag
+		
+		self.tag_cache_misses += 1
+		if len(self._tag_cache) >= MAX_TAG_CACHE_SIZE:
+			self._tag_cache.clear()
+		
+		target_tag = self._resolve_target_tag(tag_name, class_list, parent, recursion_depth)
+		self._tag_cache[signature] = target_tag
+		return target_tag
+	
+	
+	def _resolve_target_tag(self, tag_name: str, class_list: Optional[List[str]],
+							parent: Optional[bs4.element.Tag], recursion_depth: int) -> str:
+		"""
+		"parent.class tag" and "parent tag" rules are tried on up to MAX_ANCESTOR_DEPTH ancestors,
+		closest first. A "span" matched above the direct parent doesn't override the "tag.class"
+		and "tag" rules of the element itself.
+		"""
+		nested_rules = self._nested_rules.get(tag_name)
+		if nested_rules:
+			ancestor = parent
+			depth = recursion_depth
+			while ancestor is not None:
+				rules = nested_rules.get(ancestor.name)
+				if rules:
+					target_tag = self._match_ancestor_rules(ancestor, rules)
+					if target_tag is not None:
+						if depth == recursion_depth or target_tag != "span":
+							return target_tag
+						break
+					
+				if depth >= MAX_ANCESTOR_DEPTH:
+					break
+				ancestor = ancestor.parent
+				depth += 1
 				
 		# Try tag.class (no parent involvement)
-		for css_class in class_list:
-			class_specific_key = f"{tag_name}.{css_class}"
-			if class_specific_key in self.tag_mapping:
-				return self.tag_mapping[class_specific_key]
+		class_rules = self._class_rules.get(tag_name)
+		if class_rules and class_list:
+			for css_class in class_list:
+				if css_class in class_rules:
+					return class_rules[css_class]
 			
 		# Fall back to regular tag mapping or default
 		return self.tag_mapping.get(tag_name, "span")
 	
 	
+	def _match_ancestor_rules(self, ancestor: bs4.element.Tag, rules: List) -> Optional[str]:
+		"""Try parent.class + tag, then parent + tag"""
+		class_rules, target_tag = rules
+		if class_rules:
+			for parent_class in self.get_class_list(ancestor):
+				if parent_class in class_rules:
+					return class_rules[parent_class]
+		return target_tag
+	
+	
 	def handle_link_element(self, html_glossary: bs4.element.Tag, html_elements: List,
 							data_dict: Dict, class_list: List[str]) -> Dict:
 		return self.link_handling_strategy.handle_link_element(html_glossary, html_elements, data_dict, class_list)
@@ -121,12 +235,58 @@ class HTMLToYomitanConverter:
 		return html_elements  
 	
 	
+	def convert_element_with_fragments(self, html_glossary: bs4.element.Tag, fragments: Dict,
+										ignore_expressions: bool = True) -> Optional[Dict]:
+		"""
+		Convert an element and record the conversion of every element below it in fragments,
+		keyed by (id(element), ignore_expressions) like Parser's conversion cache.
+		Expression elements are still left out of the result, but their subtrees are converted
+		in the same walk, so expression entries can reuse them instead of converting them again.
+		"""
+		self._fragments = fragments
+		try:
+			return self.convert_element_to_yomitan(html_glossary, ignore_expressions=ignore_expressions)
+		finally:
+			self._fragments = None
+	
+	
+	def _record_conversion(self, html_glossary: bs4.element.Tag, ignore_expressions: bool,
+							convert: Callable[[bool], Optional[Dict]]) -> Optional[Dict]:
+		"""
+		Convert an element with convert() and add the result to the fragments.
+		A result without any expression element below it doesn't depend on ignore_expressions
+		and is recorded for both values.
+		"""
+		expressions_before = self._expression_count
+		if self.expression_element and html_glossary.name.lower() == self.expression_element:
+			self._expression_count += 1
+			if ignore_expressions:
+				self._record_conversion(html_glossary, False, convert)
+				self._fragments[(id(html_glossary), True)] = (html_glossary, None)
+				return None
+		
+		yomitan_element = convert(ignore_expressions)
+		if self._expression_count == expressions_before:
+			self._fragments[(id(html_glossary), True)] = (html_glossary, yomitan_element)
+			self._fragments[(id(html_glossary), False)] = (html_glossary, yomitan_element)
+		else:
+			self._fragments[(id(html_glossary), ignore_expressions)] = (html_glossary, yomitan_element)
+		return yomitan_element
+	
+	
 	def convert_element_to_yomitan(self, html_glossary: Optional[bs4.element.Tag] = None,
 									ignore_expressions: bool = False) -> Optional[Dict]:
 		"""Recursively converts HTML elements into Yomitan JSON format"""
 		if not html_glossary:
 			return None
 		
+		if self._fragments is not None:
+			return self._record_conversion(html_glossary, ignore_expressions,
+											lambda flag: self._convert_element(html_glossary, flag))
+		return self._convert_element(html_glossary, ignore_expressions)
+	
+	
+	def _convert_element(self, html_glossary: bs4.element.Tag, ignore_expressions: bool) -> Optional[Dict]:
 		tag_name = html_glossary.name.lower()
 		if tag_name in self.ignored_elements:
 			return None
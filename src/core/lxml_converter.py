@@ -0,0 +1,484 @@
+from abc import ABC, abstractmethod
+from typing import Dict, Iterator, List, Optional, Tuple, Union
+import bs4
+from lxml import etree
+
+from core.html_converter import HTMLToYomitanConverter, YOMITAN_SUPPORTED_TAGS
+from core.yomitan_dictionary import create_html_element
+
+# Same settings bs4 uses for its "xml" features
+XML_PARSER = etree.XMLParser(recover=True, strip_cdata=False, encoding="utf-8")
+# Whitespace that bs4 collapses when a string consists of nothing else
+ASCII_SPACES = "\x20\x0a\x09\x0c\x0d"
+
+
+def normalize_string(text: str) -> str:
+	"""bs4 turns whitespace-only strings into a single newline or space"""
+	if text.strip(ASCII_SPACES):
+		return text
+	return "\n" if "\n" in text else " "
+
+
+def get_element_name(element: etree._Element) -> str:
+	"""Tag name the way bs4 reports it, "prefix:name" for namespaced tags"""
+	tag = element.tag
+	if tag[0] != "{":
+		return tag
+	local_name = etree.QName(tag).localname
+	return f"{element.prefix}:{local_name}" if element.prefix else local_name
+
+
+def get_attribute_name(element: etree._Element, key: str) -> str:
+	"""Attribute name the way bs4 reports it, "prefix:name" for namespaced attributes"""
+	if key[0] != "{":
+		return key
+	qname = etree.QName(key)
+	prefix = next((p for p, uri in element.nsmap.items() if p and uri == qname.namespace), None)
+	return f"{prefix}:{qname.localname}" if prefix else qname.localname
+
+
+def get_element_attrs(element: etree._Element) -> Dict[str, str]:
+	return {get_attribute_name(element, key): value for key, value in element.attrib.items()}
+
+
+def is_tag(node) -> bool:
+	"""Elements, as opposed to comments, processing instructions and entities"""
+	return isinstance(node.tag, str)
+
+
+def iter_strings(element: etree._Element) -> Iterator[str]:
+	"""Text of an element and its descendants, without comments and processing instructions"""
+	if element.text and is_tag(element):
+		yield normalize_string(element.text)
+	for child in element:
+		if is_tag(child):
+			yield from iter_strings(child)
+		if child.tail:
+			yield normalize_string(child.tail)
+
+
+def join_strings(first: Optional[str], second: str) -> str:
+	"""Join two strings that bs4 would keep apart, each normalized the way bs4 would"""
+	return (normalize_string(first) if first else "") + normalize_string(second)
+
+
+def add_text_before(element: etree._Element, text: Optional[str]) -> None:
+	"""Append text to whatever text comes right before the element"""
+	if not text:
+		return
+	previous = element.getprevious()
+	if previous is not None:
+		previous.tail = join_strings(previous.tail, text)
+	else:
+		parent = element.getparent()
+		parent.text = join_strings(parent.text, text)
+
+
+def parse_lxml_document(xml: Union[str, bytes]) -> "LxmlDocument":
+	"""Parse a page from bytes with lxml"""
+	if isinstance(xml, str):
+		xml = xml.encode("utf-8")
+	try:
+		root = etree.fromstring(xml, XML_PARSER)
+	except etree.XMLSyntaxError:
+		root = None
+	return LxmlDocument(root, has_namespaces=b"xmlns" in xml)
+
+
+class LxmlNode(ABC):
+	"""The parts of the bs4 search API that parsers and strategies use"""
+	__slots__ = ()
+
+	@abstractmethod
+	def _iter_children(self) -> Iterator[etree._Element]:
+		"""Child nodes of this node, as lxml elements"""
+		pass
+
+
+	@abstractmethod
+	def _iter_descendants(self, name: Optional[str] = None) -> Iterator[etree._Element]:
+		"""Descendant elements in document order, optionally only those with this tag name"""
+		pass
+
+
+	@abstractmethod
+	def _wrap(self, element: etree._Element) -> "LxmlTag":
+		"""The tag wrapping an element of this node's document"""
+		pass
+
+
+	@abstractmethod
+	def _get_document(self) -> "LxmlDocument":
+		"""The document this node belongs to"""
+		pass
+
+
+	@staticmethod
+	def _matches_value(value: Optional[str], match_against) -> bool:
+		if match_against is True:
+			return value is not None
+		if match_against is None or match_against is False:
+			return value is None
+		if callable(match_against):
+			return match_against(value)
+		if isinstance(match_against, (list, tuple, set)):
+			return any(LxmlNode._matches_value(value, item) for item in match_against)
+		return value == match_against
+
+
+	def _matches(self, element: etree._Element, name, attrs: Dict) -> bool:
+		if not is_tag(element):
+			return False
+		if name is not None and name is not True:
+			if not self._matches_value(get_element_name(element), name):
+				return False
+		for key, match_against in attrs.items():
+			if not self._matches_value(element.get(key), match_against):
+				return False
+		return True
+
+
+	def find_all(self, name=None, attrs: Optional[Dict] = None, recursive: bool = True,
+				limit: Optional[int] = None, class_=None, **kwargs) -> List["LxmlTag"]:
+		attrs = dict(attrs or {})
+		attrs.update(kwargs)
+		if class_ is not None:
+			attrs["class"] = class_
+
+		# Let lxml filter on the tag name, unless namespaces make its names differ from bs4's
+		fast_name = name if isinstance(name, str) and not self._get_document().has_namespaces else None
+		if recursive:
+			elements = self._iter_descendants(fast_name)
+		else:
+			elements = self._iter_children()
+
+		results = []
+		for element in elements:
+			if self._matches(element, name, attrs):
+				results.append(self._wrap(element))
+				if limit and len(results) >= limit:
+					break
+		return results
+
+
+	def find(self, name=None, attrs: Optional[Dict] = None, recursive: bool = True,
+			class_=None, **kwargs) -> Optional["LxmlTag"]:
+		results = self.find_all(name, attrs, recursive, 1, class_, **kwargs)
+		return results[0] if results else None
+
+
+	def __call__(self, *args, **kwargs) -> List["LxmlTag"]:
+		return self.find_all(*args, **kwargs)
+
+
+	def __bool__(self) -> bool:
+		return True
+
+
+class LxmlDocument(LxmlNode):
+	"""A page parsed with lxml, standing in for the BeautifulSoup object"""
+	name = "[document]"
+	parent = None
+
+	def __init__(self, root: Optional[etree._Element], has_namespaces: bool = False):
+		self.root = root
+		self.has_namespaces = has_namespaces
+		# One wrapper per element, so identity works like it does with bs4 tags
+		self._tags: Dict[etree._Element, LxmlTag] = {}
+
+
+	def _get_document(self) -> "LxmlDocument":
+		return self
+
+
+	def _wrap(self, element: etree._Element) -> "LxmlTag":
+		tag = self._tags.get(element)
+		if tag is None:
+			tag = self._tags[element] = LxmlTag(element, self)
+		return tag
+
+
+	def _iter_children(self) -> Iterator[etree._Element]:
+		if self.root is not None:
+			yield self.root
+
+
+	def _iter_descendants(self, name: Optional[str] = None) -> Iterator[etree._Element]:
+		if self.root is not None:
+			yield from self.root.iter(name) if name else self.root.iter()
+
+
+	def get(self, key: str, default=None):
+		return default
+
+
+	@property
+	def contents(self) -> List["LxmlTag"]:
+		return [self._wrap(self.root)] if self.root is not None else []
+
+
+	def get_text(self, separator: str = "", strip: bool = False) -> str:
+		return self._wrap(self.root).get_text(separator, strip) if self.root is not None else ""
+
+
+	@property
+	def text(self) -> str:
+		return self.get_text()
+
+
+class LxmlTag(LxmlNode):
+	"""
+	Wraps an lxml element in the bs4 Tag interface, so parsers and link/image strategies
+	written against bs4 work unchanged. Text and comments in .contents are bs4 strings.
+	lxml has no separate text nodes, so text around an unwrapped or decomposed element is
+	merged into one string, where bs4 would keep several.
+	"""
+	__slots__ = ("element", "document")
+
+	def __init__(self, element: etree._Element, document: LxmlDocument):
+		self.element = element
+		self.document = document
+
+
+	def _wrap(self, element: etree._Element) -> "LxmlTag":
+		return self.document._wrap(element)
+
+
+	def _get_document(self) -> LxmlDocument:
+		return self.document
+
+
+	def _iter_children(self) -> Iterator[etree._Element]:
+		return iter(self.element)
+
+
+	def _iter_descendants(self, name: Optional[str] = None) -> Iterator[etree._Element]:
+		elements = self.element.iter(name) if name else self.element.iter()
+		# iter() starts with the element itself when it matches
+		if not name or self.element.tag == name:
+			next(elements, None)
+		return elements
+
+
+	@property
+	def name(self) -> str:
+		return get_element_name(self.element)
+
+
+	@property
+	def attrs(self) -> Dict[str, str]:
+		return get_element_attrs(self.element)
+
+
+	def get(self, key: str, default=None):
+		return self.element.get(key, default)
+
+
+	def has_attr(self, key: str) -> bool:
+		return key in self.element.attrib
+
+
+	def __getitem__(self, key: str) -> str:
+		return self.attrs[key]
+
+
+	@property
+	def parent(self) -> LxmlNode:
+		parent = self.element.getparent()
+		return self._wrap(parent) if parent is not None else self.document
+
+
+	@property
+	def contents(self) -> List[Union["LxmlTag", bs4.NavigableString]]:
+		contents = []
+		if self.element.text:
+			contents.append(bs4.NavigableString(normalize_string(self.element.text)))
+		for child in self.element:
+			if is_tag(child):
+				contents.append(self._wrap(child))
+			elif isinstance(child, etree._Comment):
+				contents.append(bs4.Comment(child.text or ""))
+			elif isinstance(child, etree._ProcessingInstruction):
+				contents.append(bs4.element.XMLProcessingInstruction(f"{child.target} {child.text or ''}"))
+			if child.tail:
+				contents.append(bs4.NavigableString(normalize_string(child.tail)))
+		return contents
+
+
+	@property
+	def children(self) -> Iterator:
+		return iter(self.contents)
+
+
+	def __iter__(self) -> Iterator:
+		return iter(self.contents)
+
+
+	def __len__(self) -> int:
+		return len(self.contents)
+
+
+	def get_text(self, separator: str = "", strip: bool = False) -> str:
+		strings = iter_strings(self.element)
+		if strip:
+			strings = (string.strip() for string in strings)
+			strings = (string for string in strings if string)
+		return separator.join(strings)
+
+
+	@property
+	def text(self) -> str:
+		return self.get_text()
+
+
+	@property
+	def string(self) -> Optional[str]:
+		contents = self.contents
+		if len(contents) != 1:
+			return None
+		child = contents[0]
+		return child if isinstance(child, str) else child.string
+
+
+	def decompose(self) -> None:
+		"""Remove the element and everything in it, keeping the text that follows it"""
+		element = self.element
+		if element.getparent() is None:
+			return
+		add_text_before(element, element.tail)
+		element.getparent().remove(element)
+
+
+	def unwrap(self) -> "LxmlTag":
+		"""Replace the element with its contents"""
+		element = self.element
+		if element.getparent() is None:
+			raise ValueError("Cannot replace an element without a parent")
+
+		add_text_before(element, element.text)
+		for child in list(element):
+			element.addprevious(child)
+		add_text_before(element, element.tail)
+
+		element.tail = None
+		element.getparent().remove(element)
+		return self
+
+
+	def __str__(self) -> str:
+		return etree.tostring(self.element, encoding="unicode", with_tail=False)
+
+
+	__repr__ = __str__
+
+
+class LxmlToYomitanConverter(HTMLToYomitanConverter):
+	"""
+	Converts pages parsed with parse_lxml_document by walking the lxml elements directly,
+	instead of going through bs4's .contents and .attrs. Link and image strategies get
+	LxmlTag wrappers, and the output is the same as HTMLToYomitanConverter's, except that
+	namespace declarations don't show up as data attributes like they do with bs4.
+	bs4 elements, e.g. from pages parsed as HTML, are passed on to HTMLToYomitanConverter.
+	"""
+
+	def convert_element_to_yomitan(self, html_glossary=None, ignore_expressions: bool = False) -> Optional[Dict]:
+		if isinstance(html_glossary, LxmlTag):
+			return self._convert_lxml_child(html_glossary.element, html_glossary.document, ignore_expressions)
+		return super().convert_element_to_yomitan(html_glossary, ignore_expressions=ignore_expressions)
+
+
+	def _get_lxml_class_list_and_data(self, element: etree._Element, name: str) -> Tuple[List[str], Dict[str, str]]:
+		"""Same as get_class_list_and_data, for an lxml element"""
+		class_value = element.get("class")
+		class_list = class_value.split(" ") if class_value is not None else []
+		if name and not class_list and name not in YOMITAN_SUPPORTED_TAGS:
+			class_list.append(name)
+
+		data_dict = {}
+		data_dict[name] = ""
+
+		for cls in class_list:
+			data_dict[cls.replace("-", "_")] = ""
+
+		for attribute, value in element.attrib.items():
+			attribute = get_attribute_name(element, attribute)
+			data_dict[attribute.replace("-", "_")] = value
+
+		return class_list, data_dict
+
+
+	def _convert_lxml_child(self, element: etree._Element, document: LxmlDocument,
+							ignore_expressions: bool) -> Optional[Dict]:
+		# Fragments are keyed by the LxmlTag wrappers, like the elements the parser passes in
+		if self._fragments is not None:
+			return self._record_conversion(document._wrap(element), ignore_expressions,
+											lambda flag: self._convert_lxml_element(element, document, flag))
+		return self._convert_lxml_element(element, document, ignore_expressions)
+
+
+	def _convert_lxml_element(self, element: etree._Element, document: LxmlDocument,
+							ignore_expressions: bool) -> Optional[Dict]:
+		name = get_element_name(element)
+		tag_name = name.lower()
+		if tag_name in self.ignored_elements:
+			return None
+
+		if ignore_expressions and self.expression_element and tag_name == self.expression_element:
+			return None
+
+		class_list, data_dict = self._get_lxml_class_list_and_data(element, name)
+
+		# Recursively process children elements
+		html_elements = []
+		has_contents = bool(element.text) or len(element) > 0
+		if element.text:
+			html_elements.append(create_html_element("span", normalize_string(element.text)))
+		for child in element:
+			if is_tag(child):
+				converted_element = self._convert_lxml_child(child, document, ignore_expressions)
+				if converted_element is not None:
+					html_elements.append(converted_element)
+			elif isinstance(child, etree._ProcessingInstruction):
+				html_elements.append(create_html_element("span", f"{child.target} {child.text or ''}"))
+			if child.tail:
+				html_elements.append(create_html_element("span", normalize_string(child.tail)))
+
+		# Special case for img tags without contents
+		if not has_contents and tag_name == "img":
+			img_element = self.handle_image_element(document._wrap(element), html_elements, data_dict, class_list)
+			if img_element:
+				return img_element
+
+		if not html_elements:
+			return None
+
+		# Check if all elements in the list are empty strings or whitespace-only strings
+		if all(isinstance(elem, dict) and
+			elem.get('content') and
+			(not elem['content'] or
+				(isinstance(elem['content'], str) and elem['content'].isspace()))
+			for elem in html_elements):
+			return None
+
+		# add elements that yomitan supports
+		if tag_name in YOMITAN_SUPPORTED_TAGS:
+			return create_html_element(name, content=html_elements, data=data_dict)
+
+		html_glossary = document._wrap(element)
+
+		# map any custom tags to html
+		target_tag = self.get_target_tag(name, class_list, html_glossary.parent)
+
+		# Handle image elements where the content isnt empty
+		if tag_name == "img" and has_contents:
+			element = self.handle_image_element(html_glossary, html_elements, data_dict, class_list)
+			if element:
+				return element
+
+		# Handle link elements
+		if tag_name == "a" or html_glossary.get("href", ""):
+			element = self.handle_link_element(html_glossary, html_elements, data_dict, class_list)
+			if element:
+				return element
+
+		return create_html_element(target_tag, content=html_elements, data=data_dict)
@@ -0,0 +1,136 @@
+import os
+import sys
+import json
+import glob
+import pickle
+import sqlite3
+import hashlib
+import importlib
+import dataclasses
+from pathlib import Path
+from typing import Iterable, List, Optional, Tuple
+
+# Shared modules whose changes affect every parser
+SOURCE_ROOT = Path(__file__).parent.parent
+SHARED_SOURCE_DIRS = ["core", "strategies", "utils", "handlers", "index"]
+# Config fields that only affect how the output is written or scheduled, not the parse results
+OUTPUT_CONFIG_FIELDS = {"rev_name", "memory_estimate_mb", "index_backend", "validation", "minimize_content",
+                        "term_bank_size_mb"}
+
+
+class PageCache:
+    """
+    Persistent per-page cache of parse results, stored in SQLite.
+
+    Pages are keyed by a hash of their XML, their index keys and a fingerprint of
+    the code, mappings and config used to convert them. Unchanged pages can be replayed
+    from the cache instead of going through bs4 again. Rows that weren't used by a
+    complete run are pruned, so pages whose XML or keys changed don't pile up.
+    """
+
+    def __init__(self, cache_dir: str, fingerprint: str):
+        os.makedirs(cache_dir, exist_ok=True)
+
+        self.fingerprint = fingerprint
+        self.db_path = os.path.join(cache_dir, "pages.sqlite")
+        self.hits = 0
+        self.misses = 0
+
+        self.connection = sqlite3.connect(self.db_path)
+        self.connection.execute(
+            "CREATE TABLE IF NOT EXISTS pages (key TEXT PRIMARY KEY, fingerprint TEXT, result BLOB)"
+        )
+        # Keys hit or written during this run
+        self.connection.execute("CREATE TEMP TABLE used (key TEXT PRIMARY KEY)")
+
+        # Results produced by a different version of the code can never be hit again
+        self.connection.execute("DELETE FROM pages WHERE fingerprint != ?", (fingerprint,))
+        self.connection.commit()
+
+
+    @classmethod
+    def for_parser(cls, cache_dir: str, parser) -> 'PageCache':
+        return cls(cache_dir, cls.compute_fingerprint(parser))
+
+
+    @staticmethod
+    def compute_fingerprint(parser) -> str:
+        """Hash the parser package, strategies, shared code, tag map, JMdict files and parse settings"""
+        config = parser.config
+        source_dirs = {SOURCE_ROOT / name for name in SHARED_SOURCE_DIRS}
+
+        for module_name in (parser.__class__.__module__, config.link_strategy_module, config.image_strategy_module):
+            module = sys.modules.get(module_name) or importlib.import_module(module_name)
+            source_dirs.add(Path(module.__file__).parent)
+
+        source_files = set()
+        for source_dir in source_dirs:
+            for pattern in ("*.py", "*.json"):
+                source_files.update(Path(p) for p in glob.glob(str(source_dir / "**" / pattern), recursive=True))
+
+        if config.tag_map_path and os.path.exists(config.tag_map_path):
+            source_files.add(Path(config.tag_map_path).resolve())
+
+        digest = hashlib.sha256()
+        for source_file in sorted(source_files):
+            if "__pycache__" in source_file.parts:
+                continue
+            digest.update(os.path.relpath(source_file, SOURCE_ROOT.parent).encode("utf-8"))
+            digest.update(source_file.read_bytes())
+
+        # JMdict is large, so only its file stats are used
+        if config.jmdict_path:
+            for term_bank in sorted(glob.glob(os.path.join(config.jmdict_path, "term_bank_*.json"))):
+                stat = os.stat(term_bank)
+                digest.update(f"{os.path.basename(term_bank)}:{stat.st_size}:{stat.st_mtime_ns}".encode("utf-8"))
+
+        settings = {name: value for name, value in dataclasses.asdict(config).items()
+                    if name not in OUTPUT_CONFIG_FIELDS}
+        digest.update(json.dumps(settings, sort_keys=True, ensure_ascii=False, default=str).encode("utf-8"))
+
+        return digest.hexdigest()
+
+
+    def page_key(self, filename: str, xml, index_keys: Iterable[str]) -> str:
+        # Pages from JSON sources (e.g. TISMKANJI) aren't strings
+        if not isinstance(xml, str):
+            xml = repr(xml)
+            
+        digest = hashlib.sha256(self.fingerprint.encode("utf-8"))
+        digest.update(str(filename).encode("utf-8"))
+        digest.update(b"\0")
+        digest.update(xml.encode("utf-8"))
+        digest.update(b"\0")
+        digest.update("\t".join(index_keys).encode("utf-8"))
+        return digest.hexdigest()
+
+
+    def get(self, key: str) -> Optional[Tuple]:
+        row = self.connection.execute("SELECT result FROM pages WHERE key = ?", (key,)).fetchone()
+        if row is None:
+            self.misses += 1
+            return None
+
+        self.hits += 1
+        self.connection.execute("INSERT OR IGNORE INTO used (key) VALUES (?)", (key,))
+        return pickle.loads(row[0])
+
+
+    def put_many(self, items: List[Tuple[str, Tuple]]) -> None:
+        self.connection.executemany(
+            "INSERT OR REPLACE INTO pages (key, fingerprint, result) VALUES (?, ?, ?)",
+            [(key, self.fingerprint, pickle.dumps(result, protocol=pickle.HIGHEST_PROTOCOL)) for key, result in items]
+        )
+        self.connection.executemany("INSERT OR IGNORE INTO used (key) VALUES (?)", [(key,) for key, _ in items])
+        self.connection.commit()
+
+
+    def prune(self) -> int:
+        """Delete the pages this run didn't use, only call it after every page has been looked up"""
+        removed = self.connection.execute("DELETE FROM pages WHERE key NOT IN (SELECT key FROM used)").rowcount
+        self.connection.commit()
+        return removed
+
+
+    def close(self) -> None:
+        self.connection.close()
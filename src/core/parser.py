@@ -1,29 +1,64 @@
+import os
+import random
 from abc import ABC, abstractmethod
+from collections import deque
+from itertools import islice
+from concurrent.futures import ProcessPoolExecutor
 from typing import Dict, List, Tuple, Optional, Set, Iterator
 import bs4
 import jaconv
 from tqdm import tqdm
 
-from utils import FileUtils, KanjiUtils, sudachi_rules
+from utils import FileUtils, KanjiUtils, XmlPageSource, sudachi_rules, get_metrics
 from core.yomitan_dictionary import DicEntry, create_html_element
+from core.page_cache import PageCache
+from core.html_converter import HTMLToYomitanConverter
+from core.lxml_converter import LxmlToYomitanConverter, parse_lxml_document
+
+
+# Parser instance owned by each worker process in parallel mode
+_worker_parser = None
+
+
+def _init_worker(config) -> None:
+    """Build a parser for this worker process from the dictionary config"""
+    global _worker_parser
+    _worker_parser = config.get_parser_class()(config)
+    
+    
+def _run_worker_batch(batch: List[Tuple[str, str]]) -> Tuple[List[Tuple[int, List[DicEntry], Dict]], Dict]:
+    # Only send back the metrics of this batch
+    metrics = get_metrics()
+    metrics.reset()
+    results = [_worker_parser._process_page(filename, xml) for filename, xml in batch]
+    return results, metrics.snapshot()
 
 
 class Parser(ABC):
     def __init__(self, config, batch_size: int = 250):
         
         from core import Dictionary, HTMLToYomitanConverter
-        from index import IndexReader
         from handlers import ManualMatchHandler
         
+        metrics = get_metrics()
+        
         self.config = config
-        self.dictionary = Dictionary(config.dict_name)
-        self.index_reader = IndexReader(config.index_path) if config.index_path else None
-        self.dict_data = FileUtils.read_xml_files(config.dict_path) if config.dict_path else None
-        self.jmdict_data = FileUtils.load_term_banks(config.jmdict_path) if config.jmdict_path else {}
+        bank_size = int(config.term_bank_size_mb * 1024 * 1024) if config.term_bank_size_mb else None
+        self.dictionary = Dictionary(config.dict_name, validation=config.validation, bank_size=bank_size)
+        with metrics.phase("init.index_load"):
+            index_reader_class = self._get_index_reader_class(config.index_backend)
+            self.index_reader = index_reader_class(config.index_path) if config.index_path else None
+        self.dict_data = XmlPageSource(config.dict_path) if config.dict_path else None
+        with metrics.phase("init.jmdict_load"):
+            self.jmdict_data = FileUtils.load_term_banks(config.jmdict_path) if config.jmdict_path else {}
         self.tag_mapping = FileUtils.load_json(config.tag_map_path) if config.tag_map_path else {}
-        self.manual_handler = ManualMatchHandler() if config.index_path else None
+        self.manual_handler = ManualMatchHandler(mode=config.unmatched_mode) if config.index_path else None
         
         self.batch_size = batch_size
+        self._conversion_cache = {}
+        self.page_cache = None
+        self.page_profiler = None
+        self.sampled = False
         self.link_handling_strategy = config.create_link_strategy()
         self.image_handling_strategy = config.create_image_strategy()
             
@@ -31,7 +66,8 @@ class Parser(ABC):
         self.expression_element = config.expression_element
         self.parse_all_links = config.parse_all_links
         
-        self.html_converter = HTMLToYomitanConverter(
+        converter_class = self._get_converter_class(config.converter_backend)
+        self.html_converter = converter_class(
             tag_mapping=self.tag_mapping,
             ignored_elements=self.ignored_elements,
             expression_element=self.expression_element,
@@ -43,6 +79,26 @@ class Parser(ABC):
         self.bar_format = "「{desc}: {bar:30}」{percentage:3.0f}% | {n_fmt}/{total_fmt} {unit} [経過: {elapsed} | 残り: {remaining}]{postfix}"
         
         
+    @staticmethod
+    def _get_converter_class(backend: str) -> type:
+        if backend == "bs4":
+            return HTMLToYomitanConverter
+        if backend == "lxml":
+            return LxmlToYomitanConverter
+        raise ValueError(f"Unknown converter backend: {backend} (expected bs4 or lxml)")
+    
+    
+    @staticmethod
+    def _get_index_reader_class(backend: str) -> type:
+        from index import IndexReader, MmapIndexReader
+        
+        if backend == "memory":
+            return IndexReader
+        if backend == "mmap":
+            return MmapIndexReader
+        raise ValueError(f"Unknown index backend: {backend} (expected memory or mmap)")
+    
+    
     def get_target_tag(self, tag_name: str, class_list: Optional[List[str]] = None,
                        parent: Optional[bs4.element.Tag] = None, recursion_depth: int = 0) -> str:
         """
@@ -86,6 +142,19 @@ class Parser(ABC):
         return self.html_converter.get_class_list_and_data(html_glossary)
     
     
+    def parse_xml(self, xml: str, features: str = "xml") -> bs4.BeautifulSoup:
+        """
+        Parse a page with bs4, or with lxml for dictionaries using the lxml backend.
+        Pages parsed as HTML always go through bs4.
+        """
+        if features == "xml" and self.config.converter_backend == "lxml":
+            with get_metrics().phase("parse.lxml", count=1):
+                return parse_lxml_document(xml)
+            
+        with get_metrics().phase("parse.bs4", count=1):
+            return bs4.BeautifulSoup(xml, features)
+    
+    
     def convert_element_to_yomitan(self, html_glossary: Optional[bs4.element.Tag] = None,
                                    ignore_expressions: bool = False) -> Optional[Dict]:
         """Recursively converts HTML elements into Yomitan JSON format"""
@@ -94,6 +163,41 @@ class Parser(ABC):
         )
     
     
+    def convert_element_cached(self, html_glossary: bs4.element.Tag,
+                               ignore_expressions: bool = False) -> Optional[Dict]:
+        """
+        Convert an element once per file and reuse the result.
+        Pages with several headwords share the same converted glossary.
+        """
+        key = (id(html_glossary), ignore_expressions)
+        cached = self._conversion_cache.get(key)
+        
+        # Keep a reference to the element so its id can't be reused within the file
+        if cached is not None and cached[0] is html_glossary:
+            return cached[1]
+        
+        with get_metrics().phase("parse.conversion", count=1):
+            yomitan_element = self.convert_element_to_yomitan(html_glossary, ignore_expressions=ignore_expressions)
+        self._conversion_cache[key] = (html_glossary, yomitan_element)
+        return yomitan_element
+    
+    
+    def convert_page(self, soup: bs4.BeautifulSoup) -> None:
+        """
+        Convert the page's top-level elements without their expression elements, and cache
+        the conversion of every element below them along the way. Expression entries that go
+        through convert_element_cached afterwards reuse those instead of converting the
+        expression subtrees a second time.
+        """
+        for tag in soup.find_all(recursive=False):
+            cached = self._conversion_cache.get((id(tag), True))
+            if cached is not None and cached[0] is tag:
+                continue
+            
+            with get_metrics().phase("parse.conversion", count=1):
+                self.html_converter.convert_element_with_fragments(tag, self._conversion_cache)
+    
+    
     def parse_entry(self, 
                     entry_key: str, 
                     reading: str, 
@@ -121,7 +225,7 @@ class Parser(ABC):
         )
         
         for tag in soup.find_all(recursive=False):
-            yomitan_element = self.convert_element_to_yomitan(tag, ignore_expressions=ignore_expressions)
+            yomitan_element = self.convert_element_cached(tag, ignore_expressions=ignore_expressions)
             
             if yomitan_element:
                 entry.add_element(yomitan_element)
@@ -136,13 +240,79 @@ class Parser(ABC):
     def _process_batch(self, batch: List[Tuple[str, str]]) -> int:
         batch_count = 0
         for filename, xml in batch:
+            self._conversion_cache.clear()
+            if self.page_profiler:
+                self.page_profiler.start_page()
+                
+            page_count = 0
             try:
-                batch_count += self._process_file(filename, xml)
+                page_count = self._process_file(filename, xml)
+                batch_count += page_count
             except Exception as e:
                 print(f"Error processing file {filename}: {str(e)}")
+                
+            if self.page_profiler:
+                self.page_profiler.end_page(filename, xml, page_count)
+                
+        self._record_tag_cache_stats()
         return batch_count
     
     
+    def _record_tag_cache_stats(self) -> None:
+        """Move the converter's tag cache counters into the build metrics"""
+        metrics = get_metrics()
+        metrics.increment("tag_cache.hits", self.html_converter.tag_cache_hits)
+        metrics.increment("tag_cache.misses", self.html_converter.tag_cache_misses)
+        self.html_converter.tag_cache_hits = 0
+        self.html_converter.tag_cache_misses = 0
+    
+    
+    def _process_page(self, filename: str, xml: str) -> Tuple[int, List[DicEntry], Dict]:
+        """Process a single page and hand back the entries and handler state it produced"""
+        with self.dictionary.capture_entries() as entries:
+            page_count = self._process_batch([(filename, xml)])
+        
+        return page_count, entries, self._drain_handler_state()
+    
+    
+    def _add_page_result(self, page_result: Tuple[int, List[DicEntry], Dict]) -> int:
+        """Add the entries and handler state of a processed page"""
+        page_count, entries, state = page_result
+        for entry in entries:
+            self.dictionary.add_entry(entry)
+        self._merge_handler_state(state)
+        return page_count
+    
+    
+    def _get_audio_handlers(self) -> Dict[str, object]:
+        """Find audio handler attributes, which collect state alongside the dictionary"""
+        handlers = {}
+        for attr_name in dir(self):
+            attr = getattr(self, attr_name)
+            if hasattr(attr, '__class__') and 'AudioHandler' in attr.__class__.__name__:
+                handlers[attr_name] = attr
+        return handlers
+    
+    
+    def _get_state_handlers(self) -> Dict[str, object]:
+        """Handlers that collect state while pages are processed"""
+        handlers = self._get_audio_handlers()
+        if self.manual_handler:
+            handlers["manual_handler"] = self.manual_handler
+        return handlers
+    
+    
+    def _drain_handler_state(self) -> Dict:
+        """Collect and reset state gathered by handlers while processing a page"""
+        return {name: handler.drain() for name, handler in self._get_state_handlers().items()}
+    
+    
+    def _merge_handler_state(self, state: Dict) -> None:
+        """Merge handler state collected while processing a page"""
+        for name, handler_state in state.items():
+            getattr(self, name).merge(handler_state)
+    
+    
     @abstractmethod
     def _process_file(self, filename: str, xml: str) -> int:
         """Process a single file - to be implemented by derived classes"""
@@ -150,21 +320,107 @@ class Parser(ABC):
         
         
     def _get_batches(self) -> Iterator[List[Tuple[str, str]]]:
-        """Split the input into batches"""
-        items = list(self.dict_data.items())
-        for i in range(0, len(items), self.batch_size):
-            yield items[i:i + self.batch_size]
+        """Split the input into batches, reading pages lazily"""
+        items = iter(self.dict_data.items())
+        while True:
+            batch = list(islice(items, self.batch_size))
+            if not batch:
+                break
+            yield batch
+            
+    
+    def sample_pages(self, count: int, seed: int = 0) -> None:
+        """Restrict the pages to a reproducible random subset, keeping their order"""
+        self.sampled = True
+        if hasattr(self.dict_data, "sample"):
+            self.dict_data.sample(count, seed)
+        elif count < len(self.dict_data):
+            chosen = set(random.Random(seed).sample(range(len(self.dict_data)), count))
+            self.dict_data = {key: value for i, (key, value) in enumerate(self.dict_data.items()) if i in chosen}
         
     
-    def parse(self) -> int:
-        """Parse the dictionary with batch processing"""
+    def _get_cache_keys(self, filename: str) -> List[str]:
+        """Index keys that affect how a page is parsed, used in its cache key"""
+        if not self.index_reader:
+            return []
+        return self.index_reader.get_keys_for_file(os.path.splitext(str(filename))[0])
+    
+    
+    def _dispatch_batch(self, batch: List[Tuple[str, str]], executor: Optional[ProcessPoolExecutor]) -> Dict:
+        """Look up cached pages of a batch and start processing the rest"""
+        job = {"size": len(batch), "results": [None] * len(batch), "misses": [], "future": None}
+        
+        for i, (filename, xml) in enumerate(batch):
+            if self.page_cache:
+                key = self.page_cache.page_key(filename, xml, self._get_cache_keys(filename))
+                job["results"][i] = self.page_cache.get(key)
+            else:
+                key = None
+                
+            if job["results"][i] is None:
+                job["misses"].append((i, key))
+                
+        missed_pages = [batch[i] for i, _ in job["misses"]]
+        if executor and missed_pages:
+            job["future"] = executor.submit(_run_worker_batch, missed_pages)
+        else:
+            for (i, _), (filename, xml) in zip(job["misses"], missed_pages):
+                job["results"][i] = self._process_page(filename, xml)
+                
+        return job
+    
+    
+    def _collect_batch(self, job: Dict) -> int:
+        """Store newly processed pages in the cache and add all results in page order"""
+        if job["future"]:
+            page_results, worker_metrics = job["future"].result()
+            get_metrics().merge(worker_metrics)
+            for (i, _), page_result in zip(job["misses"], page_results):
+                job["results"][i] = page_result
+                
+        if self.page_cache and job["misses"]:
+            self.page_cache.put_many([(key, job["results"][i]) for i, key in job["misses"]])
+            
+        return sum(self._add_page_result(page_result) for page_result in job["results"])
+    
+    
+    def parse(self, workers: int = 1, page_cache: Optional[PageCache] = None) -> int:
+        """
+        Parse the dictionary with batch processing.
+        With workers > 1, batches are dispatched to a process pool and merged in the
+        original batch order so the output matches a serial run. Pages found in the
+        page cache are replayed instead of being parsed again.
+        """
+        self.page_cache = page_cache
         count = 0
+        max_pending = workers * 2 if workers > 1 else 1
+        pending = deque()
         
-        with tqdm(total=len(self.dict_data), desc="進歩", bar_format=self.bar_format, unit="事項") as pbar:
-            for batch in self._get_batches():
-                batch_count = self._process_batch(batch)
-                count += batch_count
-                pbar.update(len(batch))
+        executor = None
+        if workers > 1:
+            executor = ProcessPoolExecutor(max_workers=workers, initializer=_init_worker, initargs=(self.config,))
+        
+        try:
+            with tqdm(total=len(self.dict_data), desc="進歩", bar_format=self.bar_format, unit="事項") as pbar:
+                for batch in self._get_batches():
+                    pending.append(self._dispatch_batch(batch, executor))
+                    
+                    # Bound the number of batches in flight
+                    while len(pending) >= max_pending:
+                        job = pending.popleft()
+                        count += self._collect_batch(job)
+                        pbar.update(job["size"])
+                        
+                while pending:
+                    job = pending.popleft()
+                    count += self._collect_batch(job)
+                    pbar.update(job["size"])
+        finally:
+            if executor:
+                executor.shutdown()
+            
+        if self.page_cache:
+            print(f"ページキャッシュ: {self.page_cache.hits} ヒット, {self.page_cache.misses} ミス")
         
         return count
     
@@ -173,10 +429,12 @@ class Parser(ABC):
         """Export the dictionary to the specified path"""
         self.dictionary.export(output_path)
         
+        # Write unmatched entries queued for the review command
+        if self.manual_handler and self.manual_handler.mode == "queue" and output_path:
+            self.manual_handler.export_queue(self.manual_handler.get_review_path(output_path, self.config.dict_name))
+        
         # Export audio if it exists
-        for attr_name in dir(self):
-            attr = getattr(self, attr_name)
-            if hasattr(attr, '__class__') and 'AudioHandler' in attr.__class__.__name__:
-                # If it has an export method, call it
-                if hasattr(attr, 'export') and callable(attr.export):
-                    attr.export()
\ No newline at end of file
+        for handler in self._get_audio_handlers().values():
+            # If it has an export method, call it
+            if hasattr(handler, 'export') and callable(handler.export):
+                handler.export()
\ No newline at end of file
@@ -2,17 +2,254 @@ import json
 import os
 import zipfile
 import shutil
+from contextlib import contextmanager
 from tqdm import tqdm
 
+from utils.file_utils import REFERENCED_ASSETS_FILE
+from utils.build_metrics import get_metrics
+
+ALLOWED_ELEMENTS = frozenset({
+    "br", "ruby", "rt", "rp", "table", "thead", "tbody", "tfoot", "tr", "td", "th",
+    "span", "div", "ol", "ul", "li", "img", "a", "details", "summary"
+})
+ALLOWED_HREF_ELEMENTS = frozenset({"a"})
+
+VALIDATION_MODES = ("off", "sample", "full")
+# With validation "sample", one in this many entries is validated
+VALIDATION_SAMPLE_RATE = 100
+
+# Term banks are split at this many entries when no size budget is configured
+DEFAULT_ENTRIES_PER_BANK = 10000
+
+
+def _format_content_path(path):
+    """Turn a (parent_path, tag, index) chain into 'In div > content[0] > span > content[2]: '"""
+    parts = []
+    while path:
+        path, tag, index = path
+        parts.append(f"{tag} > content[{index}]")
+    if not parts:
+        return ""
+    return f"In {' > '.join(reversed(parts))}: "
+
+
+def is_valid_element(element):
+    """Whether a structured content element only uses elements and attributes Yomitan supports"""
+    stack = [element]
+    while stack:
+        element = stack.pop()
+        tag = element["tag"]
+        if tag not in ALLOWED_ELEMENTS or ("href" in element and tag not in ALLOWED_HREF_ELEMENTS):
+            return False
+        
+        content = element.get("content", "")
+        if type(content) is list:
+            for child_element in content:
+                if type(child_element) is dict:
+                    stack.append(child_element)
+                elif not isinstance(child_element, str):
+                    return False
+        elif not isinstance(content, str):
+            return False
+    return True
+
+
+def validate_element(element):
+    """
+    Check a structured content element and raise ValueError with the path to the first invalid element.
+    Valid content only takes the fast check, the path is only worked out for invalid content.
+    """
+    if is_valid_element(element):
+        return
+    
+    stack = [(element, None)]
+    while stack:
+        element, path = stack.pop()
+        tag = element["tag"]
+        
+        if tag not in ALLOWED_ELEMENTS:
+            raise ValueError(f"{_format_content_path(path)}Unsupported HTML element: {tag}")
+        
+        if "href" in element and tag not in ALLOWED_HREF_ELEMENTS:
+            raise ValueError(f"{_format_content_path(path)}The 'href' attribute is not allowed in the '{tag}' element, only <a>.")
+        
+        if "content" not in element:
+            continue
+        
+        content = element["content"]
+        if content is None:
+            raise ValueError(f"{_format_content_path(path)}Element '{tag}' has 'None' as content, which is invalid")
+        
+        elif isinstance(content, list):
+            # Pushed in reverse so elements are checked in document order
+            for i in range(len(content) - 1, -1, -1):
+                child_element = content[i]
+                if isinstance(child_element, dict):
+                    stack.append((child_element, (path, tag, i)))
+                elif not isinstance(child_element, str):
+                    raise ValueError(f"{_format_content_path((path, tag, i))}Element {tag} has invalid content at index {i}: expected string or element dict, got {type(child_element).__name__} - Value: {repr(child_element)}")
+        
+        elif not isinstance(content, str):
+            raise ValueError(f"{_format_content_path(path)}Element '{tag}' has invalid content: expected string or list of elements, got {type(content).__name__} - Value: {repr(content)}")
+
+
+class TermBankWriter:
+    """
+    Writes term banks to disk as entries arrive.
+    Entries are assigned sequential ids, encoded as they are added, and written straight
+    to the open term_bank_N.json, so no entries are held in memory. The bank is closed
+    when the next entry would take it over bank_size bytes, or at entries_per_bank
+    entries when there is no byte budget.
+    Banks are written to a folder, or straight into an open zip file.
+    Structured content is validated as it is written: every entry, every
+    VALIDATION_SAMPLE_RATE-th one, or none, depending on validation. Invalid entries are skipped.
+    With a minimizer, the content is minimized after it has been validated.
+    """
+    
+    def __init__(self, folder_name=None, entries_per_bank=DEFAULT_ENTRIES_PER_BANK, zip_file=None, validation="full",
+                 minimizer=None, bank_size=None):
+        if validation not in VALIDATION_MODES:
+            raise ValueError(f"Unknown validation mode: {validation}, expected one of {', '.join(VALIDATION_MODES)}")
+        
+        self.folder_name = folder_name
+        self.zip_file = zip_file
+        self.entries_per_bank = entries_per_bank
+        self.bank_size = bank_size
+        self.validation = validation
+        self.minimizer = minimizer
+        self.file_counter = 1
+        self.entry_id = 0
+        self.bank_file = None
+        self.bank_entries = 0
+        self.bank_bytes = 0
+        self.structured_count = 0
+        
+    def _is_valid(self, entry):
+        if self.validation == "off" or not entry.structured_content:
+            return True
+        
+        # The same entries are sampled every run, so a failure can be reproduced
+        self.structured_count += 1
+        if self.validation == "sample" and (self.structured_count - 1) % VALIDATION_SAMPLE_RATE:
+            return True
+        
+        metrics = get_metrics()
+        with metrics.phase("export.validation", count=1):
+            try:
+                entry.validate()
+            except ValueError as e:
+                print(f"無効な項目をスキップします: {entry.word}: {e}")
+                metrics.increment("validation.invalid")
+                return False
+        return True
+        
+    def add(self, entry):
+        if not self._is_valid(entry):
+            return
+        
+        entry_list = entry.to_list()
+        entry_list[6] = self.entry_id
+        if self.minimizer and entry.structured_content:
+            entry_list[5] = [{"type": "structured-content", "content": self.minimizer.minimize(entry.content)}]
+        encoded = json.dumps(entry_list, ensure_ascii=False).encode("utf-8")
+        self.entry_id += 1
+        
+        # Brackets and the ", " separator count towards the budget too
+        if self.bank_file and self.bank_size and self.bank_bytes + len(encoded) + 2 > self.bank_size:
+            self.flush()
+            
+        if self.bank_file:
+            self.bank_file.write(b", ")
+        else:
+            self._open_bank()
+        self.bank_file.write(encoded)
+        self.bank_entries += 1
+        self.bank_bytes += len(encoded) + 2
+        
+        if not self.bank_size and self.bank_entries >= self.entries_per_bank:
+            self.flush()
+            
+    def _open_bank(self):
+        bank_name = f"term_bank_{self.file_counter}.json"
+        if self.zip_file:
+            # Compressed with the zip's own compression and level
+            self.bank_file = self.zip_file.open(bank_name, "w")
+        else:
+            self.bank_file = open(os.path.join(self.folder_name, bank_name), "wb")
+        self.bank_file.write(b"[")
+        
+    def flush(self):
+        if not self.bank_file:
+            return
+        
+        # Same bytes json.dumps would write for the whole bank
+        self.bank_file.write(b"]")
+        self.bank_file.close()
+        
+        self.bank_file = None
+        self.bank_entries = 0
+        self.bank_bytes = 0
+        self.file_counter += 1
+        
+    def close(self):
+        self.flush()
+
+
+def collect_image_paths(content, paths):
+    """Add the path of every img element in structured content to paths"""
+    stack = [content]
+    while stack:
+        node = stack.pop()
+        if isinstance(node, list):
+            stack.extend(node)
+        elif isinstance(node, dict):
+            if node.get("tag") == "img" and node.get("path"):
+                paths.add(node["path"])
+            if "content" in node:
+                stack.append(node["content"])
+
+
 class Dictionary:
-    def __init__(self, dictionary_name):
+    def __init__(self, dictionary_name, validation="full", bank_size=None):
         self.dictionary_name = dictionary_name
+        self.validation = validation
+        self.bank_size = bank_size
+        self.minimizer = None
         self.entries = []
+        self.writer = None
+        self._captured_entries = None
+        self.referenced_assets = set()
         
     def add_entry(self, entry):
-        self.entries.append(entry)
+        if self._captured_entries is not None:
+            self._captured_entries.append(entry)
+            return
         
-    def export(self, output_path=None):
+        if entry.structured_content:
+            collect_image_paths(entry.content, self.referenced_assets)
+            
+        if self.writer:
+            self.writer.add(entry)
+        else:
+            self.entries.append(entry)
+            
+    @property
+    def entry_count(self):
+        if self.writer:
+            return self.writer.entry_id
+        return len(self.entries)
+            
+    @contextmanager
+    def capture_entries(self):
+        """Collect the entries added inside the block instead of adding them to the dictionary"""
+        previous = self._captured_entries
+        self._captured_entries = []
+        try:
+            yield self._captured_entries
+        finally:
+            self._captured_entries = previous
+            
+    def _prepare_folder(self, output_path=None):
         folder_name = self.dictionary_name
         
         if output_path:
@@ -23,8 +260,9 @@ class Dictionary:
             shutil.rmtree(folder_name)
             
         os.makedirs(folder_name, exist_ok=True)
-        
-        # Save index.json
+        return folder_name
+    
+    def _write_index(self, folder_name):
         index_json = {
             "title": self.dictionary_name,
             "format": 3,
@@ -34,44 +272,74 @@ class Dictionary:
         with open(index_file, 'w', encoding='utf-8') as out_file:
             json.dump(index_json, out_file, ensure_ascii=False)
             
-        file_counter = 1
-        entry_counter = 0
-        dictionary = []
-        entry_id = 0
+    def _write_referenced_assets(self, folder_name):
+        # Lets a later --repackage package only the assets entries point to
+        assets_file = os.path.join(folder_name, REFERENCED_ASSETS_FILE)
+        with open(assets_file, 'w', encoding='utf-8') as out_file:
+            json.dump(sorted(self.referenced_assets), out_file, ensure_ascii=False, indent=1)
+            
+    def stream_to(self, output_path=None):
+        """Write term banks while entries are added instead of holding them until export()"""
+        folder_name = self._prepare_folder(output_path)
+        self._start_writer(self._create_writer(folder_name))
+        
+    def stream_to_zip(self, zip_file):
+        """Write term banks straight into an open zip file, without an intermediate folder"""
+        self._start_writer(self._create_writer(zip_file=zip_file))
+        
+    def _create_writer(self, folder_name=None, zip_file=None):
+        return TermBankWriter(folder_name, zip_file=zip_file, validation=self.validation, minimizer=self.minimizer,
+                              bank_size=self.bank_size)
+        
+    def _report_minimized(self):
+        if not self.minimizer or not self.minimizer.bytes_before:
+            return
+        
+        saved = self.minimizer.bytes_saved
+        get_metrics().increment("minimize.bytes_saved", saved)
+        print(f"{self.dictionary_name}: 構造化コンテンツを {saved:,} バイト削減しました "
+              f"({saved / self.minimizer.bytes_before:.1%})")
+        
+    def _start_writer(self, writer):
+        self.writer = writer
+        
+        # Entries added before streaming started go first
+        for entry in self.entries:
+            self.writer.add(entry)
+        self.entries = []
+        
+    def export(self, output_path=None):
+        if self.writer:
+            self.writer.close()
+            self._report_minimized()
+            
+            # The zip gets the dictionary's own index.json from the data folder
+            if self.writer.folder_name:
+                self._write_index(self.writer.folder_name)
+                self._write_referenced_assets(self.writer.folder_name)
+            return
+        
+        folder_name = self._prepare_folder(output_path)
+        self._write_index(folder_name)
+        self._write_referenced_assets(folder_name)
         
         # Create a progress bar for processing entries
         total_entries = len(self.entries)
         bar_format = "「{desc}: {bar:30}」{percentage:3.0f}% | {n_fmt}/{total_fmt} {unit}"
         pbar = tqdm(total=total_entries, desc="辞書をエクスポート中", bar_format=bar_format)
         
+        writer = self._create_writer(folder_name)
         for entry in self.entries:
-            entry_list = entry.to_list()
-            entry_list[6] = entry_id
-            dictionary.append(entry_list)
-            entry_counter += 1
-            entry_id += 1
+            writer.add(entry)
             
             # Update the progress bar
             pbar.update(1)
             
-            if entry_counter >= 10000:
-                output_file = os.path.join(folder_name, f"term_bank_{file_counter}.json")
-                with open(output_file, 'w', encoding='utf-8') as out_file:
-                    json.dump(dictionary, out_file, ensure_ascii=False)
-                dictionary = []
-                file_counter += 1
-                entry_counter = 0
-                
-                # Update description to show current file
-                pbar.set_description(f"辞書をエクスポート中 - ファイル {file_counter-1} 完了")
-                
-        if dictionary:
-            output_file = os.path.join(folder_name, f"term_bank_{file_counter}.json")
-            with open(output_file, 'w', encoding='utf-8') as out_file:
-                json.dump(dictionary, out_file, ensure_ascii=False)
-                
+        writer.close()
+        
         # Close the progress bar
         pbar.close()
+        self._report_minimized()
         
     def zip(self):
         zip_file_name = f"{self.dictionary_name}.zip"
@@ -119,7 +387,7 @@ class DicEntry:
         print(self.content)
 
     def add_element(self, element):
-        self.validate_element(element)
+        # Validated when the entry is written to a term bank
         self.content.append(element)
         self.structured_content = True
 
@@ -143,39 +411,10 @@ class DicEntry:
         ]
         self.structured_content = True
 
-    def validate_element(self, element):
-        allowed_elements = ["br", "ruby", "rt", "rp", "table", "thead", "tbody", "tfoot", "tr", "td", "th", "span", "div", "ol", "ul", "li", "img", "a", "details", "summary"]
-        allowed_href_elements = ["a"]
-
-        if element["tag"] not in allowed_elements:
-            raise ValueError(f"Unsupported HTML element: {element['tag']}")
-
-        if "href" in element and element["tag"] not in allowed_href_elements:
-            raise ValueError(f"The 'href' attribute is not allowed in the '{element['tag']}' element, only <a>.")
-
-        if "content" in element:
-            content = element["content"]
-            
-            # If content is None, that's a problem
-            if content is None:
-                raise ValueError(f"Element '{element['tag']}' has 'None' as content, which is invalid")
-            
-            # If content is a list, validate each child element
-            elif isinstance(content, list):
-                for i, child_element in enumerate(content):
-                    try:
-                        # Recursively validate child elements
-                        if isinstance(child_element, dict):
-                            self.validate_element(child_element)
-                        elif not isinstance(child_element, str):
-                            raise ValueError(f"Element {element['tag']} has invalid content at index {i}: expected string or element dict, got {type(child_element).__name__} - Value: {repr(child_element)}")
-                    except ValueError as e:
-                        # Enhance error message with path information
-                        raise ValueError(f"In {element['tag']} > content[{i}]: {str(e)}")
-            
-            # If content is not a string or list, it's invalid
-            elif not isinstance(content, str):
-                raise ValueError(f"Element '{element['tag']}' has invalid content: expected string or list of elements, got {type(content).__name__} - Value: {repr(content)}")
+    def validate(self):
+        """Raise ValueError if the structured content has elements Yomitan doesn't support"""
+        for element in self.content:
+            validate_element(element)
 
 
 def create_html_element(tag, content=None, id=None, title=None, href=None, style=None, data=None):
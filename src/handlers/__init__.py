@@ -1,11 +1,12 @@
 from .appendix_handler import AppendixHandler
 from .audio_handler import AudioHandler, CJ3AudioHandler
-from .manual_match_handler import ManualMatchHandler, process_unmatched_entries
+from .manual_match_handler import ManualMatchHandler, process_unmatched_entries, review_unmatched_entries
 
 __all__ = [
 	"AppendixHandler",
 	"AudioHandler",
 	"CJ3AudioHandler",
 	"ManualMatchHandler",
-	"process_unmatched_entries"
+	"process_unmatched_entries",
+	"review_unmatched_entries"
 ]
\ No newline at end of file
@@ -46,6 +46,19 @@ class AudioHandler:
 		self.audio_index["reading_index"][reading].append(entry_index)
 		
 		
+	def drain(self):
+		"""Return the collected audio index and start a new one"""
+		audio_index = self.audio_index
+		self.audio_index = self._init_index()
+		return audio_index
+	
+	
+	def merge(self, audio_index):
+		"""Merge an audio index collected by another handler (e.g. in a worker process)"""
+		for entry_data in audio_index["entries"]:
+			self.save_audio_entry(entry_data["headword"], entry_data["reading"], entry_data["audio_file"])
+		
+		
 	def export(self):
 		with open(self.audio_path, "w", encoding="utf-8") as f:
 			json.dump(self.audio_index, f, ensure_ascii=False, indent=2)
@@ -83,4 +96,13 @@ class CJ3AudioHandler(AudioHandler):
 			if headword not in self.audio_index["headwords"]:
 				self.audio_index["headwords"][headword] = []
 			self.audio_index["headwords"][headword].append(audio_filename)
+			
+			
+	def merge(self, audio_index):
+		self.audio_index["files"].update(audio_index["files"])
+		
+		for headword, audio_filenames in audio_index["headwords"].items():
+			if headword not in self.audio_index["headwords"]:
+				self.audio_index["headwords"][headword] = []
+			self.audio_index["headwords"][headword].extend(audio_filenames)
 	
\ No newline at end of file
@@ -6,10 +6,14 @@ Used for manual matching with readings provided by the user
 when an entry key with kanji hasn't been matched by a corresponding kana reading.
 """
 class ManualMatchHandler:
-    def __init__(self, mappings_file="manual_mappings.json"):
+    def __init__(self, mappings_file="manual_mappings.json", mode="interactive"):
         self.mappings_file = "src/handlers/" + mappings_file
         self.mappings = self._load_mappings()
         self.ignored_entries = self._load_ignored_entries()
+        
+        # In queue mode unmatched entries are collected for the review command instead of asking
+        self.mode = mode
+        self.queue = []
     
     def _load_mappings(self):
         """Load existing manual mappings from file"""
@@ -112,6 +116,93 @@ class ManualMatchHandler:
             self.ignored_entries['global'].remove(key)
         elif file_id in self.ignored_entries and key in self.ignored_entries[file_id]:
             self.ignored_entries[file_id].remove(key)
+    
+    def queue_entry(self, key, file_id, entry_keys, unmatched_kana):
+        """Queue an unmatched entry for the review command"""
+        self.queue.append({
+            'file_id': file_id,
+            'key': key,
+            'candidates': list(entry_keys),
+            'unmatched_kana': list(unmatched_kana)
+        })
+    
+    def drain(self):
+        """Return and reset the queue, so pages processed elsewhere can be merged"""
+        queue = self.queue
+        self.queue = []
+        return queue
+    
+    def merge(self, queue):
+        self.queue.extend(queue)
+    
+    @staticmethod
+    def get_review_path(output_path, dict_name):
+        return os.path.join(output_path, f"{dict_name}_unmatched.json")
+    
+    def export_queue(self, queue_path):
+        """Write the queued entries to a review file, or remove a stale one if nothing is queued"""
+        if not self.queue:
+            if os.path.exists(queue_path):
+                os.remove(queue_path)
+            return
+        
+        with open(queue_path, 'w', encoding='utf-8') as f:
+            json.dump(self.queue, f, ensure_ascii=False, indent=2)
+        print(f"未照合の項目 {len(self.queue)} 件を {queue_path} に書き出しました")
+
+
+def prompt_for_entry(kanji, entry_keys, unmatched_kana, file_id, manual_handler):
+    """
+    Ask the user how to match an unmatched kanji key.
+    Returns the chosen kana, None if skipped, or False if the entry was ignored.
+    """
+    print(f"\nUnmatched kanji: {kanji}")
+    print(f"Available kana entries: {entry_keys}")
+    print(f"Currently unmatched kana: {unmatched_kana}")
+    
+    print("\nOptions:")
+    print("1. Enter a matching kana from the list")
+    print("2. Enter a custom kana (not in the list)")
+    print("3. Ignore this entry (won't be asked again)")
+    print("4. Skip for now (will ask again next time)")
+    
+    choice = input("Choose an option (1-4):\n")
+    
+    if choice == '1':
+        # Match with existing kana entry
+        user_input = input("Enter matching kana entry from the list:\n")
+        
+        if user_input in entry_keys:
+            global_mapping = input("Apply this mapping globally? (y/n):\n").lower() == 'y'
+            manual_handler.add_mapping(kanji, user_input, 
+                                      file_id=None if global_mapping else file_id,
+                                      is_global=global_mapping)
+            return user_input
+        
+        print(f"'{user_input}' is not in the entry list. Skipping for now.")
+        return None
+            
+    elif choice == '2':
+        # Enter custom kana
+        custom_kana = input("Enter custom kana reading:\n")
+        if custom_kana:
+            global_mapping = input("Apply this mapping globally? (y/n):\n").lower() == 'y'
+            manual_handler.add_mapping(kanji, custom_kana, 
+                                      file_id=None if global_mapping else file_id,
+                                      is_global=global_mapping)
+            return custom_kana
+        return None
+            
+    elif choice == '3':
+        # Ignore this entry
+        global_ignore = input("Ignore globally? (y/n):\n").lower() == 'y'
+        manual_handler.ignore_entry(kanji, 
+                                   file_id=None if global_ignore else file_id,
+                                   is_global=global_ignore)
+        return False
+        
+    # choice == '4' or invalid input, skip for now
+    return None
 
 def process_unmatched_entries(parser, filename, entry_keys, matched_key_pairs, manual_handler):
     """Process unmatched entries with user input"""
@@ -149,58 +240,21 @@ def process_unmatched_entries(parser, filename, entry_keys, matched_key_pairs, m
         if len(matched_key_pairs) == 1:
             return matched_key_pairs
         
-        print(f"\nUnmatched kanji: {kanji}")
-        print(f"Available kana entries: {entry_keys}")
-        print(f"Currently unmatched kana: {unmatched_kana}")
+        # Queue the entry for review and fall back to leaving it unmatched
+        if manual_handler.mode == "queue":
+            manual_handler.queue_entry(kanji, filename_without_ext, entry_keys, unmatched_kana)
+            updated_pairs.append((kanji, None))
+            continue
         
-        print("\nOptions:")
-        print("1. Enter a matching kana from the list")
-        print("2. Enter a custom kana (not in the list)")
-        print("3. Ignore this entry (won't be asked again)")
-        print("4. Skip for now (will ask again next time)")
+        kana_match = prompt_for_entry(kanji, entry_keys, unmatched_kana, filename_without_ext, manual_handler)
+        if kana_match is False:
+            continue
         
-        choice = input("Choose an option (1-4):\n")
+        updated_pairs.append((kanji, kana_match))
         
-        if choice == '1':
-            # Match with existing kana entry
-            user_input = input("Enter matching kana entry from the list:\n")
-            
-            if user_input in entry_keys:
-                global_mapping = input("Apply this mapping globally? (y/n):\n").lower() == 'y'
-                manual_handler.add_mapping(kanji, user_input, 
-                                          file_id=None if global_mapping else filename_without_ext,
-                                          is_global=global_mapping)
-                updated_pairs.append((kanji, user_input))
-                
-                # Remove from unmatched if it was there
-                if user_input in unmatched_kana:
-                    unmatched_kana.remove(user_input)
-            else:
-                print(f"'{user_input}' is not in the entry list. Skipping for now.")
-                updated_pairs.append((kanji, None))
-                
-        elif choice == '2':
-            # Enter custom kana
-            custom_kana = input("Enter custom kana reading:\n")
-            if custom_kana:
-                global_mapping = input("Apply this mapping globally? (y/n):\n").lower() == 'y'
-                manual_handler.add_mapping(kanji, custom_kana, 
-                                          file_id=None if global_mapping else filename_without_ext,
-                                          is_global=global_mapping)
-                updated_pairs.append((kanji, custom_kana))
-            else:
-                updated_pairs.append((kanji, None))
-                
-        elif choice == '3':
-            # Ignore this entry
-            global_ignore = input("Ignore globally? (y/n):\n").lower() == 'y'
-            manual_handler.ignore_entry(kanji, 
-                                       file_id=None if global_ignore else filename_without_ext,
-                                       is_global=global_ignore)
-            
-        else:  # choice == '4' or invalid input
-            # Skip for now
-            updated_pairs.append((kanji, None))
+        # Remove from unmatched if it was there
+        if kana_match in unmatched_kana:
+            unmatched_kana.remove(kana_match)
     
     # Process unmatched kana entries
     for kana in unmatched_kana:
@@ -219,6 +273,42 @@ def process_unmatched_entries(parser, filename, entry_keys, matched_key_pairs, m
     
     return updated_pairs
 
+def review_unmatched_entries(queue_path, manual_handler):
+    """Walk a review file written in queue mode and save the answers as manual mappings"""
+    if not os.path.exists(queue_path):
+        print(f"レビューファイル {queue_path} が見つかりません")
+        return 0
+    
+    with open(queue_path, 'r', encoding='utf-8') as f:
+        queue = json.load(f)
+    
+    remaining = []
+    reviewed = 0
+    for i, item in enumerate(queue):
+        # Answered in an earlier review or through another file
+        if manual_handler.has_mapping(item['key'], item['file_id']):
+            continue
+        
+        print(f"\n===== {i + 1}/{len(queue)}: file {item['file_id']} =====")
+        try:
+            kana_match = prompt_for_entry(item['key'], item['candidates'], item['unmatched_kana'],
+                                          item['file_id'], manual_handler)
+        except (EOFError, KeyboardInterrupt):
+            remaining.extend(queue[i:])
+            break
+        
+        if kana_match is None:
+            remaining.append(item)
+        else:
+            reviewed += 1
+    
+    # Keep what's left for the next review
+    with open(queue_path, 'w', encoding='utf-8') as f:
+        json.dump(remaining, f, ensure_ascii=False, indent=2)
+    
+    print(f"\n{reviewed} 件を {manual_handler.mappings_file} に保存しました, 残り {len(remaining)} 件")
+    return reviewed
+
 def manage_mappings(manual_handler):
     """Interface for managing existing mappings"""
     print("\n===== Manage Existing Mappings =====")
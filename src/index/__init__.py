@@ -1,7 +1,9 @@
 from .index_reader import IndexReader
 from .index_reader import JukugoIndexReader
+from .mmap_index_reader import MmapIndexReader
 
 __all__ = [
     "IndexReader",
-    "JukugoIndexReader"
+    "JukugoIndexReader",
+    "MmapIndexReader"
 ]
\ No newline at end of file
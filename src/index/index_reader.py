@@ -1,67 +1,228 @@
 import os
-from typing import List, Dict, Any, Set, Tuple
+import struct
+from array import array
+from typing import List, Dict, Any, Set, Tuple, Iterator
 from collections import defaultdict
+from collections.abc import Mapping
 from tqdm import tqdm
 
+# Compiled form of an index, stored next to it as <index>.cache
+CACHE_SUFFIX = ".cache"
+CACHE_MAGIC = b"IDXC"
+CACHE_VERSION = 1
+# magic, version, item size of the arrays, size and mtime of the index, then the length of each section
+CACHE_HEADER = struct.Struct("<4sHHQQ6Q")
+
+
+class KeyFilesView(Mapping):
+    """Read-only key -> filenames mapping over an IndexReader, like the dict it used to keep"""
+    
+    def __init__(self, reader: 'IndexReader') -> None:
+        self.reader = reader
+        self._lines = None
+        
+    
+    def _get_lines(self) -> Dict[str, int]:
+        # Only built when a key is looked up, later lines win like they did in the dict
+        if self._lines is None:
+            self._lines = {key: line for line, key in enumerate(self.reader.keys)}
+        return self._lines
+        
+    
+    def __getitem__(self, key: str) -> List[str]:
+        return self.reader.get_files_for_line(self._get_lines()[key])
+    
+    
+    def __iter__(self) -> Iterator[str]:
+        return iter(self._get_lines())
+    
+    
+    def __len__(self) -> int:
+        return len(self._get_lines())
+
+
 class IndexReader:
-    def __init__(self, index_file_path: str) -> None:
+    """
+    Maps the keys of an index_d.tsv to page filenames and back.
+    
+    Filenames are interned to integer ids and both directions are kept as arrays: the files of
+    line i are line_file_ids[line_file_offsets[i]:line_file_offsets[i + 1]], and the lines of
+    file f are file_line_ids[file_line_offsets[f]:file_line_offsets[f + 1]]. Every key is stored
+    once. The compiled index is cached next to the TSV and reused while the TSV's size and
+    modification time stay the same.
+    """
+    
+    def __init__(self, index_file_path: str, use_cache: bool = True) -> None:
         """Initialize with the path to the index_d.tsv file"""
         self.index_file_path = index_file_path
-        self.dict_data = {}  # Dictionary mapping keys to filenames
-        self.file_to_keys = defaultdict(list)  # Reverse mapping: filename -> keys
+        self.cache_path = str(index_file_path) + CACHE_SUFFIX
+        self.use_cache = use_cache
+        
+        self.keys: List[str] = []  # Key of each line
+        self.filenames: List[str] = []  # Filename of each file id
+        self.file_ids: Dict[str, int] = {}
+        self.line_file_offsets = array("I", [0])
+        self.line_file_ids = array("I")
+        self.file_line_offsets = array("I", [0])
+        self.file_line_ids = array("I")
+        
+        self.dict_data = KeyFilesView(self)  # Mapping of keys to filenames
         self.load_index()
         
     
     def load_index(self) -> None:
-        """Load the index file and build both mappings"""
+        """Load the compiled index from the cache, or parse the TSV and cache it"""
         if not os.path.exists(self.index_file_path):
             raise FileNotFoundError(f"Index file not found: {self.index_file_path}")
         
-        # Count total lines for progress tracking
-        with open(self.index_file_path, 'r', encoding='utf-8') as f:
-            total_lines = sum(1 for _ in f)
+        stat = os.stat(self.index_file_path)
+        if self.use_cache and self._load_cache(stat.st_size, stat.st_mtime_ns):
+            return
         
-        bar_format = "「{desc}: {bar:30}」{percentage:3.0f}% | {n_fmt}/{total_fmt} {unit}"
-
-        with open(self.index_file_path, 'r', encoding='utf-8') as f, \
-            tqdm(total=total_lines, desc="索引読込中", unit="行", bar_format=bar_format, ascii="░▒█") as pbar:
+        self._parse_index()
+        if self.use_cache:
+            self._save_cache(stat.st_size, stat.st_mtime_ns)
             
+    
+    def _parse_index(self) -> None:
+        """Read the TSV in one pass and build both mappings"""
+        line_file_ids = []
+        
+        with open(self.index_file_path, 'r', encoding='utf-8') as f:
             for line in f:
                 parts = line.strip().split('\t')
                 if len(parts) < 2:
                     print(f"Found a malformed line: {parts}")
                     continue
                 
-                key = parts[0]
-                filenames = parts[1:]
+                self.keys.append(parts[0])
+                for filename in parts[1:]:
+                    file_id = self.file_ids.get(filename)
+                    if file_id is None:
+                        file_id = self.file_ids[filename] = len(self.filenames)
+                        self.filenames.append(filename)
+                    line_file_ids.append(file_id)
+                self.line_file_offsets.append(len(line_file_ids))
                 
-                self.dict_data[key] = filenames
+        self.line_file_ids = array("I", line_file_ids)
+        self._build_file_lines()
+        
+    
+    def _build_file_lines(self) -> None:
+        """Invert the line -> files arrays into file -> lines, keeping the lines in index order"""
+        counts = [0] * len(self.filenames)
+        for file_id in self.line_file_ids:
+            counts[file_id] += 1
+            
+        offsets = [0] * (len(self.filenames) + 1)
+        for file_id, count in enumerate(counts):
+            offsets[file_id + 1] = offsets[file_id] + count
+            
+        positions = offsets[:-1]
+        file_line_ids = [0] * len(self.line_file_ids)
+        line_file_offsets = self.line_file_offsets
+        for line in range(len(self.keys)):
+            for i in range(line_file_offsets[line], line_file_offsets[line + 1]):
+                file_id = self.line_file_ids[i]
+                file_line_ids[positions[file_id]] = line
+                positions[file_id] += 1
                 
-                # Build reverse mapping
-                for filename in filenames:
-                    self.file_to_keys[filename].append(key)
-                    
-                pbar.update(1)
-                    
+        self.file_line_offsets = array("I", offsets)
+        self.file_line_ids = array("I", file_line_ids)
+        
+    
+    def _save_cache(self, size: int, mtime_ns: int) -> None:
+        keys = "\n".join(self.keys).encode("utf-8")
+        filenames = "\n".join(self.filenames).encode("utf-8")
+        sections = [keys, filenames] + [
+            values.tobytes() for values in
+            (self.line_file_offsets, self.line_file_ids, self.file_line_offsets, self.file_line_ids)
+        ]
+        header = CACHE_HEADER.pack(CACHE_MAGIC, CACHE_VERSION, array("I").itemsize, size, mtime_ns,
+                                   *(len(section) for section in sections))
+        
+        # Written to a temporary file first, so an interrupted run can't leave a broken cache
+        temp_path = f"{self.cache_path}.{os.getpid()}.tmp"
+        try:
+            with open(temp_path, "wb") as f:
+                f.write(header)
+                for section in sections:
+                    f.write(section)
+            os.replace(temp_path, self.cache_path)
+        except OSError as e:
+            print(f"索引のキャッシュを保存できませんでした: {e}")
+            if os.path.exists(temp_path):
+                os.remove(temp_path)
+                
+    
+    def _load_cache(self, size: int, mtime_ns: int) -> bool:
+        """Load the compiled index if the cache was made from this version of the TSV"""
+        try:
+            with open(self.cache_path, "rb") as f:
+                data = f.read()
+        except OSError:
+            return False
+        
+        if len(data) < CACHE_HEADER.size:
+            return False
+        magic, version, itemsize, cached_size, cached_mtime_ns, *lengths = CACHE_HEADER.unpack_from(data)
+        if (magic != CACHE_MAGIC or version != CACHE_VERSION or itemsize != array("I").itemsize
+                or cached_size != size or cached_mtime_ns != mtime_ns
+                or CACHE_HEADER.size + sum(lengths) != len(data)):
+            return False
+        
+        sections = []
+        position = CACHE_HEADER.size
+        for length in lengths:
+            sections.append(data[position:position + length])
+            position += length
+            
+        keys, filenames, *arrays = sections
+        for name, values in zip(("line_file_offsets", "line_file_ids", "file_line_offsets", "file_line_ids"), arrays):
+            loaded = array("I")
+            loaded.frombytes(values)
+            setattr(self, name, loaded)
+            
+        # Counted from the offsets, an empty blob can still be a single empty string
+        self.keys = keys.decode("utf-8").split("\n") if len(self.line_file_offsets) > 1 else []
+        self.filenames = filenames.decode("utf-8").split("\n") if len(self.file_line_offsets) > 1 else []
+        self.file_ids = {filename: file_id for file_id, filename in enumerate(self.filenames)}
+        return True
+        
+    
+    def get_files_for_line(self, line: int) -> List[str]:
+        """Filenames listed on a line of the index"""
+        start, end = self.line_file_offsets[line], self.line_file_offsets[line + 1]
+        return [self.filenames[file_id] for file_id in self.line_file_ids[start:end]]
+    
+    
+    def get_files_for_key(self, key: str) -> List[str]:
+        """Get the filenames a key points to"""
+        return self.dict_data.get(key, [])
+    
     
     def get_keys_for_file(self, filename: str) -> List[str]:
         """Get all dictionary keys associated with a given filename"""
-        return self.file_to_keys.get(filename, [])
+        file_id = self.file_ids.get(filename)
+        if file_id is None:
+            return []
+        start, end = self.file_line_offsets[file_id], self.file_line_offsets[file_id + 1]
+        return [self.keys[line] for line in self.file_line_ids[start:end]]
     
     
     def process_all_files(self) -> None:
         """Process all files and show their associated keys"""
         count = 0
         import random
-        shuffled_items = list(self.file_to_keys.items())
-        random.shuffle(shuffled_items)
+        shuffled_filenames = list(self.filenames)
+        random.shuffle(shuffled_filenames)
         
-        for filename, keys in tqdm(shuffled_items, desc="進歩", unit="事項"):
+        for filename in tqdm(shuffled_filenames, desc="進歩", unit="事項"):
             if count > 20:
                 break
             
             print(f"Filename: {filename}")
-            print(f"Associated keys: {', '.join(keys)}")
+            print(f"Associated keys: {', '.join(self.get_keys_for_file(filename))}")
             print("-" * 50)
             count += 1
             
@@ -0,0 +1,291 @@
+import os
+import mmap
+import random
+import struct
+from array import array
+from collections.abc import Mapping
+from typing import Iterator, List, Optional, Tuple
+
+from tqdm import tqdm
+
+# Sorted, compiled form of an index, stored next to it as <index>.sorted
+SORTED_SUFFIX = ".sorted"
+SORTED_MAGIC = b"IDXS"
+SORTED_VERSION = 1
+# magic, version, size and mtime of the index, line, unique key and file counts, then where each section starts and the file ends
+SORTED_HEADER = struct.Struct("<4sIQQIII6Q")
+SECTIONS = ("strings", "key_table", "line_files", "file_table", "file_lines")
+# Key table rows: key offset, key length, start of the line's files in line_files
+KEY_FIELDS = 3
+# File table rows: name offset, name length, start of the file's lines in file_lines
+FILE_FIELDS = 3
+
+
+def compile_sorted_index(index_file_path: str, output_path: str) -> None:
+    """
+    Compile a key<TAB>filenames TSV into the sorted form MmapIndexReader maps.
+    Lines are sorted by key and files by name (by their UTF-8 bytes), lines with the same key
+    stay in index order, and the lines of each file are kept in index order.
+    """
+    lines: List[Tuple[bytes, List[bytes]]] = []
+    with open(index_file_path, 'r', encoding='utf-8') as f:
+        for line in f:
+            parts = line.strip().split('\t')
+            if len(parts) < 2:
+                print(f"Found a malformed line: {parts}")
+                continue
+            lines.append((parts[0].encode("utf-8"), [filename.encode("utf-8") for filename in parts[1:]]))
+
+    filenames = sorted({filename for _, files in lines for filename in files})
+    file_ids = {filename: file_id for file_id, filename in enumerate(filenames)}
+    order = sorted(range(len(lines)), key=lambda line: lines[line][0])
+
+    strings = bytearray()
+    key_table = array("I")
+    line_files = array("I")
+    line_positions = [0] * len(lines)
+    unique_keys = 0
+    previous_key = None
+
+    for position, line in enumerate(order):
+        key, files = lines[line]
+        if key != previous_key:
+            unique_keys += 1
+            previous_key = key
+        key_table.extend((len(strings), len(key), len(line_files)))
+        strings += key
+        line_files.extend(file_ids[filename] for filename in files)
+        line_positions[line] = position
+    key_table.extend((len(strings), 0, len(line_files)))
+
+    # Key table positions of each file's lines, in index order
+    file_lines: List[List[int]] = [[] for _ in filenames]
+    for line, (_, files) in enumerate(lines):
+        for filename in files:
+            file_lines[file_ids[filename]].append(line_positions[line])
+
+    file_table = array("I")
+    file_line_positions = array("I")
+    for file_id, filename in enumerate(filenames):
+        file_table.extend((len(strings), len(filename), len(file_line_positions)))
+        strings += filename
+        file_line_positions.extend(file_lines[file_id])
+    file_table.extend((len(strings), 0, len(file_line_positions)))
+
+    # The arrays are cast from the mapped file, so they have to start 4-byte aligned
+    strings += b"\0" * (-len(strings) % 4)
+    sections = [bytes(strings), key_table.tobytes(), line_files.tobytes(), file_table.tobytes(),
+                file_line_positions.tobytes()]
+    offsets = []
+    position = SORTED_HEADER.size + (-SORTED_HEADER.size % 4)
+    for section in sections:
+        offsets.append(position)
+        position += len(section)
+    offsets.append(position)
+
+    stat = os.stat(index_file_path)
+    header = SORTED_HEADER.pack(SORTED_MAGIC, SORTED_VERSION, stat.st_size, stat.st_mtime_ns,
+                                len(lines), unique_keys, len(filenames), *offsets)
+
+    # Written to a temporary file first, so an interrupted run can't leave a broken index
+    temp_path = f"{output_path}.{os.getpid()}.tmp"
+    try:
+        with open(temp_path, "wb") as f:
+            f.write(header)
+            f.write(b"\0" * (-SORTED_HEADER.size % 4))
+            for section in sections:
+                f.write(section)
+        os.replace(temp_path, output_path)
+    finally:
+        if os.path.exists(temp_path):
+            os.remove(temp_path)
+
+
+class SortedKeyFilesView(Mapping):
+    """Read-only key -> filenames mapping answered from the sorted key table"""
+    
+    def __init__(self, reader: 'MmapIndexReader') -> None:
+        self.reader = reader
+    
+    
+    def __getitem__(self, key: str) -> List[str]:
+        position = self.reader._find_key(key)
+        if position is None:
+            raise KeyError(key)
+        return self.reader._get_line_files(position)
+    
+    
+    def __iter__(self) -> Iterator[str]:
+        previous = None
+        for position in range(self.reader.line_count):
+            key = self.reader._get_key(position)
+            if key != previous:
+                yield key
+                previous = key
+    
+    
+    def __len__(self) -> int:
+        return self.reader.unique_key_count
+    
+    
+class MmapIndexReader:
+    """
+    IndexReader that answers lookups from a memory-mapped, sorted compilation of the index,
+    without building Python dicts for the whole index. Keys and filenames are found by binary
+    search over the offsets in the mapped file, so memory stays flat however large the index is,
+    and worker processes share the mapped pages.
+    
+    The sorted file is compiled next to the TSV on first use and again whenever the TSV's size or
+    modification time change. Any key<TAB>filenames TSV works, e.g. index_d.tsv or index_prefix.tsv.
+    """
+    
+    def __init__(self, index_file_path: str) -> None:
+        """Initialize with the path to the index_d.tsv file"""
+        self.index_file_path = index_file_path
+        self.sorted_path = str(index_file_path) + SORTED_SUFFIX
+        self._file = None
+        self._mmap = None
+        self.dict_data = SortedKeyFilesView(self)  # Mapping of keys to filenames
+        self.load_index()
+    
+    
+    def load_index(self) -> None:
+        """Map the sorted index, compiling it first if it is missing or out of date"""
+        if not os.path.exists(self.index_file_path):
+            raise FileNotFoundError(f"Index file not found: {self.index_file_path}")
+    
+        if not self._map_sorted_index():
+            print(f"索引をコンパイルしています: {self.sorted_path}")
+            compile_sorted_index(self.index_file_path, self.sorted_path)
+            if not self._map_sorted_index():
+                raise ValueError(f"Could not map the compiled index: {self.sorted_path}")
+    
+    
+    def _map_sorted_index(self) -> bool:
+        self.close()
+        if not os.path.exists(self.sorted_path) or os.path.getsize(self.sorted_path) < SORTED_HEADER.size:
+            return False
+    
+        stat = os.stat(self.index_file_path)
+        with open(self.sorted_path, "rb") as f:
+            magic, version, size, mtime_ns, line_count, unique_key_count, file_count, *offsets = \
+                SORTED_HEADER.unpack(f.read(SORTED_HEADER.size))
+        if (magic != SORTED_MAGIC or version != SORTED_VERSION
+                or size != stat.st_size or mtime_ns != stat.st_mtime_ns
+                or offsets[len(SECTIONS)] != os.path.getsize(self.sorted_path)):
+            return False
+    
+        self._file = open(self.sorted_path, "rb")
+        self._mmap = mmap.mmap(self._file.fileno(), 0, access=mmap.ACCESS_READ)
+        view = memoryview(self._mmap)
+        self.line_count = line_count
+        self.unique_key_count = unique_key_count
+        self.file_count = file_count
+        self._strings = view[offsets[0]:offsets[1]]
+        self._key_table = view[offsets[1]:offsets[2]].cast("I")
+        self._line_files = view[offsets[2]:offsets[3]].cast("I")
+        self._file_table = view[offsets[3]:offsets[4]].cast("I")
+        self._file_lines = view[offsets[4]:offsets[5]].cast("I")
+        return True
+    
+    
+    def close(self) -> None:
+        """Release the mapped index"""
+        for name in ("_strings", "_key_table", "_line_files", "_file_table", "_file_lines"):
+            view = self.__dict__.pop(name, None)
+            if view is not None:
+                view.release()
+        if self._mmap is not None:
+            self._mmap.close()
+            self._mmap = None
+        if self._file is not None:
+            self._file.close()
+            self._file = None
+    
+    
+    def _get_string(self, table, fields: int, position: int) -> bytes:
+        start = position * fields
+        offset = table[start]
+        return self._strings[offset:offset + table[start + 1]].tobytes()
+    
+    
+    def _get_key(self, position: int) -> str:
+        return self._get_string(self._key_table, KEY_FIELDS, position).decode("utf-8")
+    
+    
+    def _bisect(self, table, fields: int, count: int, value: bytes, right: bool = False) -> int:
+        """First row whose string is >= value, or > value with right"""
+        low, high = 0, count
+        while low < high:
+            middle = (low + high) // 2
+            string = self._get_string(table, fields, middle)
+            if string < value or (right and string == value):
+                low = middle + 1
+            else:
+                high = middle
+        return low
+    
+    
+    def _find_key(self, key: str) -> Optional[int]:
+        """Position of the last line with this key, which is the one a dict would have kept"""
+        encoded = key.encode("utf-8")
+        position = self._bisect(self._key_table, KEY_FIELDS, self.line_count, encoded, right=True) - 1
+        if position >= 0 and self._get_string(self._key_table, KEY_FIELDS, position) == encoded:
+            return position
+        return None
+    
+    
+    def _get_line_files(self, position: int) -> List[str]:
+        start = self._key_table[position * KEY_FIELDS + 2]
+        end = self._key_table[(position + 1) * KEY_FIELDS + 2]
+        return [self._get_string(self._file_table, FILE_FIELDS, file_id).decode("utf-8")
+                for file_id in self._line_files[start:end]]
+    
+    
+    def get_files_for_key(self, key: str) -> List[str]:
+        """Get the filenames a key points to"""
+        position = self._find_key(key)
+        return self._get_line_files(position) if position is not None else []
+    
+    
+    def get_keys_with_prefix(self, prefix: str) -> List[str]:
+        """Get the keys starting with prefix, in sorted order"""
+        encoded = prefix.encode("utf-8")
+        position = self._bisect(self._key_table, KEY_FIELDS, self.line_count, encoded)
+        keys = []
+        while position < self.line_count:
+            key = self._get_string(self._key_table, KEY_FIELDS, position)
+            if not key.startswith(encoded):
+                break
+            if not keys or keys[-1] != key:
+                keys.append(key)
+            position += 1
+        return [key.decode("utf-8") for key in keys]
+    
+    
+    def get_keys_for_file(self, filename: str) -> List[str]:
+        """Get all dictionary keys associated with a given filename"""
+        encoded = filename.encode("utf-8")
+        file_id = self._bisect(self._file_table, FILE_FIELDS, self.file_count, encoded)
+        if file_id >= self.file_count or self._get_string(self._file_table, FILE_FIELDS, file_id) != encoded:
+            return []
+        start = self._file_table[file_id * FILE_FIELDS + 2]
+        end = self._file_table[(file_id + 1) * FILE_FIELDS + 2]
+        return [self._get_key(position) for position in self._file_lines[start:end]]
+    
+    
+    def process_all_files(self) -> None:
+        """Process all files and show their associated keys"""
+        count = 0
+        file_ids = list(range(self.file_count))
+        random.shuffle(file_ids)
+    
+        for file_id in tqdm(file_ids, desc="進歩", unit="事項"):
+            if count > 20:
+                break
+    
+            filename = self._get_string(self._file_table, FILE_FIELDS, file_id).decode("utf-8")
+            print(f"Filename: {filename}")
+            print(f"Associated keys: {', '.join(self.get_keys_for_file(filename))}")
+            print("-" * 50)
+            count += 1
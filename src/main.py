@@ -1,20 +1,80 @@
 #!/usr/bin/env python3
 from typing import Optional, Dict, List
 import argparse
+import cProfile
+import glob
+import pstats
+import os
 import sys
+import zipfile
 from pathlib import Path
 from config import DictionaryConfig, PathManager
-from utils import FileUtils
+from handlers import ManualMatchHandler, review_unmatched_entries
+from utils import FileUtils, BuildScheduler, BuildTask, estimate_memory_mb, get_metrics, start_metrics, PageProfiler, TermBankAnalyzer
+from core import PageCache, ContentMinimizer
 
 
-def process_dictionary(config: DictionaryConfig, base_dir: Optional[str] = None, repackage_only: bool = False):
+def build_dictionary(parser, config: DictionaryConfig, paths: Dict, workers: int = 1, use_cache: bool = False):
+    """Parse the dictionary pages and appendix into the parser's dictionary, then export it"""
+    metrics = get_metrics()
+    
+    page_cache = PageCache.for_parser(paths["cache_folder"], parser) if use_cache else None
+    try:
+        with metrics.phase("parse") as phase:
+            phase.count += parser.parse(workers=workers, page_cache=page_cache)
+        # A sample only looks up some of the pages, the rest are still valid
+        if page_cache and not parser.sampled:
+            page_cache.prune()
+    finally:
+        if page_cache:
+            page_cache.close()
+    
+    if parser.page_profiler:
+        parser.page_profiler.report(os.path.join(paths["term_bank_folder"], "slowest_pages.json"))
+    
+    if config.has_appendix and "appendix_path" in paths:
+        appendix_path = paths["appendix_path"]
+        if appendix_path.exists():
+            print(f"{config.dict_name}の付録を処理します")
+            with metrics.phase("appendix") as phase:
+                appendix_handler = config.create_appendix_handler(
+                    parser.dictionary, 
+                    str(appendix_path)
+                )
+                appendix_count = appendix_handler.parse_appendix_directory()
+                phase.count += appendix_count
+            print(f"{appendix_count}の付録項目を追加しました")
+    
+    with metrics.phase("export", count=parser.dictionary.entry_count):
+        parser.export(paths["output_path"])
+        FileUtils.update_index_revision(config.rev_name, paths["index_json_path"])
+
+
+def finish_metrics(paths: Dict) -> None:
+    """Print the metrics of the build and save them next to the term banks"""
+    metrics = get_metrics()
+    metrics.print_table()
+    metrics.save(os.path.join(paths["term_bank_folder"], "build_metrics.json"))
+
+
+def process_dictionary(config: DictionaryConfig, base_dir: Optional[str] = None, repackage_only: bool = False,
+                       workers: int = 1, use_cache: bool = False, direct_zip: bool = False, compress_level: int = 9,
+                       all_assets: bool = False, profile_top: int = 0, sample_pages: Optional[int] = None):
     """Process a dictionary based on its configuration
     
     Args:
         config: Dictionary configuration
         base_dir: Optional base directory for files
         repackage_only: If True, skip parsing and just repackage existing files
+        workers: Number of worker processes used for parsing pages
+        use_cache: If True, replay unchanged pages from the page cache
+        direct_zip: If True, write term banks straight into the zip instead of a folder
+        compress_level: Deflate level (0-9) used for compressible files in the zip
+        all_assets: If True, package every asset instead of only those referenced by entries
+        profile_top: If set, record this many of the slowest pages by conversion time
+        sample_pages: If set, only parse a random sample of this many pages
     """
+    metrics = start_metrics(config.dict_name)
     path_manager = PathManager(base_dir)
     paths = path_manager.get_paths(config)
     
@@ -26,46 +86,137 @@ def process_dictionary(config: DictionaryConfig, base_dir: Optional[str] = None,
         print(f"Parsing dictionary: {config.dict_name}")
         
         # Create parser instance with required paths
-        parser_class = config.get_parser_class()
-        parser = parser_class(config)
+        with metrics.phase("init"):
+            parser_class = config.get_parser_class()
+            parser = parser_class(config)
+        
+        if sample_pages and parser.dict_data:
+            parser.sample_pages(sample_pages)
+            print(f"{len(parser.dict_data)} ページのサンプルのみを処理します")
+        if profile_top:
+            parser.page_profiler = PageProfiler(profile_top)
+        if config.minimize_content:
+            parser.dictionary.minimizer = ContentMinimizer.for_stylesheet(paths["assets_folder"] / "styles.css")
         
         # TODO add variant character entry handling
         
-        parser.parse()
+        if direct_zip:
+            os.makedirs(paths["output_path"], exist_ok=True)
+            zip_path = FileUtils.get_zip_path(config.dict_name, paths["output_path"])
+            
+            with zipfile.ZipFile(zip_path, 'w', zipfile.ZIP_DEFLATED, compresslevel=compress_level) as zipf:
+                parser.dictionary.stream_to_zip(zipf)
+                build_dictionary(parser, config, paths, workers, use_cache)
+                
+                # Add index and assets after the term banks
+                with metrics.phase("package") as phase:
+                    if paths["index_json_path"].is_file():
+                        zipf.write(paths["index_json_path"], "index.json")
+                    asset_files = FileUtils.gather_asset_files(paths["assets_folder"])
+                    if not all_assets:
+                        asset_files = FileUtils.filter_referenced_assets(
+                            asset_files,
+                            parser.dictionary.referenced_assets,
+                            config.dict_name,
+                            paths["base_dir"],
+                            os.path.join(paths["output_path"], f"{config.dict_name}_asset_report.json")
+                        )
+                    FileUtils.write_files_to_zip(
+                        zipf,
+                        asset_files,
+                        config.dict_name,
+                        paths["base_dir"],
+                        compress_level=compress_level
+                    )
+                    phase.count += len(asset_files)
+                
+            print(f"Dictionary package created at: {zip_path}")
+            finish_metrics(paths)
+            return
         
-        if config.has_appendix and "appendix_path" in paths:
-            appendix_path = paths["appendix_path"]
-            if appendix_path.exists():
-                print(f"{config.dict_name}の付録を処理します")
-                appendix_handler = config.create_appendix_handler(
-                    parser.dictionary, 
-                    str(appendix_path)
-                )
-                appendix_count = appendix_handler.parse_appendix_directory()
-                print(f"{appendix_count}の付録項目を追加しました")
-        
-        parser.export(paths["output_path"])
-        FileUtils.update_index_revision(config.rev_name, paths["index_json_path"])
+        # Write term banks as pages are parsed instead of holding every entry
+        parser.dictionary.stream_to(paths["output_path"])
+        build_dictionary(parser, config, paths, workers, use_cache)
     else:
         print(f"Repackaging only for dictionary: {config.dict_name}")
     
     # Always gather files and create zip
-    file_paths = FileUtils.gather_files(
-        paths["term_bank_folder"],
-        paths["assets_folder"],
-        paths["index_json_path"],
-        paths["output_path"]
-    )
-    
-    print(f"Creating dictionary package...")
-    FileUtils.zip_dictionary(
-        file_paths,
-        config.dict_name,
-        paths["base_dir"],
-        paths["output_path"],
-        flatten_dict_folder=True
-    )
+    with metrics.phase("package") as phase:
+        file_paths = FileUtils.gather_files(
+            paths["term_bank_folder"],
+            paths["assets_folder"],
+            paths["index_json_path"],
+            paths["output_path"],
+            name=config.dict_name,
+            base_path=paths["base_dir"],
+            only_referenced=not all_assets
+        )
+        
+        print(f"Creating dictionary package...")
+        FileUtils.zip_dictionary(
+            file_paths,
+            config.dict_name,
+            paths["base_dir"],
+            paths["output_path"],
+            flatten_dict_folder=True,
+            compress_level=compress_level,
+            reuse_previous=repackage_only
+        )
+        phase.count += len(file_paths)
     print(f"Dictionary package created at: {paths['output_path']}")
+    finish_metrics(paths)
+
+
+def profile_dictionary(config: DictionaryConfig, profile_top: int, **kwargs):
+    """Run process_dictionary under cProfile and save the stats next to the term banks"""
+    profiler = cProfile.Profile()
+    profiler.enable()
+    try:
+        process_dictionary(config, profile_top=profile_top, **kwargs)
+    finally:
+        profiler.disable()
+        
+        paths = PathManager(kwargs.get("base_dir")).get_paths(config)
+        stats_path = os.path.join(paths["term_bank_folder"], "profile.pstats")
+        os.makedirs(paths["term_bank_folder"], exist_ok=True)
+        profiler.dump_stats(stats_path)
+        
+        stats = pstats.Stats(profiler)
+        stats.sort_stats("cumulative").print_stats(30)
+        print(f"プロファイルを保存しました: {stats_path}")
+
+
+def review_dictionary(config: DictionaryConfig, base_dir: Optional[str] = None):
+    """Walk the unmatched entries queued by a --unmatched=queue build and save the answers"""
+    paths = PathManager(base_dir).get_paths(config)
+    review_path = ManualMatchHandler.get_review_path(paths["output_path"], config.dict_name)
+    
+    print(f"Reviewing unmatched entries for dictionary: {config.dict_name}")
+    review_unmatched_entries(review_path, ManualMatchHandler())
+
+
+def analyze_output(path: str, report_path: Optional[str] = None):
+    """Report where the bytes of a built dictionary folder or zip go"""
+    print(f"Analyzing term banks in: {path}")
+    analyzer = TermBankAnalyzer().analyze(path)
+    if not analyzer.term_banks:
+        print(f"{path} に term bank が見つかりません")
+        return
+    analyzer.report(report_path)
+
+
+def analyze_dictionary(config: DictionaryConfig, base_dir: Optional[str] = None):
+    """Analyze the term bank folder of the last build, or its zip after a --direct-zip build"""
+    paths = PathManager(base_dir).get_paths(config)
+    report_path = os.path.join(paths["output_path"], f"{config.dict_name}_size_report.json")
+    
+    path = paths["term_bank_folder"]
+    if not any(path.glob("term_bank_*.json")):
+        zip_paths = sorted(paths["output_path"].glob(f"{glob.escape(config.dict_name)}[[]*].zip"),
+                           key=os.path.getmtime)
+        if zip_paths:
+            path = zip_paths[-1]
+    analyze_output(str(path), report_path)
 
 
 def main():
@@ -73,14 +224,47 @@ def main():
     dictionary_configs = DictionaryConfig.load_configs(config_path)
     
     parser = argparse.ArgumentParser(description='Dictionary processing tool')
+    parser.add_argument('command', nargs='?', choices=['build', 'review', 'analyze'], default='build',
+                        help='build dictionaries (default), review unmatched entries queued by --unmatched=queue, '
+                             'or analyze the size of built term banks')
     parser.add_argument('--dict', '-d', choices=list(dictionary_configs.keys()), 
                         help='Dictionary to process', required=False)
     parser.add_argument('--all', '-a', action='store_true', 
                         help='Process all dictionaries')
     parser.add_argument('--repackage', '-r', action='store_true', 
-                        help='Repackage only (skip parsing)')
+                        help='Repackage only (skip parsing), reusing unchanged files from the previous zip')
     parser.add_argument('--base-dir', '-b', type=str, default=None,
                         help='Base directory for files')
+    parser.add_argument('--workers', '-w', type=int, default=1,
+                        help='Number of worker processes used for parsing (default: 1)')
+    parser.add_argument('--cache', '-c', action='store_true',
+                        help='Reuse parse results of unchanged pages from previous runs')
+    parser.add_argument('--direct-zip', '-z', action='store_true',
+                        help='Write term banks straight into the zip without an intermediate folder')
+    parser.add_argument('--compress-level', type=int, default=9, choices=range(10), metavar='{0-9}',
+                        help='Deflate level for term banks and other compressible files (default: 9)')
+    parser.add_argument('--all-assets', action='store_true',
+                        help='Package every file under assets/<dict>, not just the ones entries reference')
+    parser.add_argument('--jobs', '-j', type=int, default=1,
+                        help='Number of dictionaries built at the same time with --all (default: 1)')
+    parser.add_argument('--memory-budget', type=float, default=None,
+                        help='Memory budget in GB for concurrent --all builds (default: 75%% of RAM)')
+    parser.add_argument('--unmatched', choices=['interactive', 'queue'], default=None,
+                        help='Ask about unmatched kanji keys while parsing, or queue them for the review command '
+                             '(default: interactive, queue when running in parallel)')
+    parser.add_argument('--validate', choices=['off', 'sample', 'full'], default=None,
+                        help='Validate the structured content of every entry, every 100th entry, '
+                             'or none (default: full)')
+    parser.add_argument('--minimize', action='store_true',
+                        help='Remove redundant structure from the structured content, without changing how it renders')
+    parser.add_argument('--profile', action='store_true',
+                        help='Run the dictionary under cProfile and record the slowest pages (implies --workers 1)')
+    parser.add_argument('--profile-sample', type=int, default=None, metavar='N',
+                        help='With --profile, only parse a random sample of N pages')
+    parser.add_argument('--profile-top', type=int, default=20, metavar='N',
+                        help='With --profile, number of slowest pages to report (default: 20)')
+    parser.add_argument('--input', '-i', type=str, default=None,
+                        help='With analyze, the dictionary folder or zip to analyze instead of the --dict build')
     parser.add_argument('--list', '-l', action='store_true',
                         help='List available dictionaries and exit')
     
@@ -92,28 +276,87 @@ def main():
             print(f"  {key}: {config.dict_name}")
         return 0
     
+    if args.command == 'analyze' and args.input:
+        analyze_output(args.input)
+        return 0
+    
     if not args.dict and not args.all:
         parser.error("Either --dict or --all must be specified")
     
+    selected_keys = list(dictionary_configs.keys()) if args.all else [args.dict]
+    
+    if args.profile and args.all:
+        parser.error("--profile can only be used with --dict")
+    
+    # cProfile only sees the main process
+    if args.profile and args.workers > 1:
+        print("--profile: ワーカー数を1にします")
+        args.workers = 1
+    
+    if args.command == 'review':
+        for dict_key in selected_keys:
+            review_dictionary(dictionary_configs[dict_key], args.base_dir)
+        return 0
+    
+    if args.command == 'analyze':
+        for dict_key in selected_keys:
+            analyze_dictionary(dictionary_configs[dict_key], args.base_dir)
+        return 0
+    
+    # Worker processes can't prompt for input, so unmatched entries have to be queued
+    parallel = args.workers > 1 or (args.all and args.jobs > 1)
+    for dict_key in selected_keys:
+        config = dictionary_configs[dict_key]
+        if args.unmatched:
+            config.unmatched_mode = args.unmatched
+        if args.validate:
+            config.validation = args.validate
+        if args.minimize:
+            config.minimize_content = True
+        if parallel and config.unmatched_mode == "interactive":
+            config.unmatched_mode = "queue"
+    
     if args.all:
-        # Process all dictionaries
+        # Process all dictionaries, several at a time if --jobs is given
+        path_manager = PathManager(args.base_dir)
+        tasks = []
         for dict_key, config in dictionary_configs.items():
-            try:
-                print(f"\n{'='*60}")
-                print(f"Processing {dict_key}: {config.dict_name}")
-                print(f"{'='*60}")
-                process_dictionary(config, args.base_dir, args.repackage)
-            except Exception as e:
-                print(f"Error processing {dict_key}: {e}")
-                import traceback
-                traceback.print_exc()
-                print(f"Continuing with next dictionary...")
+            pages_path = path_manager.get_paths(config)["dict_path"]
+            tasks.append(BuildTask(
+                key=dict_key,
+                name=config.dict_name,
+                args=(config, args.base_dir, args.repackage, args.workers, args.cache, args.direct_zip,
+                      args.compress_level, args.all_assets),
+                memory_mb=estimate_memory_mb(pages_path, config.memory_estimate_mb)
+            ))
+        
+        memory_budget_mb = int(args.memory_budget * 1024) if args.memory_budget else None
+        scheduler = BuildScheduler(
+            process_dictionary,
+            jobs=args.jobs,
+            memory_budget_mb=memory_budget_mb,
+            log_dir=path_manager.base_dir / "converted" / "logs"
+        )
+        results = scheduler.run(tasks)
+        BuildScheduler.print_summary(results)
+        
+        if not all(result.success for result in results):
+            return 1
     else:
         # Process a single dictionary
         dict_key = args.dict
         config = dictionary_configs[dict_key]
         try:
-            process_dictionary(config, args.base_dir, args.repackage)
+            if args.profile:
+                profile_dictionary(
+                    config, args.profile_top, base_dir=args.base_dir, repackage_only=args.repackage,
+                    workers=args.workers, use_cache=args.cache, direct_zip=args.direct_zip,
+                    compress_level=args.compress_level, all_assets=args.all_assets,
+                    sample_pages=args.profile_sample
+                )
+            else:
+                process_dictionary(config, args.base_dir, args.repackage, args.workers, args.cache, args.direct_zip,
+                                   args.compress_level, args.all_assets)
         except Exception as e:
             print(f"Error processing {dict_key}: {e}")
             import traceback
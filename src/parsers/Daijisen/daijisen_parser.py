@@ -28,7 +28,7 @@ class DaijisenParser(Parser):
             if readings:
                 for reading in readings:
                     entry = DicEntry(expression, reading, info_tag="", pos_tag=pos_tag)
-                    yomitan_element = self.convert_element_to_yomitan(sub_item, ignore_expressions=False)
+                    yomitan_element = self.convert_element_cached(sub_item, ignore_expressions=False)
                     if yomitan_element:
                         entry.add_element(yomitan_element)
                         
@@ -37,7 +37,7 @@ class DaijisenParser(Parser):
             
             else:
                 entry = DicEntry(expression, "", info_tag="", pos_tag=pos_tag)
-                yomitan_element = self.convert_element_to_yomitan(sub_item, ignore_expressions=False)
+                yomitan_element = self.convert_element_cached(sub_item, ignore_expressions=False)
                 if yomitan_element:
                     entry.add_element(yomitan_element)
                     
@@ -52,12 +52,13 @@ class DaijisenParser(Parser):
         filename_without_ext = os.path.splitext(filename)[0]
         
         # Get keys from index
-        entry_keys = list(set(self.index_reader.get_keys_for_file(filename_without_ext)))
+        entry_keys = list(dict.fromkeys(self.index_reader.get_keys_for_file(filename_without_ext)))
         
         # Parse xml
-        soup = bs4.BeautifulSoup(xml, "xml")
+        soup = self.parse_xml(xml)
         
-        # Add any expression entries from subitems
+        # Add any expression entries from subitems, reusing the page's conversion
+        self.convert_page(soup)
         local_count += self._handle_expression_entries(soup)
         
         # Handle entries without keys
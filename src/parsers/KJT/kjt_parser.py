@@ -63,6 +63,12 @@ class KJTParser(Parser):
 		return len(reading)
 	
 	
+	def _get_cache_keys(self, filename: str) -> List[str]:
+		keys = super()._get_cache_keys(filename)
+		jukugo_entries = self.jukugo_index_reader.get_organized_entries_for_page(os.path.splitext(filename)[0])
+		return keys + [repr(jukugo_entries)]
+	
+	
 	def _handle_busyu_entry(self, soup: bs4.BeautifulSoup) -> int:
 		count = 0
 		busyu_headwords, readings = KJTUtils.extract_busyu(soup)
@@ -90,14 +96,16 @@ class KJTParser(Parser):
 	def _process_file(self, filename: str, xml: str):
 		count = 0
 		filename_without_ext = os.path.splitext(filename)[0]
-		entry_keys = list(set(self.index_reader.get_keys_for_file(filename_without_ext)))
+		entry_keys = list(dict.fromkeys(self.index_reader.get_keys_for_file(filename_without_ext)))
 		kanji_keys = [k for k in entry_keys if any(KanjiUtils.is_kanji(c) for c in k)]
 		reading_keys = [k for k in entry_keys if k not in kanji_keys and k != '〓']
 		
 		# Parse xml
-		soup = bs4.BeautifulSoup(xml, "xml")
+		soup = self.parse_xml(xml)
 		
 		if soup.find("SubItem"):
+			# Converts the subitems for the jukugo entries and the page for the kanji entries in one go
+			self.convert_page(soup)
 			count += self._handle_jukugo(soup, filename_without_ext)
 				
 		if soup.find("BusyuHeadG") and not entry_keys:
@@ -36,7 +36,7 @@ class MeikyoParser(Parser):
             
             if reading:
                 entry = DicEntry(expression, reading, pos_tag=pos_tag)
-                yomitan_element = self.convert_element_to_yomitan(child, ignore_expressions=False)
+                yomitan_element = self.convert_element_cached(child, ignore_expressions=False)
                 if yomitan_element:
                     entry.add_element(yomitan_element)
                     self.dictionary.add_entry(entry)
@@ -53,10 +53,11 @@ class MeikyoParser(Parser):
         filename_without_ext = os.path.splitext(filename)[0]
         
         # Get keys from index
-        entry_keys = list(set(self.index_reader.get_keys_for_file(filename_without_ext)))
+        entry_keys = list(dict.fromkeys(self.index_reader.get_keys_for_file(filename_without_ext)))
         
         # Parse xml
-        soup = bs4.BeautifulSoup(xml, "xml")
+        soup = self.parse_xml(xml)
+        self.convert_page(soup)
         self._handle_expression_entries(soup)
         
         if not entry_keys:
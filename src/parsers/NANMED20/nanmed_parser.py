@@ -1,4 +1,3 @@
-import bs4
 import jaconv
 import regex as re
 from typing import List
@@ -31,7 +30,7 @@ class NanmedParser(Parser):
     def _process_file(self, filename: str, xml: str) -> int:
         local_count = 0
         entry_keys = self.extract_entry_keys(filename)
-        soup = bs4.BeautifulSoup(xml, "lxml")
+        soup = self.parse_xml(xml, "lxml")
         
         if any(any(p in key for p in self.parentheses) for key in entry_keys):   
             if len(entry_keys) == 1:
@@ -11,14 +11,55 @@ from config import DictionaryConfig
 from handlers import AudioHandler, process_unmatched_entries
 from parsers.OZK5.ozk5_utils import OZK5Utils
     
+class WakaEntryHandler:
+    """Collects the 和歌 entries, whose head words are added to waka_entries.json by hand"""
+    
+    def __init__(self, waka_path: Path):
+        self.waka_path = waka_path
+        self.waka_entries = self._init_index()
+        
+        
+    def _init_index(self) -> Dict:
+        return {"entries": [], "reading_index": {}}
+    
+    
+    def save_waka_entry(self, reading: str, filename: str):
+        entry_index = len(self.waka_entries["entries"])
+        
+        self.waka_entries["entries"].append({
+            "reading": reading,
+            "head_word": "",
+            "file": filename
+        })
+        self.waka_entries["reading_index"][reading] = entry_index
+        
+        
+    def drain(self) -> Dict:
+        """Return the collected entries and start a new index"""
+        waka_entries = self.waka_entries
+        self.waka_entries = self._init_index()
+        return waka_entries
+    
+    
+    def merge(self, waka_entries: Dict):
+        """Merge entries collected by another handler (e.g. in a worker process)"""
+        for entry in waka_entries["entries"]:
+            self.save_waka_entry(entry["reading"], entry["file"])
+            
+            
+    def export(self):
+        with open(self.waka_path, 'w', encoding='utf-8') as f:
+            json.dump(self.waka_entries, f, ensure_ascii=False, indent=2)
+            
+            
 class OZK5Parser(Parser):
     
     def __init__(self, config: DictionaryConfig):
         super().__init__(config)
         
-        # List to store 和歌 entries (I add the head word manually for these 269 entries)
-        self.waka_entries = {"entries": [], "reading_index": {}}
+        # Stores 和歌 entries (I add the head word manually for these 269 entries)
         self.waka_path =  Path(config.index_path).parent / "waka_entries.json"
+        self.waka_handler = WakaEntryHandler(self.waka_path)
         self.audio_handler = AudioHandler(config.dict_name, config.audio_path)
             
             
@@ -34,7 +75,7 @@ class OZK5Parser(Parser):
             return local_count
         
         # Parse xml
-        soup = bs4.BeautifulSoup(xml, "xml") 
+        soup = self.parse_xml(xml) 
         
         # Skip appendix entries
         if soup.find("付録タイトル") or soup.find("付録見出"):     
@@ -112,25 +153,20 @@ class OZK5Parser(Parser):
     
     
     def _save_waka_entry(self, soup: bs4.BeautifulSoup, reading: str, filename: str):
-        entry_index = len(self.waka_entries["entries"])
-        
-        self.waka_entries["entries"].append({
-            "reading": reading,
-            "head_word": "",
-            "file": filename
-        })
-        if reading not in self.waka_entries["reading_index"]:
-            self.waka_entries["reading_index"][reading] = ""
-            
-        self.waka_entries["reading_index"][reading] = entry_index
+        self.waka_handler.save_waka_entry(reading, filename)
         
         
+    def _get_state_handlers(self) -> Dict[str, object]:
+        # Workers hand their 和歌 entries back with the rest of the page state
+        handlers = super()._get_state_handlers()
+        handlers["waka_handler"] = self.waka_handler
+        return handlers
+    
+    
     def export(self, output_path: Optional[str] = None, export_waka_entries: bool = False):
-        self.dictionary.export(output_path)
+        # Exports the dictionary, queued unmatched entries and the audio handler
+        super().export(output_path)
         
         if export_waka_entries:
-            with open(self.waka_path, 'w', encoding='utf-8') as f:
-                json.dump(self.waka_entries, f, ensure_ascii=False, indent=2) 
-                
-        self.audio_handler.export()
+            self.waka_handler.export()
     
\ No newline at end of file
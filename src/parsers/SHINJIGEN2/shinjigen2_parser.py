@@ -1,4 +1,3 @@
-import bs4
 from typing import List
 
 from utils import FileUtils
@@ -25,7 +24,7 @@ class ShinjigenParser(Parser):
         local_count = 0
     
         entry_keys = self.extract_entry_keys(entry)
-        soup = bs4.BeautifulSoup(xml, "lxml")
+        soup = self.parse_xml(xml, "lxml")
     
         for entry in entry_keys:
             local_count += self.parse_entry(entry, "", soup)      
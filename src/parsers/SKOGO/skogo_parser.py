@@ -1,5 +1,4 @@
 import os
-import bs4
 
 from utils import KanjiUtils
 from core import Parser
@@ -20,10 +19,10 @@ class SKOGOParser(Parser):
         filename_without_ext = os.path.splitext(filename)[0]
         
         # Get keys from index
-        entry_keys = list(set(self.index_reader.get_keys_for_file(filename_without_ext)))
+        entry_keys = list(dict.fromkeys(self.index_reader.get_keys_for_file(filename_without_ext)))
         
         # Parse xml
-        soup = bs4.BeautifulSoup(xml, "xml")
+        soup = self.parse_xml(xml)
         
         # Use reading for normalisation
         reading = SKOGOUtils.extract_reading(soup)
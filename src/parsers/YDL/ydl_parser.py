@@ -1,5 +1,4 @@
 import os
-import bs4
 import jaconv
 from typing import Dict, List, Optional
 
@@ -33,13 +32,13 @@ class YDLParser(Parser):
         filename_without_ext = os.path.splitext(filename)[0]
         
         # Get keys from index
-        entry_keys = list(set(self.index_reader.get_keys_for_file(filename_without_ext)))
+        entry_keys = list(dict.fromkeys(self.index_reader.get_keys_for_file(filename_without_ext)))
         
         if not entry_keys:
             print(f"No entry keys for entry: {filename_without_ext}")
         
         # Parse xml
-        soup = bs4.BeautifulSoup(xml, "xml")
+        soup = self.parse_xml(xml)
         
         # Use reading for normalisation (Whether to convert keys to hiragana or keep katakana)
         headword = YDLUtils.extract_headword(soup)
@@ -1,5 +1,4 @@
 import os
-import bs4
 import jaconv
 from typing import List
 
@@ -32,10 +31,10 @@ class YDPParser(Parser):
         filename_without_ext = os.path.splitext(filename)[0]
         
         # Get keys from index
-        entry_keys = list(set(self.index_reader.get_keys_for_file(filename_without_ext)))
+        entry_keys = list(dict.fromkeys(self.index_reader.get_keys_for_file(filename_without_ext)))
         
         # Parse xml
-        soup = bs4.BeautifulSoup(xml, "xml")
+        soup = self.parse_xml(xml)
         
         # Use headword for normalisation (Whether to convert keys to hiragana or keep katakana)
         head_word = YDPUtils.extract_headword(soup)
@@ -1,10 +1,26 @@
 from .file_utils import FileUtils
+from .page_source import XmlPageSource
+from .zip_packager import ZipPackager
+from .build_metrics import BuildMetrics, get_metrics, start_metrics
+from .page_profiler import PageProfiler
+from .size_analyzer import TermBankAnalyzer
+from .build_scheduler import BuildScheduler, BuildTask, estimate_memory_mb
 from .kanji_utils import KanjiUtils
 from .cn_utils import CNUtils
 from .sudachi_tags import sudachi_rules
 
 __all__ = [
     "FileUtils",
+    "XmlPageSource",
+    "ZipPackager",
+    "BuildMetrics",
+    "get_metrics",
+    "start_metrics",
+    "PageProfiler",
+    "TermBankAnalyzer",
+    "BuildScheduler",
+    "BuildTask",
+    "estimate_memory_mb",
     "KanjiUtils",
     "CNUtils",
     "sudachi_rules"
@@ -0,0 +1,213 @@
+import os
+import sys
+import json
+import time
+from contextlib import contextmanager
+from typing import Dict
+
+try:
+    import resource
+except ImportError:  # Windows
+    resource = None
+
+
+def get_rss_mb() -> float:
+    """Current resident set size of this process in MB, 0 where /proc isn't available"""
+    try:
+        with open("/proc/self/statm", "r") as f:
+            resident_pages = int(f.read().split()[1])
+    except (OSError, ValueError, IndexError):
+        return 0.0
+    return resident_pages * os.sysconf("SC_PAGE_SIZE") / (1024 * 1024)
+
+
+def get_peak_rss_mb() -> float:
+    """Peak resident set size of this process and its finished children, in MB"""
+    if resource is None:
+        return 0.0
+
+    peak = max(
+        resource.getrusage(resource.RUSAGE_SELF).ru_maxrss,
+        resource.getrusage(resource.RUSAGE_CHILDREN).ru_maxrss
+    )
+    # ru_maxrss is in bytes on macOS and in kilobytes on Linux
+    if sys.platform == "darwin":
+        return peak / (1024 * 1024)
+    return peak / 1024
+
+
+class PhaseMetrics:
+    def __init__(self):
+        self.wall_time = 0.0
+        self.cpu_time = 0.0
+        self.calls = 0
+        self.count = 0
+        self.rss_start_mb = 0.0
+        self.rss_end_mb = 0.0
+        self.rss_delta_mb = 0.0
+
+
+    def merge(self, data: Dict) -> None:
+        if not self.calls:
+            self.rss_start_mb = data["rss_start_mb"]
+        self.rss_end_mb = data["rss_end_mb"]
+        self.rss_delta_mb += data["rss_delta_mb"]
+        self.wall_time += data["wall_time"]
+        self.cpu_time += data["cpu_time"]
+        self.calls += data["calls"]
+        self.count += data["count"]
+
+
+    def to_dict(self) -> Dict:
+        return {
+            "wall_time": round(self.wall_time, 4),
+            "cpu_time": round(self.cpu_time, 4),
+            "calls": self.calls,
+            "count": self.count,
+            "per_sec": round(self.count / self.wall_time, 1) if self.wall_time and self.count else None,
+            "rss_start_mb": round(self.rss_start_mb, 1),
+            "rss_end_mb": round(self.rss_end_mb, 1),
+            "rss_delta_mb": round(self.rss_delta_mb, 1)
+        }
+
+
+class BuildMetrics:
+    """
+    Wall time, CPU time, item counts and RSS per build phase.
+
+    Phases are named "phase" or "phase.step". Steps such as "parse.bs4" are measured in
+    whichever process does the work and merged back, so with workers their times are
+    summed over processes and can exceed the wall time of the phase they belong to.
+    Counters, such as cache hits, are plain totals that are summed the same way.
+
+    A phase records the RSS when it is first entered and when it last exits, and how much
+    the RSS grew over all its calls. The peak RSS is only reported for the whole build,
+    as the process high-water mark can't be attributed to a single phase.
+    """
+
+    def __init__(self, name: str = ""):
+        self.name = name
+        self.phases: Dict[str, PhaseMetrics] = {}
+        self.counters: Dict[str, int] = {}
+        self.start_time = time.perf_counter()
+
+
+    def _get_phase(self, name: str) -> PhaseMetrics:
+        phase = self.phases.get(name)
+        if phase is None:
+            phase = self.phases[name] = PhaseMetrics()
+        return phase
+
+
+    @contextmanager
+    def phase(self, name: str, count: int = 0):
+        """Time a block. The count can also be set later through the yielded PhaseMetrics"""
+        phase = self._get_phase(name)
+        start_rss = get_rss_mb()
+        if not phase.calls:
+            phase.rss_start_mb = start_rss
+        start_wall = time.perf_counter()
+        start_cpu = time.process_time()
+        try:
+            yield phase
+        finally:
+            phase.wall_time += time.perf_counter() - start_wall
+            phase.cpu_time += time.process_time() - start_cpu
+            phase.calls += 1
+            phase.count += count
+            phase.rss_end_mb = get_rss_mb()
+            phase.rss_delta_mb += phase.rss_end_mb - start_rss
+
+
+    def add_count(self, name: str, count: int) -> None:
+        self._get_phase(name).count += count
+
+
+    def increment(self, name: str, value: int = 1) -> None:
+        self.counters[name] = self.counters.get(name, 0) + value
+
+
+    def snapshot(self) -> Dict[str, Dict]:
+        """Raw phase data and counters, e.g. to send back from a worker process"""
+        return {
+            "phases": {
+                name: {
+                    "wall_time": phase.wall_time,
+                    "cpu_time": phase.cpu_time,
+                    "calls": phase.calls,
+                    "count": phase.count,
+                    "rss_start_mb": phase.rss_start_mb,
+                    "rss_end_mb": phase.rss_end_mb,
+                    "rss_delta_mb": phase.rss_delta_mb
+                }
+                for name, phase in self.phases.items()
+            },
+            "counters": dict(self.counters)
+        }
+
+
+    def merge(self, snapshot: Dict[str, Dict]) -> None:
+        for name, data in snapshot["phases"].items():
+            self._get_phase(name).merge(data)
+        for name, value in snapshot["counters"].items():
+            self.increment(name, value)
+
+
+    def reset(self) -> None:
+        self.phases = {}
+        self.counters = {}
+        self.start_time = time.perf_counter()
+
+
+    def to_dict(self) -> Dict:
+        return {
+            "dictionary": self.name,
+            "total_wall_time": round(time.perf_counter() - self.start_time, 4),
+            "peak_rss_mb": round(get_peak_rss_mb(), 1),
+            "phases": {name: phase.to_dict() for name, phase in self.phases.items()},
+            "counters": dict(self.counters)
+        }
+
+
+    def print_table(self) -> None:
+        data = self.to_dict()
+        name_width = max([len(name) for name in list(self.phases) + list(self.counters)] + [5]) + 2
+
+        print(f"\n{'='*72}")
+        print(f"Build metrics: {self.name} (合計 {data['total_wall_time']:.1f}秒, peak RSS {data['peak_rss_mb']:.0f}MB)")
+        print(f"{'='*72}")
+        print(f"{'phase':<{name_width}}{'wall (s)':>10}{'cpu (s)':>10}{'count':>10}{'per sec':>11}"
+              f"{'RSS (MB)':>10}{'ΔRSS':>8}")
+        for name, phase in data["phases"].items():
+            # Steps are indented under their phase
+            label = "  " + name.split(".", 1)[1] if "." in name else name
+            per_sec = f"{phase['per_sec']:.0f}" if phase["per_sec"] else "-"
+            count = phase["count"] if phase["count"] else "-"
+            print(f"{label:<{name_width}}{phase['wall_time']:>10.2f}{phase['cpu_time']:>10.2f}"
+                  f"{count:>10}{per_sec:>11}{phase['rss_end_mb']:>10.0f}{phase['rss_delta_mb']:>+8.0f}")
+
+        if self.counters:
+            print(f"\n{'counter':<{name_width}}{'value':>10}")
+            for name, value in self.counters.items():
+                print(f"{name:<{name_width}}{value:>10}")
+
+
+    def save(self, path: str) -> None:
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        with open(path, "w", encoding="utf-8") as f:
+            json.dump(self.to_dict(), f, ensure_ascii=False, indent=4)
+
+
+# Metrics of the build running in this process
+_current_metrics = BuildMetrics()
+
+
+def get_metrics() -> BuildMetrics:
+    return _current_metrics
+
+
+def start_metrics(name: str) -> BuildMetrics:
+    """Start collecting metrics for a new build in this process"""
+    global _current_metrics
+    _current_metrics = BuildMetrics(name)
+    return _current_metrics
@@ -0,0 +1,193 @@
+import os
+import sys
+import time
+import traceback
+import multiprocessing
+from multiprocessing.connection import wait
+from dataclasses import dataclass, field
+from typing import Any, Callable, Dict, List, Optional, Tuple
+
+# Rough memory use of a build that hasn't parsed anything yet (JMdict, Sudachi, tag maps)
+BASE_MEMORY_MB = 400
+# Rough ratio of peak memory to the size of the dictionary's pages on disk
+PAGES_MEMORY_FACTOR = 2
+
+
+@dataclass
+class BuildTask:
+    key: str
+    name: str = ""
+    args: Tuple = ()
+    kwargs: Dict[str, Any] = field(default_factory=dict)
+    memory_mb: int = BASE_MEMORY_MB
+
+
+@dataclass
+class BuildResult:
+    key: str
+    success: bool
+    wall_time: float
+    log_path: Optional[str] = None
+    error: Optional[str] = None
+
+
+def estimate_memory_mb(pages_path: str, override_mb: Optional[int] = None) -> int:
+    """Estimate the peak memory of a build from the size of its pages, unless set in the config"""
+    if override_mb:
+        return override_mb
+
+    pages_size = 0
+    if os.path.isdir(pages_path):
+        with os.scandir(pages_path) as it:
+            for entry in it:
+                if entry.is_file():
+                    pages_size += entry.stat().st_size
+
+    return BASE_MEMORY_MB + PAGES_MEMORY_FACTOR * pages_size // (1024 * 1024)
+
+
+def get_default_memory_budget_mb() -> int:
+    """Three quarters of physical memory"""
+    try:
+        total = os.sysconf("SC_PAGE_SIZE") * os.sysconf("SC_PHYS_PAGES")
+    except (ValueError, OSError, AttributeError):
+        return 8 * 1024
+    return int(total * 0.75) // (1024 * 1024)
+
+
+def _run_build_process(build_fn: Callable, task: BuildTask, log_path: str) -> None:
+    # Send everything the build prints, including its worker processes, to the log file
+    log_file = open(log_path, "w", encoding="utf-8", buffering=1)
+    os.dup2(log_file.fileno(), sys.stdout.fileno())
+    os.dup2(log_file.fileno(), sys.stderr.fileno())
+    sys.stdout = sys.stderr = log_file
+
+    try:
+        build_fn(*task.args, **task.kwargs)
+    except BaseException:
+        traceback.print_exc()
+        log_file.flush()
+        os._exit(1)
+
+    log_file.flush()
+    os._exit(0)
+
+
+class BuildScheduler:
+    """
+    Runs dictionary builds concurrently, one process per dictionary.
+
+    At most `jobs` builds run at once, and a build is only started while the estimated
+    memory of everything running stays within `memory_budget_mb`. A build that doesn't
+    fit the budget on its own is run by itself. Output of each build goes to a log file.
+    """
+
+    def __init__(self, build_fn: Callable, jobs: int = 1, memory_budget_mb: Optional[int] = None,
+                 log_dir: Optional[str] = None):
+        self.build_fn = build_fn
+        self.jobs = max(1, jobs)
+        self.memory_budget_mb = memory_budget_mb or get_default_memory_budget_mb()
+        self.log_dir = log_dir or os.getcwd()
+
+
+    def run(self, tasks: List[BuildTask]) -> List[BuildResult]:
+        """Run every task and return the results in the order the tasks were given"""
+        if self.jobs == 1:
+            results = {task.key: self._run_inline(task) for task in tasks}
+        else:
+            results = self._run_concurrent(tasks)
+
+        return [results[task.key] for task in tasks]
+
+
+    def _run_inline(self, task: BuildTask) -> BuildResult:
+        print(f"\n{'='*60}")
+        print(f"Processing {task.key}: {task.name}")
+        print(f"{'='*60}")
+
+        start_time = time.perf_counter()
+        try:
+            self.build_fn(*task.args, **task.kwargs)
+            return BuildResult(task.key, True, time.perf_counter() - start_time)
+        except Exception as e:
+            print(f"Error processing {task.key}: {e}")
+            traceback.print_exc()
+            print(f"Continuing with next dictionary...")
+            return BuildResult(task.key, False, time.perf_counter() - start_time, error=str(e))
+
+
+    def _run_concurrent(self, tasks: List[BuildTask]) -> Dict[str, BuildResult]:
+        os.makedirs(self.log_dir, exist_ok=True)
+
+        # Largest builds first, so they don't end up running alone at the end
+        pending = sorted(tasks, key=lambda task: task.memory_mb, reverse=True)
+        running = {}
+        results = {}
+
+        try:
+            while pending or running:
+                self._start_ready(pending, running)
+
+                sentinels = [process.sentinel for process, _, _, _ in running.values()]
+                for sentinel in wait(sentinels):
+                    process, task, start_time, log_path = running.pop(sentinel)
+                    process.join()
+
+                    success = process.exitcode == 0
+                    results[task.key] = BuildResult(
+                        task.key,
+                        success,
+                        time.perf_counter() - start_time,
+                        log_path,
+                        None if success else f"exit code {process.exitcode}"
+                    )
+                    status = "完了" if success else "失敗"
+                    print(f"[{status}] {task.key} ({results[task.key].wall_time:.1f}秒) - 残り {len(pending) + len(running)} 件")
+        finally:
+            for process, _, _, _ in running.values():
+                process.terminate()
+                process.join()
+
+        return results
+
+
+    def _start_ready(self, pending: List[BuildTask], running: Dict) -> None:
+        for task in list(pending):
+            if len(running) >= self.jobs:
+                break
+
+            used_mb = sum(running_task.memory_mb for _, running_task, _, _ in running.values())
+            if running and used_mb + task.memory_mb > self.memory_budget_mb:
+                continue
+
+            log_path = os.path.join(self.log_dir, f"{task.key}.log")
+            process = multiprocessing.Process(
+                target=_run_build_process,
+                args=(self.build_fn, task, log_path),
+                name=f"build-{task.key}"
+            )
+            process.start()
+
+            running[process.sentinel] = (process, task, time.perf_counter(), log_path)
+            pending.remove(task)
+            print(f"[開始] {task.key} (推定メモリ {task.memory_mb}MB, ログ: {log_path})")
+
+
+    @staticmethod
+    def print_summary(results: List[BuildResult]) -> None:
+        print(f"\n{'='*60}")
+        print("Build summary")
+        print(f"{'='*60}")
+
+        key_width = max([len(result.key) for result in results] + [10])
+        for result in results:
+            status = "OK" if result.success else "FAILED"
+            line = f"  {result.key:<{key_width}}  {status:<6}  {result.wall_time:8.1f}s"
+            if result.error:
+                line += f"  {result.error}"
+            if result.log_path and not result.success:
+                line += f"  (log: {result.log_path})"
+            print(line)
+
+        succeeded = sum(1 for result in results if result.success)
+        print(f"{succeeded}/{len(results)} dictionaries built successfully")
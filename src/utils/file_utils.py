@@ -5,12 +5,17 @@ import glob
 import zipfile
 import regex as re
 
-from typing import List, Dict, Any
+from typing import List, Dict, Any, Optional, Set
 from tqdm import tqdm
 from datetime import datetime
 
+from .zip_packager import ZipPackager
+
 bar_format = "「{desc}: {bar:30}」{percentage:3.0f}% | {n_fmt}/{total_fmt} {unit}"
 
+REFERENCED_ASSETS_FILE = "referenced_assets.json"
+CSS_URL_PATTERN = re.compile(r"""url\(\s*['"]?([^'")]+?)['"]?\s*\)""")
+
 class FileUtils:
     
     @staticmethod
@@ -42,7 +47,8 @@ class FileUtils:
     
     
     @staticmethod
-    def gather_files(term_bank_folder: str, assets_folder: str, index_json_path: str, output_path: str) -> List[str]:
+    def gather_files(term_bank_folder: str, assets_folder: str, index_json_path: str, output_path: str,
+                     name: Optional[str] = None, base_path: Optional[str] = None, only_referenced: bool = True) -> List[str]:
         file_paths = []
 
         # Collect dictionary files
@@ -50,81 +56,201 @@ class FileUtils:
             if file.startswith("term_bank_") and file.endswith(".json"):
                 file_paths.append(os.path.join(term_bank_folder, file))
 
-        # Collect all files inside assets
-        for root, _, files in os.walk(assets_folder):
-            for f in files:
-                file_paths.append(os.path.join(root, f))
+        # Collect the files inside assets, skipping images no entry points to
+        asset_files = FileUtils.gather_asset_files(assets_folder)
+        referenced = FileUtils.load_referenced_assets(term_bank_folder) if only_referenced and name else None
+        if referenced is not None:
+            report_path = os.path.join(output_path, f"{name}_asset_report.json")
+            asset_files = FileUtils.filter_referenced_assets(asset_files, referenced, name, base_path, report_path)
+        file_paths.extend(asset_files)
                 
         # Collect index file
         if os.path.exists(index_json_path) and os.path.isfile(index_json_path):
             file_paths.append(index_json_path)
             
         return file_paths
+    
+    
+    @staticmethod
+    def gather_asset_files(assets_folder: str) -> List[str]:
+        file_paths = []
+        for root, _, files in os.walk(assets_folder):
+            for f in files:
+                file_paths.append(os.path.join(root, f))
+        return file_paths
+    
+    
+    @staticmethod
+    def load_referenced_assets(term_bank_folder: str) -> Optional[Set[str]]:
+        """Load the image paths recorded by the last export, or None if there is no record"""
+        assets_file = os.path.join(term_bank_folder, REFERENCED_ASSETS_FILE)
+        if not os.path.isfile(assets_file):
+            return None
+        return set(FileUtils.load_json(assets_file))
+    
+    
+    @staticmethod
+    def filter_referenced_assets(asset_files: List[str], referenced: Set[str], name: str, base_path: str,
+                                 report_path: Optional[str] = None) -> List[str]:
+        """
+        Keep CSS files, files referenced from CSS and files referenced by entries.
+        Prints a summary and optionally writes the unreferenced and missing files to report_path.
+        """
+        wanted = {FileUtils.normalize_asset_path(path) for path in referenced}
+        
+        archive_names = {}
+        for file in asset_files:
+            rel_path = FileUtils.get_archive_name(file, name, base_path)
+            if rel_path is not None:
+                archive_names[file] = FileUtils.normalize_asset_path(rel_path)
+        
+        # Fonts and backgrounds used by the stylesheets
+        for file, rel_path in archive_names.items():
+            if file.endswith(".css"):
+                wanted.update(FileUtils.get_css_urls(file, rel_path))
         
+        kept, unreferenced = [], []
+        for file, rel_path in archive_names.items():
+            if file.endswith(".css") or rel_path in wanted:
+                kept.append(file)
+            else:
+                unreferenced.append(rel_path)
+        
+        missing = sorted(wanted - set(archive_names.values()))
+        
+        print(f"アセット: {len(kept)} 件を収録, {len(unreferenced)} 件は未参照のため除外, {len(missing)} 件が見つかりません")
+        for rel_path in missing[:10]:
+            print(f"  見つからないアセット: {rel_path}")
+        if len(missing) > 10:
+            print(f"  ...他 {len(missing) - 10} 件")
+            
+        if report_path:
+            with open(report_path, "w", encoding="utf-8") as f:
+                json.dump({"unreferenced": sorted(unreferenced), "missing": missing}, f, ensure_ascii=False, indent=4)
+        
+        return kept
+    
     
     @staticmethod
-    def zip_dictionary(file_paths: List[str], name: str, base_path: str, output_path: str, flatten_dict_folder: bool = True) -> str:
-        if not file_paths:
-            raise ValueError("No files provided")
-
+    def normalize_asset_path(path: str) -> str:
+        path = os.path.normpath(path.replace("\\", "/")).replace(os.sep, "/")
+        return path.lstrip("/")
+    
+    
+    @staticmethod
+    def get_css_urls(css_path: str, css_archive_name: str) -> Set[str]:
+        """Archive paths of local files referenced with url() in a stylesheet"""
+        with open(css_path, "r", encoding="utf-8", errors="ignore") as f:
+            css = f.read()
+        
+        css_dir = os.path.dirname(css_archive_name)
+        urls = set()
+        for url in CSS_URL_PATTERN.findall(css):
+            if url.startswith(("data:", "http:", "https:", "#")):
+                continue
+            url = url.split("?")[0].split("#")[0]
+            urls.add(FileUtils.normalize_asset_path(os.path.join(css_dir, url)))
+        return urls
+    
+    
+    @staticmethod
+    def get_zip_path(name: str, output_path: str) -> str:
         date_str = datetime.now().strftime("%Y-%m-%d")
         zip_name = name + f"[{date_str}].zip"
-        zip_path = os.path.join(output_path, zip_name)
+        return os.path.join(output_path, zip_name)
+    
+    
+    @staticmethod
+    def get_archive_name(file: str, name: str, base_path: str, flatten_dict_folder: bool = True) -> Optional[str]:
+        """Determine the relative path of a file in the zip, or None if it should be skipped"""
+        path_parts = os.path.normpath(file).split(os.sep)
         
-        total_files = len(file_paths)
-
-        with tqdm(total=total_files, desc="辞書圧縮処理", bar_format="「{desc}: {bar:30}」{percentage:3.0f}%{postfix}", 
-                ascii="░▒█") as p_bar:
+        # Determine the relative path in the zip
+        if 'gaiji' in path_parts:
+            rel_path = os.path.join('gaiji', os.path.basename(file))
+        elif 'graphics' in path_parts:
+            rel_path = os.path.join('graphics', os.path.basename(file))
+        elif 'images' in path_parts:
+            rel_path = os.path.join('images', os.path.basename(file))
+        elif 'images2' in path_parts:
+            rel_path = os.path.join('images2', os.path.basename(file))
+        elif 'images_column' in path_parts:
+            rel_path = os.path.join('images_column', os.path.basename(file))  
+        elif 'images_hitsujun' in path_parts:
+            rel_path = os.path.join('images_hitsujun', os.path.basename(file))
+        elif 'img' in path_parts:
+            rel_path = os.path.join('img', os.path.basename(file))
+        elif 'logos' in path_parts:
+            rel_path = os.path.join('logos', os.path.basename(file))
+        elif 'icons' in path_parts:
+            rel_path = os.path.join('icons', os.path.basename(file))
+        elif 'formulas' in path_parts:
+            rel_path = os.path.join('formulas', os.path.basename(file))
+        elif 'tables' in path_parts:
+            rel_path = os.path.join('tables', os.path.basename(file))
+        elif 'svg' in path_parts:
+            rel_path = os.path.join('svg', os.path.basename(file))
+        elif str(file).endswith('.json') or str(file).endswith('.css'):
+            rel_path = os.path.basename(file)
+        elif '.DS_Store' in path_parts:
+            return None
+        else: 
+            rel_path = os.path.join(base_path, file)
             
-            with zipfile.ZipFile(zip_path, 'w', zipfile.ZIP_DEFLATED, compresslevel=9) as zipf:
-                for i, file in enumerate(file_paths):
-                    path_parts = os.path.normpath(file).split(os.sep)
-                    
-                    # Determine the relative path in the zip
-                    if 'gaiji' in path_parts:
-                        rel_path = os.path.join('gaiji', os.path.basename(file))
-                    elif 'graphics' in path_parts:
-                        rel_path = os.path.join('graphics', os.path.basename(file))
-                    elif 'images' in path_parts:
-                        rel_path = os.path.join('images', os.path.basename(file))
-                    elif 'images2' in path_parts:
-                        rel_path = os.path.join('images2', os.path.basename(file))
-                    elif 'images_column' in path_parts:
-                        rel_path = os.path.join('images_column', os.path.basename(file))  
-                    elif 'images_hitsujun' in path_parts:
-                        rel_path = os.path.join('images_hitsujun', os.path.basename(file))
-                    elif 'img' in path_parts:
-                        rel_path = os.path.join('img', os.path.basename(file))
-                    elif 'logos' in path_parts:
-                        rel_path = os.path.join('logos', os.path.basename(file))
-                    elif 'icons' in path_parts:
-                        rel_path = os.path.join('icons', os.path.basename(file))
-                    elif 'formulas' in path_parts:
-                        rel_path = os.path.join('formulas', os.path.basename(file))
-                    elif 'tables' in path_parts:
-                        rel_path = os.path.join('tables', os.path.basename(file))
-                    elif 'svg' in path_parts:
-                        rel_path = os.path.join('svg', os.path.basename(file))
-                    elif str(file).endswith('.json') or str(file).endswith('.css'):
-                        rel_path = os.path.basename(file)
-                    elif '.DS_Store' in path_parts:
-                        continue
-                    else: 
-                        rel_path = os.path.join(base_path, file)
-                        
-                    # Remove dictionary folder prefix if flatten_dict_folder=True
-                    if flatten_dict_folder and rel_path.startswith(f"{name}/"):
-                        rel_path = os.path.basename(rel_path)  # Only keep filename
+        # Remove dictionary folder prefix if flatten_dict_folder=True
+        if flatten_dict_folder and rel_path.startswith(f"{name}/"):
+            rel_path = os.path.basename(rel_path)  # Only keep filename
+            
+        return rel_path
+        
+    
+    @staticmethod
+    def find_previous_zip(name: str, output_path: str) -> Optional[str]:
+        """Find the most recently built zip for a dictionary, if any"""
+        pattern = os.path.join(glob.escape(output_path), glob.escape(f"{name}[") + "*].zip")
+        zip_paths = glob.glob(pattern)
+        if not zip_paths:
+            return None
+        return max(zip_paths, key=os.path.getmtime)
+    
+    
+    @staticmethod
+    def zip_dictionary(file_paths: List[str], name: str, base_path: str, output_path: str, flatten_dict_folder: bool = True,
+                       compress_level: int = 9, workers: Optional[int] = None, reuse_previous: bool = False) -> str:
+        if not file_paths:
+            raise ValueError("No files provided")
 
-                    # Write file to zip
-                    zipf.write(file, rel_path)
-                    
-                    p_bar.update(1)
+        zip_path = FileUtils.get_zip_path(name, output_path)
+        previous_zip_path = FileUtils.find_previous_zip(name, output_path) if reuse_previous else None
+        
+        # The previous zip may have today's name, so build next to it and swap it in at the end
+        temp_path = zip_path + ".tmp"
+        try:
+            with zipfile.ZipFile(temp_path, 'w', zipfile.ZIP_DEFLATED, compresslevel=compress_level) as zipf:
+                FileUtils.write_files_to_zip(zipf, file_paths, name, base_path, flatten_dict_folder, compress_level, workers,
+                                             previous_zip_path)
+            os.replace(temp_path, zip_path)
+        finally:
+            if os.path.exists(temp_path):
+                os.remove(temp_path)
 
         print(f"完了しました: {zip_path}")
         return zip_path
     
     
+    @staticmethod
+    def write_files_to_zip(zipf: zipfile.ZipFile, file_paths: List[str], name: str, base_path: str,
+                           flatten_dict_folder: bool = True, compress_level: int = 9, workers: Optional[int] = None,
+                           previous_zip_path: Optional[str] = None) -> None:
+        members = []
+        for file in file_paths:
+            rel_path = FileUtils.get_archive_name(file, name, base_path, flatten_dict_folder)
+            if rel_path is not None:
+                members.append((file, rel_path))
+
+        ZipPackager(compress_level, workers).write_files(zipf, members, previous_zip_path)
+    
+    
     @staticmethod
     def extract_entry_keys(entry: str) -> List[str]:
         parts = entry.split('|')
@@ -0,0 +1,75 @@
+import os
+import json
+import time
+import heapq
+import regex as re
+from typing import Dict, List, Optional
+
+from .build_metrics import get_metrics
+
+OPENING_TAG_PATTERN = re.compile(r"<[^/!?]")
+
+
+class PageProfiler:
+    """
+    Keeps the N slowest pages of a parse by conversion time,
+    to find pathological pages without watching the progress bar.
+    """
+
+    def __init__(self, top_n: int = 20):
+        self.top_n = top_n
+        self.pages = []
+        self.page_count = 0
+        self._start_time = 0.0
+        self._start_conversion = 0.0
+
+
+    def _get_conversion_time(self) -> float:
+        phase = get_metrics().phases.get("parse.conversion")
+        return phase.wall_time if phase else 0.0
+
+
+    def start_page(self) -> None:
+        self._start_time = time.perf_counter()
+        self._start_conversion = self._get_conversion_time()
+
+
+    def end_page(self, filename: str, xml, entry_count: int) -> None:
+        total_time = time.perf_counter() - self._start_time
+        conversion_time = self._get_conversion_time() - self._start_conversion
+        self.page_count += 1
+
+        record = (conversion_time, self.page_count, {
+            "filename": str(filename),
+            "conversion_time": round(conversion_time, 6),
+            "total_time": round(total_time, 6),
+            "elements": len(OPENING_TAG_PATTERN.findall(xml)) if isinstance(xml, str) else 0,
+            "entries": entry_count
+        })
+
+        # Min-heap of the slowest pages seen so far
+        if len(self.pages) < self.top_n:
+            heapq.heappush(self.pages, record)
+        else:
+            heapq.heappushpop(self.pages, record)
+
+
+    def get_slowest_pages(self) -> List[Dict]:
+        return [page for _, _, page in sorted(self.pages, key=lambda record: (-record[0], record[1]))]
+
+
+    def report(self, output_path: Optional[str] = None) -> None:
+        """Print the slowest pages and optionally save them as JSON"""
+        slowest_pages = self.get_slowest_pages()
+
+        print(f"\n変換に時間がかかったページ (上位 {len(slowest_pages)} / {self.page_count} ページ):")
+        print(f"{'filename':<28}{'conversion (ms)':>16}{'total (ms)':>12}{'elements':>10}{'entries':>9}")
+        for page in slowest_pages:
+            print(f"{page['filename']:<28}{page['conversion_time'] * 1000:>16.1f}{page['total_time'] * 1000:>12.1f}"
+                  f"{page['elements']:>10}{page['entries']:>9}")
+
+        if output_path:
+            os.makedirs(os.path.dirname(output_path), exist_ok=True)
+            with open(output_path, "w", encoding="utf-8") as f:
+                json.dump({"pages_profiled": self.page_count, "slowest_pages": slowest_pages}, f,
+                          ensure_ascii=False, indent=4)
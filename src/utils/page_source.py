@@ -0,0 +1,49 @@
+import os
+import glob
+import random
+from typing import Iterator, Tuple
+
+from .build_metrics import get_metrics
+
+
+class XmlPageSource:
+    """
+    Lazily reads the XML pages in a directory.
+    Pages are read one at a time when iterated, so only the pages currently
+    being processed are held in memory.
+    """
+    
+    def __init__(self, directory_path: str):
+        if not os.path.isdir(directory_path):
+            raise ValueError(f"ディレクトリ '{directory_path}' は存在しません")
+        
+        self.directory_path = directory_path
+        self.xml_files = sorted(glob.glob(os.path.join(directory_path, "*.xml")))
+        
+        
+    def sample(self, count: int, seed: int = 0) -> None:
+        """Restrict the source to a reproducible random subset of its pages"""
+        if count < len(self.xml_files):
+            self.xml_files = sorted(random.Random(seed).sample(self.xml_files, count))
+        
+        
+    def __len__(self) -> int:
+        return len(self.xml_files)
+    
+    
+    def __iter__(self) -> Iterator[Tuple[str, str]]:
+        return self.items()
+    
+    
+    def items(self) -> Iterator[Tuple[str, str]]:
+        """Yield (filename, xml) pairs, reading each page on demand"""
+        for xml_file in self.xml_files:
+            try:
+                with get_metrics().phase("parse.xml_read", count=1):
+                    with open(xml_file, 'r', encoding='utf-8') as file:
+                        content = file.read()
+                    
+                yield os.path.basename(xml_file), content
+                
+            except Exception as e:
+                print(f"エラー: ファイル '{xml_file}' を読み込めませんでした: {str(e)}")
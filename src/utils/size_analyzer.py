@@ -0,0 +1,226 @@
+import os
+import json
+import heapq
+import fnmatch
+import hashlib
+import zipfile
+from collections import defaultdict
+from pathlib import Path
+from typing import Dict, Iterator, List, Optional, Tuple, Union
+
+TERM_BANK_PATTERN = "term_bank_*.json"
+TOP_ENTRIES = 100
+
+
+def _bank_number(name: str) -> int:
+    return int("".join(filter(str.isdigit, os.path.basename(name))) or 0)
+
+
+def json_size(value) -> int:
+    """Bytes a value takes in a term bank, written with json.dumps(ensure_ascii=False)"""
+    return len(json.dumps(value, ensure_ascii=False).encode("utf-8"))
+
+
+class TermBankAnalyzer:
+    """
+    Breaks down where the bytes of a built dictionary's term banks go.
+
+    An element's own bytes are its JSON without its text and child elements, i.e. the tag,
+    data, style and other attributes. Data keys and style properties are reported with the
+    bytes of their "key": value pair, so they are a breakdown of the element bytes.
+    Images are grouped by the folder of their path, with the bytes of the whole img element.
+    Glossaries that are byte for byte the same in several entries are reported as duplicates.
+    """
+
+    def __init__(self, top_n: int = TOP_ENTRIES):
+        self.top_n = top_n
+        self.term_banks = 0
+        self.entry_count = 0
+        self.total_bytes = 0
+        self.glossary_bytes = 0
+        self.text_bytes = 0
+        self.tags = defaultdict(lambda: [0, 0])
+        self.data_keys = defaultdict(lambda: [0, 0])
+        self.styles = defaultdict(lambda: [0, 0])
+        self.image_prefixes = defaultdict(lambda: [0, 0])
+        self.glossaries = {}
+        self._largest_entries = []
+
+
+    @staticmethod
+    def iter_term_banks(path: Union[str, Path]) -> Iterator[Tuple[str, List]]:
+        """Term banks of a dictionary folder or zip, in file order"""
+        path = Path(path)
+        if zipfile.is_zipfile(path):
+            with zipfile.ZipFile(path) as zipf:
+                names = [name for name in zipf.namelist() if fnmatch.fnmatch(os.path.basename(name), TERM_BANK_PATTERN)]
+                for name in sorted(names, key=_bank_number):
+                    yield name, json.loads(zipf.read(name))
+        else:
+            for bank_path in sorted(path.glob(TERM_BANK_PATTERN), key=lambda bank_path: _bank_number(bank_path.name)):
+                with open(bank_path, "r", encoding="utf-8") as f:
+                    yield bank_path.name, json.load(f)
+
+
+    def analyze(self, path: Union[str, Path]) -> 'TermBankAnalyzer':
+        for bank_name, entries in self.iter_term_banks(path):
+            self.term_banks += 1
+            # The brackets and the ", " between entries
+            self.total_bytes += 2 + 2 * max(len(entries) - 1, 0)
+            for entry in entries:
+                self.add_entry(entry, bank_name)
+        return self
+
+
+    def add_entry(self, entry: List, bank_name: str = "") -> None:
+        size = json_size(entry)
+        glossary = json.dumps(entry[5], ensure_ascii=False).encode("utf-8")
+        self.entry_count += 1
+        self.total_bytes += size
+        self.glossary_bytes += len(glossary)
+
+        self._measure(entry[5])
+
+        digest = hashlib.md5(glossary).digest()
+        if digest in self.glossaries:
+            self.glossaries[digest][0] += 1
+        else:
+            self.glossaries[digest] = [1, len(glossary), entry[0], entry[1]]
+
+        record = (size, self.entry_count, {
+            "term": entry[0],
+            "reading": entry[1],
+            "bytes": size,
+            "term_bank": bank_name
+        })
+        if len(self._largest_entries) < self.top_n:
+            heapq.heappush(self._largest_entries, record)
+        else:
+            heapq.heappushpop(self._largest_entries, record)
+
+
+    def _measure(self, node) -> int:
+        """Add up the bytes of a glossary node by tag, data key, style and image, and return its size"""
+        if isinstance(node, str):
+            size = json_size(node)
+            self.text_bytes += size
+            return size
+
+        if isinstance(node, list):
+            return 2 + sum(self._measure(child) for child in node) + 2 * max(len(node) - 1, 0)
+
+        if not isinstance(node, dict):
+            return json_size(node)
+
+        tag = node.get("tag") or f"({node.get('type', 'object')})"
+        size = 2 + 2 * max(len(node) - 1, 0)
+        child_bytes = 0
+        for key, value in node.items():
+            if key == "content":
+                value_size = self._measure(value)
+                child_bytes += value_size
+            else:
+                value_size = json_size(value)
+                if key == "data" and isinstance(value, dict):
+                    self._add_pairs(self.data_keys, value)
+                elif key == "style" and isinstance(value, dict):
+                    self._add_pairs(self.styles, value)
+            size += json_size(key) + 2 + value_size
+
+        stats = self.tags[tag]
+        stats[0] += 1
+        stats[1] += size - child_bytes
+
+        if tag == "img" and isinstance(node.get("path"), str):
+            prefix = os.path.dirname(node["path"]) or "."
+            self.image_prefixes[prefix][0] += 1
+            self.image_prefixes[prefix][1] += size
+
+        return size
+
+
+    @staticmethod
+    def _add_pairs(totals: Dict, values: Dict) -> None:
+        for key, value in values.items():
+            stats = totals[key]
+            stats[0] += 1
+            stats[1] += json_size(key) + 2 + json_size(value) + 2
+
+
+    @staticmethod
+    def _sorted_totals(totals: Dict) -> List[Dict]:
+        rows = [{"name": name, "count": count, "bytes": size} for name, (count, size) in totals.items()]
+        return sorted(rows, key=lambda row: (-row["bytes"], row["name"]))
+
+
+    def get_duplicates(self) -> List[Dict]:
+        """Glossaries found in more than one entry, by the bytes the copies take"""
+        duplicates = [
+            {"term": term, "reading": reading, "copies": count, "bytes": size, "duplicate_bytes": (count - 1) * size}
+            for count, size, term, reading in self.glossaries.values() if count > 1
+        ]
+        return sorted(duplicates, key=lambda row: (-row["duplicate_bytes"], row["term"]))
+
+
+    def get_largest_entries(self) -> List[Dict]:
+        return [entry for _, _, entry in sorted(self._largest_entries, key=lambda record: (-record[0], record[1]))]
+
+
+    def to_dict(self) -> Dict:
+        duplicates = self.get_duplicates()
+        return {
+            "term_banks": self.term_banks,
+            "entries": self.entry_count,
+            "total_bytes": self.total_bytes,
+            "glossary_bytes": self.glossary_bytes,
+            "text_bytes": self.text_bytes,
+            "duplicate_bytes": sum(row["duplicate_bytes"] for row in duplicates),
+            "tags": self._sorted_totals(self.tags),
+            "data_keys": self._sorted_totals(self.data_keys),
+            "styles": self._sorted_totals(self.styles),
+            "image_prefixes": self._sorted_totals(self.image_prefixes),
+            "duplicates": duplicates,
+            "largest_entries": self.get_largest_entries()
+        }
+
+
+    def _print_totals(self, title: str, rows: List[Dict], limit: int) -> None:
+        if not rows:
+            return
+        print(f"\n{title} (上位 {min(limit, len(rows))} / {len(rows)}):")
+        print(f"{'name':<40}{'count':>10}{'bytes':>14}{'share':>8}")
+        for row in rows[:limit]:
+            share = row["bytes"] / self.total_bytes if self.total_bytes else 0
+            print(f"{str(row['name'])[:39]:<40}{row['count']:>10}{row['bytes']:>14,}{share:>8.1%}")
+
+
+    def report(self, output_path: Optional[str] = None, limit: int = 20) -> None:
+        """Print the breakdown and optionally save the whole report as JSON"""
+        data = self.to_dict()
+
+        print(f"\nterm banks: {self.term_banks}, 項目: {self.entry_count:,}, 合計: {self.total_bytes:,} バイト")
+        print(f"  グロッサリー: {self.glossary_bytes:,} バイト, うちテキスト: {self.text_bytes:,} バイト")
+        print(f"  重複したグロッサリー: {len(data['duplicates']):,} 件, {data['duplicate_bytes']:,} バイト")
+
+        self._print_totals("タグ別", data["tags"], limit)
+        self._print_totals("data キー別", data["data_keys"], limit)
+        self._print_totals("style 別", data["styles"], limit)
+        self._print_totals("画像パス別", data["image_prefixes"], limit)
+
+        if data["duplicates"]:
+            print(f"\n重複したグロッサリー (上位 {min(limit, len(data['duplicates']))}):")
+            print(f"{'term':<30}{'copies':>8}{'bytes':>12}{'duplicate':>14}")
+            for row in data["duplicates"][:limit]:
+                print(f"{row['term'][:29]:<30}{row['copies']:>8}{row['bytes']:>12,}{row['duplicate_bytes']:>14,}")
+
+        largest = data["largest_entries"]
+        print(f"\n最も大きい項目 (上位 {min(limit, len(largest))} / {len(largest)}):")
+        print(f"{'term':<30}{'reading':<20}{'bytes':>12}  term bank")
+        for entry in largest[:limit]:
+            print(f"{entry['term'][:29]:<30}{entry['reading'][:19]:<20}{entry['bytes']:>12,}  {entry['term_bank']}")
+
+        if output_path:
+            os.makedirs(os.path.dirname(output_path) or ".", exist_ok=True)
+            with open(output_path, "w", encoding="utf-8") as f:
+                json.dump(data, f, ensure_ascii=False, indent=4)
+            print(f"\nサイズレポートを保存しました: {output_path}")
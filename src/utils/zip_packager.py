@@ -0,0 +1,225 @@
+import os
+import zlib
+import struct
+import zipfile
+from concurrent.futures import ProcessPoolExecutor
+from typing import Dict, List, Optional, Tuple
+from tqdm import tqdm
+
+# Formats that are already compressed and gain nothing from deflate
+STORED_EXTENSIONS = {
+    ".avif", ".png", ".jpg", ".jpeg", ".gif", ".webp", ".heic",
+    ".mp3", ".m4a", ".aac", ".ogg", ".opus", ".mp4", ".woff", ".woff2", ".zip"
+}
+
+# Files smaller than this are cheaper to deflate in-process than to ship to a worker
+PARALLEL_MIN_SIZE = 64 * 1024
+
+bar_format = "「{desc}: {bar:30}」{percentage:3.0f}%{postfix}"
+
+# Zips written by ZipPackager record the deflate level in their comment, since the members don't
+COMPRESS_LEVEL_COMMENT = b"compress_level="
+
+
+def deflate_file(file_path: str, compress_level: int) -> Tuple[bytes, int, int]:
+    """Read and deflate a file, returning the raw deflate stream, CRC-32 and uncompressed size"""
+    with open(file_path, 'rb') as f:
+        data = f.read()
+
+    compressor = zlib.compressobj(compress_level, zlib.DEFLATED, -15)
+    compressed = compressor.compress(data) + compressor.flush()
+    return compressed, zlib.crc32(data), len(data)
+
+
+def write_raw_member(zipf: zipfile.ZipFile, zinfo: zipfile.ZipInfo, compressed: bytes) -> None:
+    """
+    Write a member whose data is already compressed (CRC and sizes must be set on zinfo).
+    The zipfile module has no public API for this, so this mirrors what
+    ZipFile.open(mode="w") does when writing to a seekable file.
+    test/test_zip_packager.py round-trips it, as it relies on ZipFile internals.
+    """
+    zinfo.compress_size = len(compressed)
+    zinfo.flag_bits = 0x00
+    if not zinfo.external_attr:
+        zinfo.external_attr = 0o600 << 16
+
+    with zipf._lock:
+        if zipf._seekable:
+            zipf.fp.seek(zipf.start_dir)
+        zinfo.header_offset = zipf.fp.tell()
+
+        zipf._writecheck(zinfo)
+        zipf._didModify = True
+
+        zipf.fp.write(zinfo.FileHeader())
+        zipf.fp.write(compressed)
+        zipf.start_dir = zipf.fp.tell()
+
+        zipf.filelist.append(zinfo)
+        zipf.NameToInfo[zinfo.filename] = zinfo
+
+
+def read_raw_member(zipf: zipfile.ZipFile, zinfo: zipfile.ZipInfo) -> bytes:
+    """Read the still-compressed data of a member, skipping its local file header"""
+    zipf.fp.seek(zinfo.header_offset)
+    header = zipf.fp.read(zipfile.sizeFileHeader)
+    if header[:4] != zipfile.stringFileHeader:
+        raise zipfile.BadZipFile(f"Bad local file header for {zinfo.filename}")
+
+    name_length, extra_length = struct.unpack("<HH", header[26:30])
+    zipf.fp.seek(zinfo.header_offset + zipfile.sizeFileHeader + name_length + extra_length)
+    return zipf.fp.read(zinfo.compress_size)
+
+
+def get_compress_level(zipf: zipfile.ZipFile) -> Optional[int]:
+    """The deflate level recorded in a zip's comment, None for zips that didn't record one"""
+    if not zipf.comment.startswith(COMPRESS_LEVEL_COMMENT):
+        return None
+    try:
+        return int(zipf.comment[len(COMPRESS_LEVEL_COMMENT):])
+    except ValueError:
+        return None
+
+
+def file_crc32(file_path: str, chunk_size: int = 1024 * 1024) -> int:
+    crc = 0
+    with open(file_path, 'rb') as f:
+        while chunk := f.read(chunk_size):
+            crc = zlib.crc32(chunk, crc)
+    return crc
+
+
+class ZipPackager:
+    """
+    Writes dictionary files into a zip.
+    Already-compressed media is stored as-is, and larger files such as term banks
+    are deflated in parallel worker processes before being written to the archive.
+    Unchanged members of a previously built zip can be copied over raw, as long as
+    deflated members were built with the same compression level.
+    """
+
+    def __init__(self, compress_level: int = 9, workers: Optional[int] = None):
+        self.compress_level = compress_level
+        self.workers = workers if workers is not None else (os.cpu_count() or 1)
+
+
+    def is_stored(self, file_path: str) -> bool:
+        return os.path.splitext(str(file_path))[1].lower() in STORED_EXTENSIONS
+
+
+    def _make_zinfo(self, file_path: str, arcname: str, compress_type: int) -> zipfile.ZipInfo:
+        zinfo = zipfile.ZipInfo.from_file(file_path, arcname)
+        zinfo.compress_type = compress_type
+        return zinfo
+
+
+    def _get_reusable(self, previous_zip: Optional[zipfile.ZipFile], file_path: str, arcname: str,
+                      previous_level: Optional[int] = None) -> Optional[zipfile.ZipInfo]:
+        """Find a member of the previous zip built from an unchanged copy of the file"""
+        if previous_zip is None:
+            return None
+
+        zinfo = zipfile.ZipInfo.from_file(file_path, arcname)
+        previous = previous_zip.NameToInfo.get(zinfo.filename)
+        if previous is None or previous.flag_bits & 0x01:
+            return None
+
+        expected_type = zipfile.ZIP_STORED if self.is_stored(file_path) else zipfile.ZIP_DEFLATED
+        if previous.compress_type != expected_type:
+            return None
+        if expected_type == zipfile.ZIP_DEFLATED and previous_level != self.compress_level:
+            return None
+
+        # Size and mtime rule out most changes cheaply, the CRC catches the rest.
+        # Zips store the mtime in 2 second steps, rounded down
+        year, month, day, hour, minute, second = zinfo.date_time
+        if (previous.file_size != zinfo.file_size
+                or previous.date_time != (year, month, day, hour, minute, second - second % 2)):
+            return None
+        if file_crc32(file_path) != previous.CRC:
+            return None
+
+        return previous
+
+
+    def write_files(self, zipf: zipfile.ZipFile, members: List[Tuple[str, str]],
+                    previous_zip_path: Optional[str] = None) -> None:
+        """
+        Write (file_path, arcname) pairs to an open zip in the given order.
+        Members of previous_zip_path whose source file is unchanged are copied over
+        without being decompressed or compressed again.
+        """
+        previous_zip = None
+        if previous_zip_path and os.path.isfile(previous_zip_path):
+            try:
+                previous_zip = zipfile.ZipFile(previous_zip_path, 'r')
+            except zipfile.BadZipFile:
+                print(f"警告: 前回のzipファイル '{previous_zip_path}' を読み込めませんでした")
+
+        try:
+            reusable = {}
+            previous_level = get_compress_level(previous_zip) if previous_zip else None
+            for file_path, arcname in members:
+                previous = self._get_reusable(previous_zip, file_path, arcname, previous_level)
+                if previous is not None:
+                    reusable[file_path] = previous
+
+            self._write_members(zipf, members, previous_zip, reusable)
+            zipf.comment = COMPRESS_LEVEL_COMMENT + str(self.compress_level).encode("ascii")
+        finally:
+            if previous_zip:
+                previous_zip.close()
+
+        if previous_zip:
+            print(f"前回のzipから {len(reusable)}/{len(members)} ファイルを再利用しました")
+
+
+    def _write_members(self, zipf: zipfile.ZipFile, members: List[Tuple[str, str]],
+                       previous_zip: Optional[zipfile.ZipFile], reusable: Dict[str, zipfile.ZipInfo]) -> None:
+        parallel_files = [
+            file_path for file_path, _ in members
+            if file_path not in reusable and not self.is_stored(file_path)
+            and os.path.getsize(file_path) >= PARALLEL_MIN_SIZE
+        ]
+
+        executor = None
+        futures = {}
+        queued_files = iter(parallel_files)
+        # Results are written in member order, so bound how many compressed files can wait in memory
+        max_pending = self.workers * 2
+
+        def submit_next():
+            file_path = next(queued_files, None)
+            if file_path is not None:
+                futures[file_path] = executor.submit(deflate_file, file_path, self.compress_level)
+
+        if self.workers > 1 and len(parallel_files) > 1:
+            executor = ProcessPoolExecutor(max_workers=min(self.workers, len(parallel_files)))
+            for _ in range(max_pending):
+                submit_next()
+
+        try:
+            with tqdm(total=len(members), desc="辞書圧縮処理", bar_format=bar_format, ascii="░▒█") as p_bar:
+                for file_path, arcname in members:
+                    if file_path in reusable:
+                        previous = reusable[file_path]
+                        zinfo = self._make_zinfo(file_path, arcname, previous.compress_type)
+                        zinfo.CRC = previous.CRC
+                        zinfo.file_size = previous.file_size
+                        write_raw_member(zipf, zinfo, read_raw_member(previous_zip, previous))
+                    elif self.is_stored(file_path):
+                        zipf.write(file_path, arcname, compress_type=zipfile.ZIP_STORED)
+                    elif file_path in futures:
+                        compressed, crc, file_size = futures.pop(file_path).result()
+                        submit_next()
+                        zinfo = self._make_zinfo(file_path, arcname, zipfile.ZIP_DEFLATED)
+                        zinfo.CRC = crc
+                        zinfo.file_size = file_size
+                        write_raw_member(zipf, zinfo, compressed)
+                    else:
+                        zipf.write(file_path, arcname, compress_type=zipfile.ZIP_DEFLATED, compresslevel=self.compress_level)
+
+                    p_bar.update(1)
+        finally:
+            if executor:
+                executor.shutdown(cancel_futures=True)
@@ -0,0 +1,25 @@
+import importlib.util
+
+import pytest
+
+from benchmarks.corpus import generate_corpus
+from benchmarks.parity import BACKENDS, REPO_ROOT, compare_exports, export_with_backend
+
+PAGES = 60
+
+
+@pytest.mark.parametrize("dict_type", ["KJT", "YDP"])
+def test_lxml_backend_matches_bs4(dict_type, tmp_path, monkeypatch):
+    """Both converter backends export the same, non-empty term banks for a generated corpus"""
+    if dict_type == "YDP" and importlib.util.find_spec("sudachidict_full") is None:
+        pytest.skip("YDP needs sudachidict_full to parse")
+
+    # Tag maps and manual mappings are configured relative to the repo root
+    monkeypatch.chdir(REPO_ROOT)
+    base_dir = str(tmp_path / "corpus")
+    generate_corpus(base_dir, dict_type, PAGES, 0)
+
+    exports = [export_with_backend(dict_type, backend, base_dir, tmp_path) for backend in BACKENDS]
+
+    assert len(list(exports[0].glob("term_bank_*.json"))) > 0
+    assert compare_exports(*exports) == []
@@ -0,0 +1,93 @@
+import json
+import os
+import random
+import zipfile
+
+from core.yomitan_dictionary import DicEntry, TermBankWriter
+from utils.zip_packager import PARALLEL_MIN_SIZE, ZipPackager
+
+
+def make_files(folder):
+    """Term banks big enough to be deflated in workers, a small file and an image that is stored"""
+    rng = random.Random(0)
+    files = {}
+    for i in range(4):
+        files[f"term_bank_{i + 1}.json"] = json.dumps(
+            [[f"語{n}", "ご", "", "", 0, [rng.choice("あいうえお") * 40], n, ""] for n in range(PARALLEL_MIN_SIZE // 40)],
+            ensure_ascii=False
+        ).encode("utf-8")
+    files["index.json"] = b'{"title": "test", "format": 3}'
+    files["img/a.png"] = rng.randbytes(5000)
+
+    members = []
+    for arcname, data in files.items():
+        path = folder / arcname
+        path.parent.mkdir(parents=True, exist_ok=True)
+        path.write_bytes(data)
+        members.append((str(path), arcname))
+    return files, members
+
+
+def read_members(zip_path):
+    with zipfile.ZipFile(zip_path) as zipf:
+        assert zipf.testzip() is None
+        return {info.filename: zipf.read(info) for info in zipf.infolist()}
+
+
+def test_parallel_members_round_trip(tmp_path):
+    files, members = make_files(tmp_path / "src")
+    zip_path = tmp_path / "dict.zip"
+
+    with zipfile.ZipFile(zip_path, "w", zipfile.ZIP_DEFLATED) as zipf:
+        ZipPackager(compress_level=6, workers=2).write_files(zipf, members)
+
+    assert read_members(zip_path) == files
+    with zipfile.ZipFile(zip_path) as zipf:
+        assert zipf.getinfo("img/a.png").compress_type == zipfile.ZIP_STORED
+        assert zipf.getinfo("term_bank_1.json").compress_type == zipfile.ZIP_DEFLATED
+
+
+def test_reused_members_round_trip(tmp_path, capsys):
+    files, members = make_files(tmp_path / "src")
+    previous_path = tmp_path / "previous.zip"
+    with zipfile.ZipFile(previous_path, "w", zipfile.ZIP_DEFLATED) as zipf:
+        ZipPackager(workers=1).write_files(zipf, members)
+
+    # Every member is copied raw from the previous zip, one is changed and compressed again
+    changed_path, changed_name = members[0]
+    files[changed_name] = files[changed_name].replace("あ".encode("utf-8"), "か".encode("utf-8"))
+    with open(changed_path, "wb") as f:
+        f.write(files[changed_name])
+
+    zip_path = tmp_path / "dict.zip"
+    with zipfile.ZipFile(zip_path, "w", zipfile.ZIP_DEFLATED) as zipf:
+        ZipPackager(workers=2).write_files(zipf, members, str(previous_path))
+
+    assert f"{len(members) - 1}/{len(members)}" in capsys.readouterr().out
+    assert read_members(zip_path) == files
+
+
+def test_streamed_term_banks_and_raw_members_round_trip(tmp_path):
+    files, members = make_files(tmp_path / "src")
+    zip_path = tmp_path / "dict.zip"
+
+    entries = [DicEntry(f"語{i}", "ご", definition="意味" * (i % 50)) for i in range(300)]
+    with zipfile.ZipFile(zip_path, "w", zipfile.ZIP_DEFLATED, compresslevel=9) as zipf:
+        writer = TermBankWriter(zip_file=zipf, bank_size=8 * 1024)
+        for entry in entries:
+            writer.add(entry)
+        writer.close()
+        ZipPackager(workers=2).write_files(zipf, [member for member in members if "term_bank" not in member[1]])
+
+    written = read_members(zip_path)
+    banks = sorted((name for name in written if name.startswith("term_bank_")), key=lambda name: int(name[10:-5]))
+    assert len(banks) > 1
+
+    streamed = []
+    for name in banks:
+        assert len(written[name]) <= 8 * 1024
+        streamed.extend(json.loads(written[name]))
+    assert [entry[0] for entry in streamed] == [entry.word for entry in entries]
+    assert [entry[6] for entry in streamed] == list(range(len(entries)))
+    assert written["index.json"] == files["index.json"]
+    assert written["img/a.png"] == files["img/a.png"]